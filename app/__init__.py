@@ -2,4 +2,10 @@
 Regulation extraction application package.
 """
 
+import time
+
 __version__ = "0.1.0"
+
+# Recorded before the application's dependencies are imported, so the startup
+# time each server process reports includes loading them
+IMPORTED_AT = time.perf_counter()
@@ -0,0 +1,241 @@
+"""
+Admission control for the regulation extraction application.
+
+Two limits protect the upstream quota from any single client:
+
+* Every client has a token bucket of lookups per minute, identified by an
+  API key listed in the configuration (sent as ``X-API-Key``) or else by its
+  IP address. A client that runs dry is answered ``429`` at once. Behind a
+  load balancer the address is read from a header set by a trusted proxy.
+* Lookups that have to call OpenAI take a slot of a global in-flight cap.
+  When all slots are taken they wait in a bounded FIFO queue; when the queue
+  is full, or a lookup waits longer than allowed, it is answered ``429``.
+
+Answers from the cache or the requirement store never take a slot, so they
+are not held up by slow upstream calls. With ``rate_limit_path`` set the
+client buckets live in that SQLite file, so a client's quota holds across
+worker processes; the in-flight cap applies per worker process.
+"""
+
+import asyncio
+import ipaddress
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Tuple
+
+from fastapi import Request
+
+from app.metrics import ADMISSION_QUEUE_DEPTH, ADMISSION_REJECTED
+from app.models import ConfigSettings
+from app.ratelimit import KeyedTokenBuckets, SharedKeyedTokenBuckets
+
+API_KEY_HEADER = "x-api-key"
+
+
+class Overloaded(Exception):
+    """A request was turned away; ``retry_after`` is a suggested delay in seconds."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Slot:
+    """A held place under the in-flight cap; releasing it twice is harmless."""
+
+    def __init__(self, gate: "AdmissionGate"):
+        self._gate = gate
+        self.acquired_at = time.monotonic()
+
+    def release(self):
+        gate, self._gate = self._gate, None
+        if gate is not None:
+            gate._release(time.monotonic() - self.acquired_at)
+
+
+class AdmissionGate:
+    """
+    Cap on concurrent upstream lookups with a bounded FIFO wait queue.
+
+    A released slot is handed straight to the oldest waiter. Waiters that give
+    up are left in the queue and skipped when they reach its head, so every
+    operation stays O(1) amortized.
+    """
+
+    def __init__(self, max_in_flight: int = 0, queue_size: int = 100, queue_timeout: float = 10):
+        self.in_flight = 0
+        self.queued = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # Moving average of how long a slot is held, for Retry-After
+        self._hold_seconds = 1.0
+        self.configure(max_in_flight, queue_size, queue_timeout)
+
+    def configure(self, max_in_flight: int, queue_size: int, queue_timeout: float):
+        """Change the limits; a higher cap admits waiting lookups at once."""
+        self.max_in_flight = max_in_flight
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._wake()
+
+    def _has_room(self) -> bool:
+        return self.max_in_flight <= 0 or self.in_flight < self.max_in_flight
+
+    def retry_after(self) -> float:
+        """Estimate when a slot is likely to be free for a new lookup."""
+        if self.max_in_flight <= 0:
+            return 1.0
+        return max(1.0, self._hold_seconds * (self.queued + 1) / self.max_in_flight)
+
+    async def acquire(self) -> Slot:
+        """
+        Take a slot, waiting in the queue if all are in use.
+
+        Raises:
+            Overloaded: If the queue is full or the wait exceeds the queue timeout
+        """
+        if self._has_room() and self.queued == 0:
+            self.in_flight += 1
+            return Slot(self)
+        if self.queued >= self.queue_size:
+            ADMISSION_REJECTED.inc("queue_full")
+            raise Overloaded("Too many lookups in progress", self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self.queued += 1
+        ADMISSION_QUEUE_DEPTH.set(self.queued)
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as the wait ended
+                self._release(0.0)
+            else:
+                future.cancel()
+                self.queued -= 1
+                ADMISSION_QUEUE_DEPTH.set(self.queued)
+            if isinstance(e, asyncio.TimeoutError):
+                ADMISSION_REJECTED.inc("queue_timeout")
+                raise Overloaded("Timed out waiting for a free lookup slot", self.retry_after())
+            raise
+        return Slot(self)
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold a slot for the duration of the ``async with`` block."""
+        slot = await self.acquire()
+        try:
+            yield slot
+        finally:
+            slot.release()
+
+    def _release(self, held: float):
+        self._hold_seconds = 0.8 * self._hold_seconds + 0.2 * held
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self._has_room():
+            future = self._waiters.popleft()
+            if future.done():
+                # Its caller gave up and has already left the count
+                continue
+            future.set_result(None)
+            self.in_flight += 1
+            self.queued -= 1
+        ADMISSION_QUEUE_DEPTH.set(self.queued)
+
+
+class AdmissionController:
+    """Per-client quotas and the upstream gate, configured from the settings."""
+
+    def __init__(self, settings: ConfigSettings):
+        # Opened once, like the other shared files; a new path needs a restart
+        self.quotas = (
+            SharedKeyedTokenBuckets(settings.rate_limit_path)
+            if settings.rate_limit_path
+            else KeyedTokenBuckets()
+        )
+        self.gate = AdmissionGate()
+        self.configure(settings)
+
+    def configure(self, settings: ConfigSettings):
+        """Apply new settings, keeping the clients' balances and queued lookups."""
+        self.settings = settings
+        self._proxies = [
+            ipaddress.ip_network(network, strict=False) for network in settings.trusted_proxies
+        ]
+        self.gate.configure(
+            settings.max_in_flight_lookups,
+            settings.admission_queue_size,
+            settings.admission_queue_timeout,
+        )
+
+    def client(self, request: Request) -> Tuple[str, int]:
+        """
+        Identify the caller.
+
+        Returns:
+            tuple: (bucket key, lookups allowed per minute, 0 for unlimited)
+        """
+        api_key = request.headers.get(API_KEY_HEADER)
+        if api_key is not None and api_key in self.settings.api_keys:
+            return f"key:{api_key}", self.settings.api_keys[api_key]
+        # Unknown keys are ignored, or a client could mint itself new quotas
+        return f"ip:{self.client_address(request)}", self.settings.client_requests_per_minute
+
+    def _trusted(self, address: str) -> bool:
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        return any(ip in network for network in self._proxies)
+
+    def client_address(self, request: Request) -> str:
+        """
+        Return the caller's IP address.
+
+        A connection from a trusted proxy is attributed to the address in
+        ``client_ip_header``. Each proxy appends the address it received the
+        request from, so the client is the last address not added by a
+        trusted proxy; earlier entries can be forged by the client.
+        """
+        host = request.client.host if request.client is not None else "unknown"
+        if not self._trusted(host):
+            return host
+        header = request.headers.get(self.settings.client_ip_header)
+        if not header:
+            return host
+        addresses = [address.strip() for address in header.split(",") if address.strip()]
+        for address in reversed(addresses):
+            if not self._trusted(address):
+                return address
+        return addresses[0] if addresses else host
+
+    async def admit(self, request: Request, cost: int = 1):
+        """
+        Charge the caller's quota for ``cost`` lookups.
+
+        Raises:
+            Overloaded: If the caller's bucket does not hold enough tokens
+        """
+        key, per_minute = self.client(request)
+        if per_minute <= 0:
+            return
+        burst = max(self.settings.client_burst, 1)
+        wait = await self.quotas.charge(key, per_minute / 60.0, burst, cost)
+        if wait:
+            ADMISSION_REJECTED.inc("quota")
+            raise Overloaded("Request quota exceeded", wait)
+
+    def close(self):
+        """Close the shared client buckets, if there are any."""
+        if isinstance(self.quotas, SharedKeyedTokenBuckets):
+            self.quotas.close()
+
+
+def retry_after_header(error: Overloaded) -> dict:
+    """The ``Retry-After`` header for a rejected request, in whole seconds."""
+    return {"Retry-After": str(math.ceil(error.retry_after))}
@@ -0,0 +1,225 @@
+"""
+Static assets of the web interface.
+
+The files of the ``web`` directory are read once, compressed (gzip, plus
+brotli when the ``brotli`` package is installed) and served from memory.
+Each file is also available under a content-hashed name such as
+``query.3f2a9c0d1e.js``, which can be cached by browsers for a year because
+its content never changes; ``index.html`` is rewritten to reference these
+names and is served with an ``ETag`` so reloads are answered with
+``304 Not Modified``. The original names keep working and are revalidated
+the same way.
+
+Reading and compressing the files is slow, so it happens when the server
+starts, on reload and, in development, when a watcher sees a change, always
+in a worker thread; requests only look up the prepared responses.
+"""
+
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+INDEX = "index.html"
+# Hashed names never change content, so browsers may keep them for a year
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Everything else may be stored but must be revalidated before use
+REVALIDATE = "no-cache"
+COMPRESSIBLE = {".css", ".html", ".js", ".json", ".svg", ".txt"}
+# Files smaller than this gain nothing from compression
+MIN_COMPRESS_SIZE = 512
+
+
+@dataclass
+class Asset:
+    """One file with its validator and compressed variants."""
+
+    body: bytes
+    media_type: str
+    digest: str
+    encodings: Dict[str, bytes] = field(default_factory=dict)
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.digest}"'
+
+
+def hashed_name(name: str, digest: str) -> str:
+    """Insert the content digest before the extension: ``a/b.js`` -> ``a/b.<digest>.js``."""
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{digest}{ext}"
+
+
+def compress(body: bytes) -> Dict[str, bytes]:
+    """Return the compressed variants of ``body`` that are smaller than it."""
+    variants = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=11)
+    return {name: data for name, data in variants.items() if len(data) < len(body)}
+
+
+def accepted_encodings(header: str) -> set:
+    """Parse an ``Accept-Encoding`` header, ignoring codings refused with ``q=0``."""
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = params.strip().lower()
+        if quality.startswith("q=") and quality[2:].strip() in ("0", "0.0", "0.00", "0.000"):
+            continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def etag_matches(header: str, digest: str) -> bool:
+    """Whether an ``If-None-Match`` header names the current content."""
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        tag = tag[2:] if tag.startswith("W/") else tag
+        # Compressed variants carry the coding as a suffix of the same digest
+        if tag.strip('"').split("-")[0] == digest:
+            return True
+    return False
+
+
+class StaticAssets:
+    """Compressed, content-hashed copies of the files in a directory."""
+
+    def __init__(self, directory: str, prefix: str = "/static"):
+        self.directory = directory
+        self.prefix = prefix
+        self._files: Dict[str, Tuple[Asset, bool]] = {}
+        self._urls: Dict[str, str] = {}
+        self._index: Optional[Asset] = None
+        self._signature: Optional[tuple] = None
+        self._lock = threading.Lock()
+
+    def _scan(self) -> Iterable[Tuple[str, os.stat_result]]:
+        for root, _, files in os.walk(self.directory):
+            for file_name in sorted(files):
+                path = os.path.join(root, file_name)
+                name = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                yield name, os.stat(path)
+
+    def refresh(self) -> None:
+        """
+        Rebuild the assets if a file was added, removed or modified.
+
+        Blocks while the directory is scanned and files are compressed; call it
+        from a worker thread when an event loop is running.
+        """
+        entries = list(self._scan())
+        signature = tuple((name, st.st_mtime_ns, st.st_size) for name, st in entries)
+        if signature == self._signature:
+            return
+        with self._lock:
+            if signature != self._signature:
+                self._build([name for name, _ in entries])
+                self._signature = signature
+
+    def _build(self, names) -> None:
+        files: Dict[str, Tuple[Asset, bool]] = {}
+        urls: Dict[str, str] = {}
+        index_source = None
+        saved = 0
+        for name in names:
+            with open(os.path.join(self.directory, name), "rb") as file:
+                body = file.read()
+            if name == INDEX:
+                index_source = body
+                continue
+            asset = self._make_asset(name, body)
+            saved += len(body) - min(map(len, [body, *asset.encodings.values()]))
+            hashed = hashed_name(name, asset.digest)
+            files[name] = (asset, False)
+            files[hashed] = (asset, True)
+            urls[name] = f"{self.prefix}/{hashed}"
+
+        index = None
+        if index_source is not None:
+            # Point the page at the hashed names so their long lifetime is safe
+            pattern = re.compile(re.escape(self.prefix) + r"/([^\"'()?#\s]+)")
+            html = pattern.sub(
+                lambda match: urls.get(match.group(1), match.group(0)),
+                index_source.decode("utf-8"),
+            )
+            index = self._make_asset(INDEX, html.encode("utf-8"))
+            files[INDEX] = (index, False)
+
+        self._files, self._urls, self._index = files, urls, index
+        logger.info(
+            "Prepared %d static assets, compression saves %d bytes", len(urls), saved
+        )
+
+    @staticmethod
+    def _make_asset(name: str, body: bytes) -> Asset:
+        media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        asset = Asset(body, media_type, hashlib.sha256(body).hexdigest()[:12])
+        if os.path.splitext(name)[1] in COMPRESSIBLE and len(body) >= MIN_COMPRESS_SIZE:
+            asset.encodings = compress(body)
+        return asset
+
+    def _ensure_built(self) -> None:
+        # Only when nothing built the assets at startup, as in some tests
+        if self._signature is None:
+            self.refresh()
+
+    def url(self, name: str) -> str:
+        """Return the hashed URL of a file, e.g. ``/static/query.<digest>.js``."""
+        self._ensure_built()
+        return self._urls.get(name, f"{self.prefix}/{name}")
+
+    def index(self, request: Request) -> Response:
+        """Serve the rewritten ``index.html`` as of the last ``refresh``."""
+        self._ensure_built()
+        if self._index is None:
+            raise HTTPException(status_code=404, detail="Not Found")
+        return self.respond(self._index, request, immutable=False)
+
+    def file(self, name: str, request: Request) -> Response:
+        """Serve a file by its original or hashed name."""
+        self._ensure_built()
+        found = self._files.get(name)
+        if found is None:
+            raise HTTPException(status_code=404, detail="Not Found")
+        asset, immutable = found
+        return self.respond(asset, request, immutable)
+
+    @staticmethod
+    def respond(asset: Asset, request: Request, immutable: bool) -> Response:
+        """Build the response for ``asset``, negotiating encoding and validation."""
+        headers = {
+            "Cache-Control": IMMUTABLE if immutable else REVALIDATE,
+            "Vary": "Accept-Encoding",
+        }
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, asset.digest):
+            headers["ETag"] = asset.etag
+            return Response(status_code=304, headers=headers)
+
+        body, etag = asset.body, asset.etag
+        if asset.encodings:
+            accepted = accepted_encodings(request.headers.get("accept-encoding", ""))
+            for coding in ("br", "gzip"):
+                if coding in asset.encodings and coding in accepted:
+                    body, etag = asset.encodings[coding], f'"{asset.digest}-{coding}"'
+                    headers["Content-Encoding"] = coding
+                    break
+        headers["ETag"] = etag
+        return Response(body, media_type=asset.media_type, headers=headers)
@@ -0,0 +1,300 @@
+"""
+Response cache for the regulation extraction application.
+
+Successful lookups are kept in a small in-memory LRU tier backed by a SQLite
+file, so repeated product/market queries skip the OpenAI call and survive
+server restarts. Entries expire after a configurable TTL because regulations
+change over time. Callers may ask for a shorter maximum age per lookup, which
+lets markets whose rules change more often expire sooner.
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from app.models import ConfigSettings, MarketRequirementsResponse
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(value: str) -> str:
+    """Lower-case a query term and collapse surrounding/repeated whitespace."""
+    return " ".join(value.split()).lower()
+
+
+def make_cache_key(
+    product_type: str, market: str, detailed: bool, model: str, prompt_version: str
+) -> str:
+    """
+    Build the cache key for a requirements lookup.
+
+    Args:
+        product_type (str): The type of product
+        market (str): The target market
+        detailed (bool): Whether a detailed answer was requested
+        model (str): The model used for the completion
+        prompt_version (str): Version of the prompt template
+
+    Returns:
+        str: Stable key for the normalized lookup
+    """
+    return json.dumps(
+        [
+            normalize_text(product_type),
+            normalize_text(market),
+            bool(detailed),
+            model,
+            prompt_version,
+        ]
+    )
+
+
+def market_ttls(settings: ConfigSettings, market: str) -> Tuple[float, float]:
+    """
+    Return the soft and hard TTL of answers for ``market``.
+
+    Answers older than the soft TTL are still served but refreshed in the
+    background; answers older than the hard TTL are not served at all.
+    ``cache_market_ttls`` overrides either value per market.
+
+    Returns:
+        tuple: (soft TTL, hard TTL) in seconds
+    """
+    override = {
+        normalize_text(name): ttls for name, ttls in settings.cache_market_ttls.items()
+    }.get(normalize_text(market), {})
+    hard = override.get("ttl_seconds", settings.cache_ttl_seconds)
+    soft = override.get("soft_ttl_seconds", settings.cache_soft_ttl_seconds)
+    return min(soft, hard), hard
+
+
+def longest_ttl(settings: ConfigSettings) -> float:
+    """Return the longest hard TTL of any market, which bounds what the cache keeps."""
+    return max(
+        [settings.cache_ttl_seconds]
+        + [
+            ttls.get("ttl_seconds", settings.cache_ttl_seconds)
+            for ttls in settings.cache_market_ttls.values()
+        ]
+    )
+
+
+class ResponseCache:
+    """
+    Two-tier (memory LRU + SQLite) cache of successful responses.
+
+    ``get_with_age`` and ``set`` block on SQLite, which another process may
+    hold locked for a moment. Coroutines use ``aget_with_age`` and ``aset``
+    instead: the memory tier is served directly and the SQLite part runs in a
+    worker thread. The memory lock is never held during SQLite calls, so
+    taking it on the event loop does not wait on disk.
+
+    Processes sharing the file each have their own memory tier, so an entry
+    remembered here may have been replaced in SQLite by another process.
+    Lookups can ask for memory entries past a given age to be compared with
+    the SQLite row, which keeps every process from refreshing the same stale
+    answer.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float, max_memory_entries: int = 1000):
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_entries = max_memory_entries
+        self._memory: "OrderedDict[str, Tuple[float, MarketRequirementsResponse]]" = (
+            OrderedDict()
+        )
+        # Guards the memory tier and the stats; _db_lock guards the connection
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+        }
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute(
+            "DELETE FROM responses WHERE created_at < ?", (time.time() - ttl_seconds,)
+        )
+        self._db.commit()
+
+    def _is_fresh(self, created_at: float, max_age: float) -> bool:
+        return time.time() - created_at < max_age
+
+    def _max_age(self, max_age: Optional[float]) -> float:
+        return min(max_age, self.ttl_seconds) if max_age is not None else self.ttl_seconds
+
+    def _remember(self, key: str, created_at: float, response: MarketRequirementsResponse):
+        current = self._memory.get(key)
+        if current is not None and current[0] > created_at:
+            # A newer answer was stored while this one was being read
+            return
+        self._memory[key] = (created_at, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _memory_get(
+        self, key: str, max_age: float
+    ) -> Optional[Tuple[MarketRequirementsResponse, float]]:
+        """Return the memory entry as (response, created_at), or None."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            created_at, response = entry
+            if self._is_fresh(created_at, max_age):
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return response, created_at
+            if not self._is_fresh(created_at, self.ttl_seconds):
+                del self._memory[key]
+            return None
+
+    def _disk_get(
+        self, key: str, max_age: float, newer_than: Optional[float] = None
+    ) -> Optional[Tuple[MarketRequirementsResponse, float]]:
+        """
+        Return the SQLite row as (response, created_at), or None.
+
+        With ``newer_than`` only a row stored after that time is returned, and
+        not finding one is not counted as a miss.
+        """
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT payload, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and not self._is_fresh(row[1], self.ttl_seconds):
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+        if newer_than is not None:
+            if row is None or row[1] <= newer_than:
+                return None
+        elif row is None or not self._is_fresh(row[1], max_age):
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+        payload, created_at = row
+        response = MarketRequirementsResponse.model_validate_json(payload)
+        with self._lock:
+            self._remember(key, created_at, response)
+            if newer_than is None:
+                self.stats["disk_hits"] += 1
+        return response, created_at
+
+    def _needs_recheck(self, entry, recheck_age: Optional[float]) -> bool:
+        return entry is not None and recheck_age is not None and not self._is_fresh(
+            entry[1], recheck_age
+        )
+
+    def _with_age(self, entry) -> Optional[Tuple[MarketRequirementsResponse, float]]:
+        return (entry[0], time.time() - entry[1]) if entry is not None else None
+
+    def get(
+        self, key: str, max_age: Optional[float] = None
+    ) -> Optional[MarketRequirementsResponse]:
+        """
+        Look up a cached response.
+
+        Args:
+            key (str): Key built by ``make_cache_key``
+            max_age (float): Treat entries older than this as expired
+                (default: the cache TTL)
+
+        Returns:
+            Optional[MarketRequirementsResponse]: The cached response, or None on
+            a miss or when the entry has expired
+        """
+        entry = self.get_with_age(key, max_age)
+        return entry[0] if entry is not None else None
+
+    def get_with_age(
+        self, key: str, max_age: Optional[float] = None, recheck_age: Optional[float] = None
+    ) -> Optional[Tuple[MarketRequirementsResponse, float]]:
+        """
+        Look up a cached response and how long ago it was stored.
+
+        Args:
+            key (str): Key built by ``make_cache_key``
+            max_age (float): Treat entries older than this as misses
+                (default: the cache TTL). Only entries older than the cache
+                TTL are removed.
+            recheck_age (float): Compare memory entries at least this old
+                with the SQLite row and use the row if it is newer, such as
+                one refreshed by another process (default: never)
+
+        Returns:
+            Optional[Tuple[MarketRequirementsResponse, float]]: The cached
+            response and its age in seconds, or None on a miss
+        """
+        max_age = self._max_age(max_age)
+        entry = self._memory_get(key, max_age)
+        if entry is None:
+            entry = self._disk_get(key, max_age)
+        elif self._needs_recheck(entry, recheck_age):
+            entry = self._disk_get(key, max_age, newer_than=entry[1]) or entry
+        return self._with_age(entry)
+
+    async def aget_with_age(
+        self, key: str, max_age: Optional[float] = None, recheck_age: Optional[float] = None
+    ) -> Optional[Tuple[MarketRequirementsResponse, float]]:
+        """``get_with_age`` reading SQLite in a worker thread."""
+        max_age = self._max_age(max_age)
+        entry = self._memory_get(key, max_age)
+        if entry is None:
+            entry = await asyncio.to_thread(self._disk_get, key, max_age)
+        elif self._needs_recheck(entry, recheck_age):
+            newer = await asyncio.to_thread(self._disk_get, key, max_age, entry[1])
+            entry = newer or entry
+        return self._with_age(entry)
+
+    def _write(self, key: str, response: MarketRequirementsResponse, created_at: float):
+        payload = response.model_dump_json()
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, payload, created_at) VALUES (?, ?, ?)",
+                (key, payload, created_at),
+            )
+            self._db.commit()
+
+    def _store(self, key: str, response: MarketRequirementsResponse) -> float:
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, created_at, response)
+            self.stats["stores"] += 1
+        return created_at
+
+    def set(self, key: str, response: MarketRequirementsResponse):
+        """
+        Store a successful response in both tiers.
+
+        Args:
+            key (str): Key built by ``make_cache_key``
+            response (MarketRequirementsResponse): Validated response to store
+        """
+        self._write(key, response, self._store(key, response))
+
+    async def aset(self, key: str, response: MarketRequirementsResponse):
+        """``set`` writing SQLite in a worker thread."""
+        await asyncio.to_thread(self._write, key, response, self._store(key, response))
+
+    def close(self):
+        """Close the SQLite connection."""
+        with self._db_lock:
+            self._db.close()
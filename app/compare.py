@@ -0,0 +1,132 @@
+"""
+Comparison of one product's requirements across markets.
+
+Answers for different markets name the same requirement differently
+("UN 38.3", "UN 38.3 Transport Testing", "Lithium battery transport (UN38.3)"),
+so requirements are matched on a key: the standard or legal act they cite
+when there is exactly one, otherwise their name without punctuation and
+parenthesized remarks. A single pass over all answers builds an index from
+key to the set of markets (a bit mask) it appears in, from which the shared
+and market-specific requirements follow without comparing answers pairwise.
+"""
+
+import re
+import time
+from functools import lru_cache
+from typing import Dict, List
+
+from app.models import MarketComparisonResponse, MarketRequirementsResponse
+
+# Standards bodies followed by a document number: "IEC 62133-2:2017", "EN 71-1",
+# "ETSI EN 301 489-1" (a space only continues the number before three digits)
+STANDARD = (
+    r"(?P<body>IEC|EN|ISO|UN|UL|ASTM|ANSI|IEEE|CISPR|ETSI EN|GB|GB/T|JIS|KS|AS/NZS|BS|DIN|CSA)"
+    r" ?(?P<number>[A-Z]?\d+(?:(?:[.\-]| (?=\d{3}\b))\d+)*)"
+)
+# EU directives and regulations: "2014/53/EU", "(EU) 2023/648", "(EC 1907/2006)"
+EU_ACT = r"(?P<act>\d{2,4}/\d{1,4})(?:/(?:EU|EC|EEC)\b)?"
+# US federal regulations: "49 CFR 173.185", "FCC Part 15"
+CFR = r"(?P<title>\d+) ?CFR ?(?:Part )?(?P<section>\d+(?:\.\d+)*)"
+FCC = r"FCC Part (?P<part>\d+)"
+IDENTIFIER = re.compile(rf"\b(?:{STANDARD}|{CFR}|{FCC}|{EU_ACT})")
+
+PARENTHESIZED = re.compile(r"\([^)]*\)")
+NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def identifiers(name: str) -> List[str]:
+    """Return the normalized standard and regulation identifiers cited in a name."""
+    found = []
+    for match in IDENTIFIER.finditer(" ".join(name.split())):
+        if match.group("body"):
+            found.append(f"{match.group('body')} {match.group('number')}")
+        elif match.group("title"):
+            found.append(f"{match.group('title')} CFR {match.group('section')}")
+        elif match.group("part"):
+            found.append(f"FCC Part {match.group('part')}")
+        else:
+            found.append(f"EU {match.group('act')}")
+    return found
+
+
+@lru_cache(maxsize=65536)
+def requirement_key(name: str) -> str:
+    """
+    Return the key that identifies a requirement across answers.
+
+    A name citing exactly one identifier is keyed by it, so "UN 38.3" and
+    "Lithium battery transport testing (UN 38.3)" match. Names citing none,
+    or several (umbrella requirements such as "CE marking (RED, LVD, EMC)"),
+    are keyed by their lower-cased words outside parentheses.
+    """
+    cited = set(identifiers(name))
+    if len(cited) == 1:
+        return cited.pop()
+    words = NON_WORD.sub(" ", PARENTHESIZED.sub(" ", name).lower()).split()
+    return " ".join(words) or name.strip().lower()
+
+
+def compare_answers(
+    product_type: str, answers: List[MarketRequirementsResponse]
+) -> MarketComparisonResponse:
+    """
+    Build the matrix of deduplicated requirements against markets.
+
+    Args:
+        product_type (str): The product the answers are for
+        answers (List[MarketRequirementsResponse]): One answer per market
+
+    Returns:
+        MarketComparisonResponse: Requirements shared by every market first,
+        then by the number of markets they apply to, then in answer order
+    """
+    start = time.perf_counter()
+    markets = [answer.market for answer in answers]
+    # key -> [first requirement seen, bit mask of the markets citing it]
+    index: Dict[str, list] = {}
+    for position, answer in enumerate(answers):
+        bit = 1 << position
+        for requirement in answer.requirements:
+            key = requirement_key(requirement.name)
+            entry = index.get(key)
+            if entry is None:
+                index[key] = [requirement, bit]
+            else:
+                entry[1] |= bit
+
+    everywhere = (1 << len(answers)) - 1
+    # Most requirements share a handful of masks, so positions are worked out once per mask
+    positions: Dict[int, List[int]] = {}
+    for _, mask in index.values():
+        if mask not in positions:
+            positions[mask] = [bit for bit in range(mask.bit_length()) if mask >> bit & 1]
+    rows = sorted(index.items(), key=lambda item: -len(positions[item[1][1]]))
+
+    requirements = []
+    shared = []
+    market_specific: Dict[str, List[str]] = {market: [] for market in markets}
+    for key, (requirement, mask) in rows:
+        requirements.append(
+            {
+                "key": key,
+                "name": requirement.name,
+                "category": requirement.category,
+                "present_in": positions[mask],
+            }
+        )
+        if mask == everywhere:
+            shared.append(key)
+        elif mask & (mask - 1) == 0:
+            market_specific[markets[mask.bit_length() - 1]].append(key)
+
+    # One validation of the whole result is much cheaper than a model per row
+    return MarketComparisonResponse.model_validate(
+        {
+            "product_type": product_type,
+            "markets": markets,
+            "requirements": requirements,
+            "shared": shared,
+            "market_specific": market_specific,
+            "elapsed_ms": (time.perf_counter() - start) * 1000,
+        }
+    )
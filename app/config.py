@@ -11,17 +11,25 @@ from app.models import ConfigSettings
 logger = logging.getLogger(__name__)
 
 
+def get_config_path() -> str:
+    """Return the path of the YAML configuration file."""
+    return os.getenv("CONFIG_PATH", "config.yaml")
+
+
 def load_config() -> ConfigSettings:
     """
     Load configuration from YAML file.
 
+    Called once at startup and again on reload; requests use the resulting
+    immutable settings instead of reading the file themselves.
+
     Returns:
         ConfigSettings: Configuration settings
 
     Raises:
         HTTPException: If config file is not found or is invalid
     """
-    config_path = os.getenv("CONFIG_PATH", "config.yaml")
+    config_path = get_config_path()
 
     if not os.path.exists(config_path):
         logger.error(f"Config file not found at {config_path}")
@@ -31,21 +39,24 @@ def load_config() -> ConfigSettings:
 
     try:
         with open(config_path, "r") as file:
-            config_data = yaml.safe_load(file)
-
-        settings = ConfigSettings()
-        settings.openai_api_key = config_data.get("openai_api_key")
-        settings.model = config_data.get("model", "gpt-4o-search-preview")
-        settings.max_tokens = config_data.get("max_tokens", 2000)
-        settings.temperature = config_data.get("temperature", 0.2)
-
-        if not settings.openai_api_key:
-            logger.error("OpenAI API key not found in config")
-            raise HTTPException(
-                status_code=500, detail="OpenAI API key not found in config"
-            )
-
-        return settings
+            config_data = yaml.safe_load(file) or {}
+
+        # Unknown keys are ignored; missing keys fall back to the model defaults
+        settings = ConfigSettings(
+            **{
+                key: value
+                for key, value in config_data.items()
+                if key in ConfigSettings.model_fields and value is not None
+            }
+        )
     except Exception as e:
         logger.error(f"Error loading config: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error loading config: {str(e)}")
+
+    if not settings.openai_api_key:
+        logger.error("OpenAI API key not found in config")
+        raise HTTPException(
+            status_code=500, detail="OpenAI API key not found in config"
+        )
+
+    return settings
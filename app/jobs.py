@@ -0,0 +1,354 @@
+"""
+Background jobs for the regulation extraction application.
+
+Detailed lookups can take longer than a load balancer keeps a connection
+open. They can instead be submitted as jobs: the caller gets a job ID at once,
+a fixed pool of worker tasks works through the queue, and the caller polls
+(or long-polls) for the result. Jobs are kept in SQLite so queued and
+interrupted work is picked up again after a restart.
+
+Several server processes may share one job file. A job runs in the process
+it was submitted to; the store records which process is running it, so a
+process that starts later only requeues jobs whose owner has exited, and a
+job queued in more than one process is claimed by exactly one of them.
+Another process may hold the file locked for a moment, so the queue reads
+and writes the store in a worker thread rather than on the event loop.
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.metrics import JOB_QUEUE_DEPTH, JOB_RUN_SECONDS, JOB_WAIT_SECONDS, JOBS
+from app.models import JobStatus, MarketRequirementsRequest, MarketRequirementsResponse
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+
+def process_alive(pid: Optional[int]) -> bool:
+    """Whether ``pid`` is another running process on this host."""
+    if not pid or pid == os.getpid():
+        # A job owned by this process's PID was left by an earlier process
+        return False
+    if os.name == "nt":
+        # os.kill would terminate the process on Windows
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+class JobStore:
+    """SQLite table of jobs, their requests and their results."""
+
+    def __init__(self, path: str, result_ttl_seconds: float):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                request TEXT NOT NULL,
+                status TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                owner INTEGER
+            )
+            """
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        if "owner" not in columns:
+            self._db.execute("ALTER TABLE jobs ADD COLUMN owner INTEGER")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+        # Finished jobs are kept long enough for their results to be collected
+        self._db.execute(
+            "DELETE FROM jobs WHERE finished_at < ?", (time.time() - result_ttl_seconds,)
+        )
+        self._db.commit()
+
+    def create(self, request: MarketRequirementsRequest) -> JobStatus:
+        """Store a new queued job for ``request``."""
+        job = JobStatus(
+            job_id=uuid.uuid4().hex,
+            status=QUEUED,
+            request=request,
+            created_at=time.time(),
+        )
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, request, status, created_at) VALUES (?, ?, ?, ?)",
+                (job.job_id, request.model_dump_json(), QUEUED, job.created_at),
+            )
+            self._db.commit()
+        return job
+
+    def get(self, job_id: str) -> Optional[JobStatus]:
+        """
+        Look up a job.
+
+        Args:
+            job_id (str): ID returned when the job was submitted
+
+        Returns:
+            Optional[JobStatus]: The job, or None if it is unknown or expired
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, request, status, result, error, created_at, started_at,"
+                " finished_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        job_id, request, status, result, error, created_at, started_at, finished_at = row
+        return JobStatus(
+            job_id=job_id,
+            status=status,
+            request=MarketRequirementsRequest.model_validate_json(request),
+            created_at=created_at,
+            started_at=started_at,
+            finished_at=finished_at,
+            result=(
+                MarketRequirementsResponse.model_validate_json(result) if result else None
+            ),
+            error=error,
+        )
+
+    def mark_running(self, job_id: str) -> Optional[float]:
+        """
+        Claim a queued job for this process.
+
+        Returns:
+            Optional[float]: The start time, or None if the job is no longer
+            queued (another process claimed it first)
+        """
+        started_at = time.time()
+        with self._lock:
+            claimed = self._db.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, owner = ?"
+                " WHERE id = ? AND status = ?",
+                (RUNNING, started_at, os.getpid(), job_id, QUEUED),
+            ).rowcount
+            self._db.commit()
+        return started_at if claimed else None
+
+    def mark_finished(
+        self,
+        job_id: str,
+        result: Optional[MarketRequirementsResponse] = None,
+        error: Optional[str] = None,
+    ):
+        """Store the result of a job, or the error that ended it."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?"
+                " WHERE id = ?",
+                (
+                    FAILED if error is not None else SUCCEEDED,
+                    result.model_dump_json() if result is not None else None,
+                    error,
+                    time.time(),
+                    job_id,
+                ),
+            )
+            self._db.commit()
+
+    def unfinished(self) -> List[JobStatus]:
+        """
+        Return jobs that were queued or interrupted, oldest first.
+
+        Jobs left ``running`` by a process that has exited are reset to
+        ``queued``; jobs running in live processes are left alone.
+        """
+        with self._lock:
+            running = self._db.execute(
+                "SELECT id, owner FROM jobs WHERE status = ?", (RUNNING,)
+            ).fetchall()
+            interrupted = [(job_id,) for job_id, owner in running if not process_alive(owner)]
+            self._db.executemany(
+                "UPDATE jobs SET status = ?, started_at = NULL, owner = NULL WHERE id = ?",
+                [(QUEUED, job_id) for (job_id,) in interrupted],
+            )
+            self._db.commit()
+            ids = [
+                row[0]
+                for row in self._db.execute(
+                    "SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (QUEUED,)
+                )
+            ]
+        return [job for job in map(self.get, ids) if job is not None]
+
+    def close(self):
+        """Close the SQLite connection."""
+        with self._lock:
+            self._db.close()
+
+
+class JobQueue:
+    """
+    Run stored jobs on a bounded pool of worker tasks.
+
+    Args:
+        store (JobStore): Where jobs and results are persisted
+        run: Coroutine function answering a request; exceptions fail the job
+        workers (int): Number of jobs run at the same time
+        poll_interval (float): How often ``wait`` rereads the store, which
+            notices jobs finished by other processes
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        run: Callable[[MarketRequirementsRequest], Awaitable[MarketRequirementsResponse]],
+        workers: int,
+        poll_interval: float = 1.0,
+    ):
+        self.store = store
+        self._run = run
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._queue: "asyncio.Queue[JobStatus]" = asyncio.Queue()
+        self._done_events: Dict[str, asyncio.Event] = {}
+        self._waiters: Dict[str, int] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._draining = False
+        self._active = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def depth(self) -> int:
+        """Return the number of jobs waiting for a worker."""
+        return self._queue.qsize()
+
+    def start(self):
+        """
+        Requeue unfinished jobs from the store and start the workers.
+
+        Runs once at startup, before requests are served, so the store is
+        read directly.
+        """
+        for job in self.store.unfinished():
+            self._queue.put_nowait(job)
+        if self.depth():
+            logger.info("Resuming %d queued jobs", self.depth())
+        JOB_QUEUE_DEPTH.set(self.depth())
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 0):
+        """
+        Stop the workers.
+
+        Workers stop taking new jobs and jobs already running get up to
+        ``timeout`` seconds to finish. Jobs still running after that are left
+        marked as running in the store and are queued again by the next
+        ``start``.
+        """
+        self._draining = True
+        if timeout > 0 and self._active:
+            logger.info("Waiting up to %.0fs for %d running jobs", timeout, self._active)
+            try:
+                await asyncio.wait_for(self._idle.wait(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("%d jobs still running at shutdown", self._active)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, request: MarketRequirementsRequest) -> JobStatus:
+        """Store and enqueue a lookup, returning the queued job."""
+        job = await asyncio.to_thread(self.store.create, request)
+        self._queue.put_nowait(job)
+        JOB_QUEUE_DEPTH.set(self.depth())
+        return job
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[JobStatus]:
+        """
+        Return the job once it has finished or ``timeout`` seconds have passed.
+
+        Args:
+            job_id (str): ID of the job
+            timeout (float): Longest time to wait; 0 returns the current state
+
+        Returns:
+            Optional[JobStatus]: The job, or None if it is unknown
+        """
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job is None or job.status in FINISHED or timeout <= 0:
+            return job
+        event = self._done_events.setdefault(job_id, asyncio.Event())
+        self._waiters[job_id] = self._waiters.get(job_id, 0) + 1
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                try:
+                    await asyncio.wait_for(event.wait(), min(remaining, self.poll_interval))
+                except asyncio.TimeoutError:
+                    pass
+                job = await asyncio.to_thread(self.store.get, job_id)
+                if job is None or job.status in FINISHED or remaining <= self.poll_interval:
+                    return job
+        finally:
+            # Jobs run by another process never set the event, so the last
+            # waiter removes it
+            self._waiters[job_id] -= 1
+            if not self._waiters[job_id]:
+                del self._waiters[job_id]
+                self._done_events.pop(job_id, None)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            JOB_QUEUE_DEPTH.set(self.depth())
+            if self._draining:
+                # Left queued in the store for the next start
+                continue
+            started_at = await asyncio.to_thread(self.store.mark_running, job.job_id)
+            if started_at is None:
+                continue
+            JOB_WAIT_SECONDS.observe(started_at - job.created_at)
+            self._active += 1
+            self._idle.clear()
+            try:
+                with JOB_RUN_SECONDS.time():
+                    result = await self._run(job.request)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Job %s failed: %s", job.job_id, e)
+                await asyncio.to_thread(self.store.mark_finished, job.job_id, error=str(e))
+                JOBS.inc(FAILED)
+            else:
+                await asyncio.to_thread(self.store.mark_finished, job.job_id, result=result)
+                JOBS.inc(SUCCEEDED)
+            finally:
+                self._active -= 1
+                if self._active == 0:
+                    self._idle.set()
+                event = self._done_events.pop(job.job_id, None)
+                if event is not None:
+                    event.set()
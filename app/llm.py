@@ -0,0 +1,395 @@
+"""
+Shared OpenAI client for the regulation extraction application.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Union
+
+import httpx
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    APITimeoutError,
+    AsyncOpenAI,
+    InternalServerError,
+    RateLimitError,
+)
+
+from app.metrics import (
+    LLM_IN_FLIGHT,
+    LLM_QUOTA_WAIT_SECONDS,
+    LLM_REQUEST_SECONDS,
+    LLM_REQUEST_TOKENS,
+    LLM_RETRIES,
+    LLM_TOKENS,
+)
+from app.models import ConfigSettings
+from app.prompts import RESPONSE_FORMATS
+from app.ratelimit import SharedTokenBucket, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Upstream failures worth another attempt; APITimeoutError subclasses
+# APIConnectionError but is listed for clarity
+RETRYABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+
+Prompt = Union[str, List[Dict[str, str]]]
+
+
+def is_search_model(model: str) -> bool:
+    """Whether the model searches the web (e.g. ``gpt-4o-search-preview``)."""
+    return "search" in model
+
+
+def resolve_json_mode(settings: ConfigSettings) -> Optional[str]:
+    """
+    Pick the JSON response mode for the configured model.
+
+    ``auto`` uses strict structured output, except for web search models,
+    which do not accept ``response_format`` and answer in free text.
+
+    Returns:
+        Optional[str]: ``json_schema``, ``json_object``, or None for free text
+    """
+    mode = settings.llm_json_mode
+    if mode == "auto":
+        return None if is_search_model(settings.model) else "json_schema"
+    return mode if mode in RESPONSE_FORMATS else None
+
+
+def completion_options(settings: ConfigSettings) -> dict:
+    """Build the request parameters shared by every completion for ``settings``."""
+    options = {"max_tokens": settings.max_tokens}
+    if is_search_model(settings.model):
+        # Search models reject sampling parameters such as temperature
+        options["web_search_options"] = {}
+    else:
+        options["temperature"] = settings.temperature
+    json_mode = resolve_json_mode(settings)
+    if json_mode is not None:
+        options["response_format"] = RESPONSE_FORMATS[json_mode]
+    return options
+
+
+def as_messages(prompt: Prompt) -> List[Dict[str, str]]:
+    """Wrap a plain prompt string as a single user message."""
+    if isinstance(prompt, str):
+        return [{"role": "user", "content": prompt}]
+    return prompt
+
+
+class DeadlineExceeded(Exception):
+    """A completion could not be finished within the configured deadline."""
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """
+    Read the delay requested by the upstream API from a failed call.
+
+    Args:
+        error (Exception): Error raised by the OpenAI client
+
+    Returns:
+        Optional[float]: Seconds from ``retry-after-ms`` or ``Retry-After``
+        (delta-seconds or HTTP date), or None when absent or unparsable
+    """
+    if not isinstance(error, APIStatusError):
+        return None
+    headers = error.response.headers
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def make_bucket(settings: ConfigSettings, name: str, per_minute: int):
+    """
+    Build the quota bucket for ``per_minute`` units, or None if unlimited.
+
+    With ``rate_limit_path`` set the bucket lives in that SQLite file and is
+    shared by every process using it (server workers and warm-up runs);
+    otherwise it is local to this process.
+    """
+    if per_minute <= 0:
+        return None
+    if settings.rate_limit_path:
+        return SharedTokenBucket.per_minute(settings.rate_limit_path, name, per_minute)
+    return TokenBucket.per_minute(per_minute)
+
+
+class LLMClient:
+    """
+    Long-lived async OpenAI client with a bounded connection pool.
+
+    One instance is created at application startup and shared by every request.
+    The semaphore caps how many completions are in flight at once so a burst of
+    requests queues locally instead of opening an unbounded number of upstream
+    connections.
+
+    Each completion must finish within ``llm_deadline`` seconds. Transient
+    failures (429, 5xx, timeouts, connection errors) are retried with jittered
+    exponential backoff, honouring Retry-After. Optional token buckets sized to
+    the requests-per-minute and tokens-per-minute quotas delay calls until
+    quota is available.
+
+    ``max_tokens``, ``temperature`` and, where the model supports it, a JSON
+    response format are applied to every completion; ``json_mode`` tells
+    callers whether answers are guaranteed to be bare JSON.
+
+    ``requests_per_minute`` additionally caps this client's own requests with
+    a bucket local to the process. The configured quota still applies, so a
+    warm-up run can go slower than the server without changing the budget it
+    shares with the server's workers.
+    """
+
+    def __init__(
+        self,
+        settings: ConfigSettings,
+        http_client: Optional[httpx.AsyncClient] = None,
+        requests_per_minute: Optional[int] = None,
+    ):
+        self.settings = settings
+        self._http_client = http_client or httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.max_connections,
+                max_keepalive_connections=settings.max_connections,
+            ),
+            timeout=None,
+        )
+        self.client = AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            base_url=settings.openai_base_url,
+            http_client=self._http_client,
+            # Retries are handled here so they respect the deadline and quotas
+            max_retries=0,
+        )
+        self._options = completion_options(settings)
+        self.json_mode = resolve_json_mode(settings)
+        self._semaphore = asyncio.Semaphore(settings.max_concurrent_requests)
+        self._request_bucket = make_bucket(
+            settings, "requests", settings.llm_requests_per_minute
+        )
+        self._token_bucket = make_bucket(settings, "tokens", settings.llm_tokens_per_minute)
+        self._own_bucket = (
+            TokenBucket.per_minute(requests_per_minute) if requests_per_minute else None
+        )
+        self._active = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def retain(self):
+        """Mark the client as in use, so a reload does not close it yet."""
+        self._active += 1
+        self._idle.clear()
+
+    def release(self):
+        """End a use started with ``retain``."""
+        self._active -= 1
+        if self._active == 0:
+            self._idle.set()
+
+    @contextmanager
+    def in_use(self):
+        """Keep the client open for the duration of the ``with`` block."""
+        self.retain()
+        try:
+            yield self
+        finally:
+            self.release()
+
+    def estimate_tokens(self, messages: List[Dict[str, str]]) -> int:
+        """Rough token cost of a call: ~4 characters per prompt token plus the completion limit."""
+        prompt_chars = sum(len(message["content"]) for message in messages)
+        return prompt_chars // 4 + self.settings.max_tokens
+
+    async def _record_usage(self, usage, estimated_tokens: int):
+        if usage is not None:
+            LLM_TOKENS.inc("prompt", amount=usage.prompt_tokens)
+            LLM_TOKENS.inc("completion", amount=usage.completion_tokens)
+            LLM_REQUEST_TOKENS.observe(usage.prompt_tokens, "prompt")
+            LLM_REQUEST_TOKENS.observe(usage.completion_tokens, "completion")
+            logger.info(
+                "Completion used %d prompt + %d completion tokens",
+                usage.prompt_tokens,
+                usage.completion_tokens,
+            )
+            if self._token_bucket is not None:
+                # Settle the quota with the actual usage
+                await self._token_bucket.settle(usage.total_tokens - estimated_tokens)
+
+    def _backoff_delay(self, attempt: int, error: Exception) -> float:
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            return retry_after
+        # Full jitter: uniform in [0, base * 2^attempt], capped
+        ceiling = min(
+            self.settings.llm_backoff_max,
+            self.settings.llm_backoff_base * (2 ** (attempt - 1)),
+        )
+        return random.uniform(0, ceiling)
+
+    async def _acquire_quota(self, estimated_tokens: int, max_wait: float):
+        waited = 0.0
+        if self._own_bucket is not None:
+            waited += await self._own_bucket.acquire(1, max_wait)
+        if self._request_bucket is not None:
+            waited += await self._request_bucket.acquire(1, max_wait - waited)
+        if self._token_bucket is not None:
+            waited += await self._token_bucket.acquire(estimated_tokens, max_wait - waited)
+        if waited:
+            LLM_QUOTA_WAIT_SECONDS.observe(waited)
+
+    async def _request(self, estimated_tokens: int, **kwargs):
+        """
+        Send one completion request with quotas, retries and the deadline applied.
+
+        Raises:
+            DeadlineExceeded: If the deadline passes while waiting or calling
+            OpenAIError: If a non-retryable error occurs or retries are exhausted
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.settings.llm_deadline
+        attempt = 0
+        while True:
+            try:
+                await self._acquire_quota(estimated_tokens, deadline - loop.time())
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                return await asyncio.wait_for(
+                    self.client.chat.completions.create(
+                        model=self.settings.model,
+                        timeout=min(self.settings.llm_timeout, remaining),
+                        **self._options,
+                        **kwargs,
+                    ),
+                    remaining,
+                )
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded(
+                    f"No completion within {self.settings.llm_deadline}s deadline"
+                ) from None
+            except RETRYABLE_ERRORS as e:
+                attempt += 1
+                delay = self._backoff_delay(attempt, e)
+                if (
+                    attempt > self.settings.llm_max_retries
+                    or loop.time() + delay >= deadline
+                ):
+                    raise
+                LLM_RETRIES.inc(type(e).__name__)
+                logger.warning(
+                    "Retrying completion in %.2fs after %s (attempt %d)",
+                    delay,
+                    type(e).__name__,
+                    attempt,
+                )
+                await asyncio.sleep(delay)
+
+    async def create_completion(self, prompt: Prompt):
+        """
+        Run a single chat completion for the given prompt.
+
+        Args:
+            prompt: Chat messages, or a plain string sent as the user message
+
+        Returns:
+            ChatCompletion: The raw completion returned by the OpenAI API
+        """
+        self.retain()
+        try:
+            async with self._semaphore:
+                LLM_IN_FLIGHT.inc()
+                start = time.perf_counter()
+                outcome = "error"
+                messages = as_messages(prompt)
+                estimated_tokens = self.estimate_tokens(messages)
+                try:
+                    response = await self._request(
+                        estimated_tokens,
+                        messages=messages,
+                    )
+                    outcome = "success"
+                finally:
+                    LLM_IN_FLIGHT.dec()
+                    LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, outcome)
+                await self._record_usage(response.usage, estimated_tokens)
+                return response
+        finally:
+            self.release()
+
+    async def stream_completion(self, prompt: Prompt):
+        """
+        Stream a chat completion for the given prompt.
+
+        Args:
+            prompt: Chat messages, or a plain string sent as the user message
+
+        Yields:
+            str: Content fragments in the order they are generated
+        """
+        self.retain()
+        try:
+            async with self._semaphore:
+                LLM_IN_FLIGHT.inc()
+                start = time.perf_counter()
+                outcome = "error"
+                messages = as_messages(prompt)
+                estimated_tokens = self.estimate_tokens(messages)
+                try:
+                    # Only opening the stream is retried; content already
+                    # yielded cannot be taken back
+                    stream = await self._request(
+                        estimated_tokens,
+                        messages=messages,
+                        stream=True,
+                        stream_options={"include_usage": True},
+                    )
+                    try:
+                        async for chunk in stream:
+                            if chunk.choices and chunk.choices[0].delta.content:
+                                yield chunk.choices[0].delta.content
+                            # The final chunk carries usage and no choices
+                            await self._record_usage(chunk.usage, estimated_tokens)
+                    finally:
+                        # Release the connection if the consumer stops early
+                        await stream.close()
+                    outcome = "success"
+                finally:
+                    LLM_IN_FLIGHT.dec()
+                    LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, outcome)
+        finally:
+            self.release()
+
+    async def aclose(self):
+        """Close the underlying HTTP connection pool and any shared quota buckets."""
+        await self._http_client.aclose()
+        for bucket in (self._request_bucket, self._token_bucket):
+            if isinstance(bucket, SharedTokenBucket):
+                bucket.close()
+
+    async def aclose_when_idle(self):
+        """Close the connection pool once every request using the client has finished."""
+        await self._idle.wait()
+        await self.aclose()
@@ -0,0 +1,222 @@
+"""
+Logging setup for the regulation extraction application.
+
+Records are handed to a queue on the calling thread and written to the
+console and a rotating log file by a background listener thread, so request
+handlers never wait on disk I/O. Each record carries the ID of the request
+that produced it. Rotating one file from several processes loses records, so
+each worker of a multi-process server writes its own file.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import time
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
+
+from app.models import ConfigSettings
+
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+
+# Set by run.py to the number of server worker processes
+WORKERS_ENV = "SERVER_WORKERS"
+
+# Attributes passed through ``extra=`` that are copied into JSON output
+EXTRA_FIELDS = ("method", "path", "status", "duration_ms")
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current request ID to each record."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        for field in EXTRA_FIELDS:
+            if hasattr(record, field):
+                entry[field] = getattr(record, field)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    Queue handler that leaves formatting to the listener thread.
+
+    The message is merged with its arguments and any traceback is rendered on
+    the calling thread (they may not be valid later), but the final format,
+    including JSON encoding, happens in the listener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def log_file_path(settings: ConfigSettings) -> Optional[str]:
+    """
+    Return the file this process logs to, or None for the console only.
+
+    With several server workers the process ID is added before the
+    extension, e.g. ``app.1234.log``.
+    """
+    if not settings.log_file or int(os.getenv(WORKERS_ENV, "1")) <= 1:
+        return settings.log_file
+    root, ext = os.path.splitext(settings.log_file)
+    return f"{root}.{os.getpid()}{ext}"
+
+
+def configure_logging(settings: ConfigSettings):
+    """
+    (Re)configure the root logger from the settings.
+
+    Safe to call again on configuration reload: the previous listener is
+    flushed and replaced.
+
+    Args:
+        settings (ConfigSettings): Settings providing log level, file and format
+    """
+    global _listener, _queue_handler
+
+    if settings.log_format == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(TEXT_FORMAT)
+
+    handlers = [logging.StreamHandler()]
+    log_file = log_file_path(settings)
+    if log_file:
+        handlers.append(
+            RotatingFileHandler(
+                log_file,
+                maxBytes=settings.log_max_bytes,
+                backupCount=settings.log_backup_count,
+            )
+        )
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+
+    root = logging.getLogger()
+    root.setLevel(settings.log_level.upper())
+    if _queue_handler is not None:
+        root.removeHandler(_queue_handler)
+    root.addHandler(queue_handler)
+    listener.start()
+
+    previous = _listener
+    _listener, _queue_handler = listener, queue_handler
+    if previous is not None:
+        _stop_listener(previous)
+
+
+def _stop_listener(listener: QueueListener):
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _stop_listener(_listener)
+        _listener = None
+
+
+atexit.register(shutdown_logging)
+
+
+class RequestContextMiddleware:
+    """
+    ASGI middleware assigning a request ID and logging each request's timing.
+
+    The ID is taken from an incoming ``X-Request-ID`` header when present,
+    echoed back on the response, and attached to every record logged while
+    the request is handled.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.logger = logging.getLogger("app.access")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        if not request_id:
+            request_id = uuid.uuid4().hex[:16]
+        token = request_id_var.set(request_id)
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-request-id", request_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            if self.logger.isEnabledFor(logging.INFO):
+                duration_ms = round((time.perf_counter() - start) * 1000, 2)
+                self.logger.info(
+                    "%s %s %s %.2fms",
+                    scope["method"],
+                    scope["path"],
+                    status,
+                    duration_ms,
+                    extra={
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status,
+                        "duration_ms": duration_ms,
+                    },
+                )
+            request_id_var.reset(token)
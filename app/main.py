@@ -3,29 +3,234 @@ Main application module for the Regulation Requirements Finder API.
 """
 
 import os
+import json
+import math
+import time
+import signal
+import asyncio
 import logging
-from fastapi import FastAPI, HTTPException, Depends
+from functools import partial
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from openai import OpenAI, OpenAIError
-
-from app.models import MarketRequirementsRequest, MarketRequirementsResponse
-from app.config import load_config
-from app.utils import parse_regulation_data
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
+from fastapi.responses import (
+    JSONResponse,
+    PlainTextResponse,
+    StreamingResponse,
 )
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+from openai import APITimeoutError, OpenAIError, RateLimitError
+
+from app import IMPORTED_AT
+from app.models import (
+    BatchItemResult,
+    BatchRequirementsRequest,
+    BatchRequirementsResponse,
+    ComparisonRequest,
+    ConfigSettings,
+    JobStatus,
+    MarketComparisonResponse,
+    MarketRequirementsRequest,
+    MarketRequirementsResponse,
+    Requirement,
+    RequirementChangesResponse,
+    RequirementSearchResponse,
+)
+from app.admission import AdmissionController, Overloaded, retry_after_header
+from app.assets import StaticAssets
+from app.cache import ResponseCache, longest_ttl, make_cache_key, market_ttls, normalize_text
+from app.compare import compare_answers
+from app.config import get_config_path, load_config
+from app.jobs import JobQueue, JobStore
+from app.llm import DeadlineExceeded, LLMClient, retry_after_seconds
+from app.logging_config import RequestContextMiddleware, configure_logging
+from app.metrics import (
+    CACHE_REFRESHES,
+    STARTUP_SECONDS,
+    MetricsMiddleware,
+    render_family,
+    render_metrics,
+)
+from app.prompts import requirements_messages
+from app.singleflight import SingleFlight
+from app.store import RequirementStore, diff_requirement_names
+from app.utils import IncrementalRequirementsParser, parse_regulation_data
+
+# Configure logging with defaults until the config file has been read
+configure_logging(ConfigSettings())
 logger = logging.getLogger(__name__)
 
+# Bump whenever the prompt changes so cached answers from older prompts are ignored
+PROMPT_VERSION = "2"
+
+
+def apply_config(app: FastAPI) -> bool:
+    """
+    Load the configuration and swap in a client built from it.
+
+    Requests hold on to the client they started with, so the previous client
+    is only closed once every request using it has finished, including those
+    still queued for an admission slot or an identical lookup.
+
+    Returns:
+        bool: Whether the new configuration was applied
+    """
+    try:
+        settings = load_config()
+    except HTTPException as e:
+        # Keep serving with the current settings (or the web interface only)
+        app.state.llm_error = e.detail
+        logger.error("Configuration not applied: %s", e.detail)
+        return False
+
+    configure_logging(settings)
+
+    previous = app.state.llm
+    app.state.llm = LLMClient(settings)
+    app.state.llm_error = None
+    if previous is not None:
+        task = asyncio.create_task(previous.aclose_when_idle())
+        app.state.background_tasks.add(task)
+        task.add_done_callback(app.state.background_tasks.discard)
+
+    # Client balances and queued lookups carry over when the limits change
+    admission = getattr(app.state, "admission", None)
+    if admission is None:
+        app.state.admission = AdmissionController(settings)
+    else:
+        admission.configure(settings)
+
+    # The cache is opened once; changing its settings requires a restart
+    if app.state.cache is None and settings.cache_enabled:
+        app.state.cache = ResponseCache(
+            settings.cache_path,
+            longest_ttl(settings),
+            settings.cache_memory_entries,
+        )
+
+    if app.state.store is None and settings.store_enabled:
+        app.state.store = RequirementStore(settings.store_path)
+
+    # Likewise the job store and worker pool
+    if app.state.jobs is None:
+        app.state.jobs = JobQueue(
+            JobStore(settings.job_store_path, settings.job_result_ttl_seconds),
+            partial(run_job, app),
+            settings.job_workers,
+        )
+        app.state.jobs.start()
+    return True
+
+
+def reload(app: FastAPI):
+    """Apply the configuration again and rebuild the web assets (on SIGHUP)."""
+    logger.info("Process %d reloading the configuration", os.getpid())
+    apply_config(app)
+    task = asyncio.create_task(asyncio.to_thread(assets.refresh))
+    app.state.background_tasks.add(task)
+    task.add_done_callback(app.state.background_tasks.discard)
+
+
+async def watch_assets(interval: float):
+    """Rebuild the web assets whenever a file changes, for development."""
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.to_thread(assets.refresh)
+
+
+async def watch_config(app: FastAPI, interval: float):
+    """Reload the configuration whenever the config file's mtime changes."""
+    path = get_config_path()
+    last_mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    while True:
+        await asyncio.sleep(interval)
+        mtime = os.path.getmtime(path) if os.path.exists(path) else None
+        if mtime != last_mtime:
+            last_mtime = mtime
+            logger.info("Config file %s changed, reloading", path)
+            apply_config(app)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load settings and create shared clients on startup, close them on shutdown."""
+    app.state.llm = None
+    app.state.llm_error = None
+    app.state.cache = None
+    app.state.store = None
+    app.state.jobs = None
+    app.state.admission = None
+    app.state.background_tasks = set()
+
+    apply_config(app)
+    # Compressing the web files takes a while, so keep the event loop free
+    await asyncio.to_thread(assets.refresh)
+    startup_seconds = time.perf_counter() - IMPORTED_AT
+    STARTUP_SECONDS.set(startup_seconds)
+    logger.info("Process %d ready to serve in %.2fs", os.getpid(), startup_seconds)
+
+    # SIGHUP reloads the configuration and the web assets (where signal
+    # handlers are available)
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(signal.SIGHUP, reload, app)
+        sighup_installed = True
+    except (AttributeError, NotImplementedError, RuntimeError, ValueError):
+        sighup_installed = False
+
+    watchers = []
+    if app.state.llm is not None and app.state.llm.settings.config_reload_interval > 0:
+        watchers.append(
+            asyncio.create_task(watch_config(app, app.state.llm.settings.config_reload_interval))
+        )
+    if app.state.llm is not None and app.state.llm.settings.assets_reload_interval > 0:
+        watchers.append(
+            asyncio.create_task(watch_assets(app.state.llm.settings.assets_reload_interval))
+        )
+
+    yield
+
+    if sighup_installed:
+        loop.remove_signal_handler(signal.SIGHUP)
+    for watcher in watchers:
+        watcher.cancel()
+
+    # Let running jobs and upstream calls finish, within the shutdown timeout
+    settings = app.state.llm.settings if app.state.llm is not None else ConfigSettings()
+    deadline = loop.time() + settings.shutdown_timeout
+    if app.state.jobs is not None:
+        await app.state.jobs.stop(timeout=settings.shutdown_timeout)
+        app.state.jobs.store.close()
+    for task in list(app.state.background_tasks) + list(refreshes.values()):
+        try:
+            await asyncio.wait_for(task, max(deadline - loop.time(), 0))
+        except asyncio.TimeoutError:
+            pass
+    if app.state.llm is not None:
+        try:
+            await asyncio.wait_for(
+                app.state.llm.aclose_when_idle(), max(deadline - loop.time(), 0)
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Closing the OpenAI client with calls still in flight")
+            await app.state.llm.aclose()
+    if app.state.cache is not None:
+        app.state.cache.close()
+    if app.state.store is not None:
+        app.state.store.close()
+    if app.state.admission is not None:
+        app.state.admission.close()
+    app.state.llm = app.state.cache = app.state.store = app.state.jobs = None
+    app.state.admission = None
+
+
 # Create FastAPI app
 app = FastAPI(
     title="Regulation Requirements Finder",
     description="API to search for product regulatory requirements for specific markets",
+    lifespan=lifespan,
 )
 
 # Add CORS middleware
@@ -35,104 +240,585 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Freshness of cached answers, for clients deciding whether to wait
+    expose_headers=["Age", "X-Revalidating", "Retry-After"],
 )
 
+# Count requests, statuses and latency for /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Tag log records with a request ID and log each request's timing
+app.add_middleware(RequestContextMiddleware)
+
 # Define the path to the web directory relative to the backend
 WEB_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "web")
 
-# Mount the static files directory
-app.mount("/static", StaticFiles(directory=WEB_DIR), name="static")
+# Compressed, content-hashed copies of the web interface files
+assets = StaticAssets(WEB_DIR)
 
-# Initialize OpenAI client
-def get_openai_client(config=Depends(load_config)):
-    client = OpenAI(api_key=config.openai_api_key)
-    return client, config
+# Shared OpenAI client created in the lifespan handler; a request keeps the
+# client it started with open until its response has been sent
+async def get_openai_client(request: Request):
+    llm = getattr(request.app.state, "llm", None)
+    if llm is None:
+        detail = getattr(request.app.state, "llm_error", None)
+        raise HTTPException(
+            status_code=500, detail=detail or "OpenAI client not initialized"
+        )
+    with llm.in_use():
+        yield llm, llm.settings
+
+
+def get_settings(request: Request) -> ConfigSettings:
+    """Settings of the current client, or the defaults when none is configured."""
+    llm = getattr(request.app.state, "llm", None)
+    return llm.settings if llm is not None else ConfigSettings()
+
+
+def get_response_cache(request: Request):
+    return getattr(request.app.state, "cache", None)
+
+
+def get_requirement_store(request: Request):
+    return getattr(request.app.state, "store", None)
+
+
+def get_job_queue(request: Request):
+    jobs = getattr(request.app.state, "jobs", None)
+    if jobs is None:
+        raise HTTPException(status_code=503, detail="Job queue not available")
+    return jobs
+
+
+async def admit(request: Request, cost: int = 1):
+    """
+    Charge the caller's lookup quota.
+
+    Returns:
+        Optional[AdmissionGate]: The gate lookups calling OpenAI pass through,
+        or None when admission control is not set up
+
+    Raises:
+        HTTPException: 429 with Retry-After when the quota is used up
+    """
+    admission = getattr(request.app.state, "admission", None)
+    if admission is None:
+        return None
+    try:
+        await admission.admit(request, cost)
+    except Overloaded as e:
+        raise too_many_requests(e)
+    return admission.gate
+
+
+async def admit_client(request: Request):
+    return await admit(request)
+
+
+def get_admission_gate(request: Request):
+    """Return the gate calls to OpenAI pass through, without charging a quota."""
+    admission = getattr(request.app.state, "admission", None)
+    return admission.gate if admission is not None else None
+
+
+def too_many_requests(error: Overloaded) -> HTTPException:
+    """Turn an admission rejection into a 429 response."""
+    logger.warning("Rejected with 429: %s", error)
+    return HTTPException(status_code=429, detail=str(error), headers=retry_after_header(error))
+
+
+def model_response(model: BaseModel, headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Serialize a validated model straight to a JSON response.
+
+    Returning a ``Response`` skips FastAPI's ``response_model`` validation,
+    which would validate the model a second time; the declared
+    ``response_model`` still documents the endpoint.
+    """
+    return Response(model.model_dump_json(), media_type="application/json", headers=headers)
+
+
+def freshness_headers(freshness: Optional[Tuple[float, bool]]) -> Dict[str, str]:
+    """
+    Headers describing a cached answer: ``Age`` in seconds, and
+    ``X-Revalidating: true`` when it is stale and being refreshed.
+    """
+    if freshness is None:
+        return {}
+    age, revalidating = freshness
+    return {"Age": str(int(age)), "X-Revalidating": "true" if revalidating else "false"}
 
 
 # Root route to serve the HTML file
 @app.get("/")
-async def root():
-    return FileResponse(os.path.join(WEB_DIR, "index.html"))
+async def root(request: Request):
+    return assets.index(request)
 
 
-@app.post("/api/requirements", response_model=MarketRequirementsResponse)
-async def get_market_requirements(
-    request: MarketRequirementsRequest, openai_data=Depends(get_openai_client)
+@app.api_route("/static/{path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def static_file(path: str, request: Request):
+    return assets.file(path, request)
+
+
+@app.get("/api/cache/stats")
+async def cache_stats(cache=Depends(get_response_cache)):
+    """Return hit/miss counters of the response cache."""
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats}
+
+
+@app.get("/api/store/requirements", response_model=RequirementSearchResponse)
+async def search_stored_requirements(
+    market: Optional[str] = None,
+    category: Optional[str] = None,
+    q: Optional[str] = None,
+    product_type: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    store=Depends(get_requirement_store),
 ):
     """
-    Get regulatory requirements for a product in a specific market.
+    Search requirements from earlier answers without calling OpenAI.
 
     Args:
-        request: The market requirements request containing product type and market
-        openai_data: Tuple containing OpenAI client and configuration
+        market: Only requirements for this market
+        category: Only requirements in this category
+        q: Full-text terms to look for, e.g. "UN 38.3" or "lithium"
+        product_type: Only requirements for this product type
+        limit: Maximum number of results
+        store: Requirement store, or None when it is disabled
 
     Returns:
-        MarketRequirementsResponse: Structured response with requirements and summary
+        RequirementSearchResponse: Matching requirements and the query time
     """
-    client, config = openai_data
+    if store is None:
+        raise HTTPException(status_code=503, detail="Requirement store is disabled")
+    start = time.perf_counter()
+    results = await asyncio.to_thread(
+        store.search,
+        market=market,
+        category=category,
+        text=q,
+        product_type=product_type,
+        limit=limit,
+    )
+    return model_response(
+        RequirementSearchResponse(
+            results=results, elapsed_ms=(time.perf_counter() - start) * 1000
+        )
+    )
+
 
-    # Create prompt for OpenAI
-    detail_level = "detailed and comprehensive" if request.detailed else "concise"
+@app.get("/api/store/lookup", response_model=MarketRequirementsResponse)
+async def get_stored_requirements(
+    product_type: str,
+    market: str,
+    detailed: bool = False,
+    store=Depends(get_requirement_store),
+    settings=Depends(get_settings),
+):
+    """
+    Return the stored answer for a product and market, if there is one.
+
+    Only an answer made with the current model and prompt at the requested
+    detail level is returned, and none older than the market's hard TTL, as
+    it would not be served from the cache either.
+    """
+    result = None
+    if store is not None:
+        result = await asyncio.to_thread(
+            store.get,
+            product_type,
+            market,
+            max_age=market_ttls(settings, market)[1],
+            variant=answer_variant(detailed, settings),
+        )
+    if result is None:
+        raise HTTPException(
+            status_code=404, detail=f"No stored requirements for {product_type} in {market}"
+        )
+    return model_response(result)
+
+
+@app.get("/api/store/changes", response_model=RequirementChangesResponse)
+async def get_requirement_changes(
+    market: Optional[str] = None,
+    product_type: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    store=Depends(get_requirement_store),
+):
+    """
+    List requirement names added or removed when stale answers were refreshed.
+
+    Args:
+        market: Only changes for this market
+        product_type: Only changes for this product type
+        limit: Maximum number of changes, newest first
+        store: The requirement store
+
+    Returns:
+        RequirementChangesResponse: The recorded changes
+    """
+    if store is None:
+        raise HTTPException(status_code=503, detail="Requirement store is disabled")
+    changes = await asyncio.to_thread(
+        store.changes, market=market, product_type=product_type, limit=limit
+    )
+    return model_response(RequirementChangesResponse(changes=changes))
 
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics(cache=Depends(get_response_cache)):
+    """Expose request, upstream, parsing and cache metrics in Prometheus format."""
+    extra = list(
+        render_family(
+            "singleflight_requests_total",
+            "counter",
+            "Lookups that started or joined a shared upstream call",
+            flights.stats,
+        )
+    )
+    if cache is not None:
+        extra.extend(
+            render_family(
+                "cache_requests_total",
+                "counter",
+                "Response cache lookups and stores",
+                cache.stats,
+            )
+        )
+    return PlainTextResponse(
+        render_metrics(extra), media_type="text/plain; version=0.0.4"
+    )
+
+
+def build_prompt(request: MarketRequirementsRequest) -> list:
+    """Build the chat messages for a requirements lookup."""
+    return requirements_messages(request.product_type, request.market, request.detailed)
+
+
+async def fetch_requirements(client, config, request, cache, cache_key, store=None):
+    """
+    Call OpenAI for a lookup, parse the answer and cache and store it on success.
+
+    Args:
+        client: The shared LLM client
+        config: Configuration settings
+        request: The market requirements request
+        cache: Response cache, or None when caching is disabled
+        cache_key: Key of the lookup in the cache
+        store: Requirement store, or None when it is disabled
+
+    Returns:
+        tuple: (success (bool), result (MarketRequirementsResponse or error dict))
+    """
     logger.info(
-        f"Processing requirements request for {request.product_type} in {request.market} market"
-    )
-
-    prompt = f"""
-    Please provide a {detail_level} list of all regulatory requirements, certifications, and standards that a {request.product_type} 
-    must meet to legally enter and be sold in the {request.market} market.
-    
-    Include:
-    1. Required certifications and their descriptions
-    2. Safety standards that must be met
-    3. Labeling requirements
-    4. Testing requirements
-    5. Import regulations
-    6. Any other relevant compliance requirements
-    
-    Format the response as a JSON object with the following structure:
-    {{
-        "requirements": [
-            {{
-                "name": "Requirement/certification name",
-                "description": "Detailed description",
-                "category": "Category (e.g., Safety, Labeling, Testing)",
-                "source": "Source of information (if available)"
-            }}
-        ],
-        "summary": "Brief summary of key requirements"
-    }}
+        "Processing requirements request for %s in %s market",
+        request.product_type,
+        request.market,
+    )
+
+    prompt = build_prompt(request)
+
+    # Call OpenAI API
+    logger.info("Calling OpenAI API with model: %s", config.model)
+
+    # Awaiting keeps the event loop free for other requests
+    response = await client.create_completion(prompt)
+
+    # Log API call success
+    logger.info("API call successful")
+
+    # Get content from the response
+    choice = response.choices[0]
+    response_content = choice.message.content
+    if choice.finish_reason == "length":
+        logger.warning("Completion was cut off at max_tokens=%d", config.max_tokens)
+
+    # Parse and validate the response
+    success, result = parse_regulation_data(
+        response_content,
+        request.product_type,
+        request.market,
+        json_mode=client.json_mode is not None,
+    )
+
+    # Only validated responses are kept; failed parses are retried next time
+    if success:
+        await save_result(
+            cache, cache_key, store, answer_variant(request.detailed, config), result
+        )
+
+    return success, result
+
+
+async def save_result(
+    cache, cache_key, store, variant: str, result: MarketRequirementsResponse
+):
+    """Add a validated answer to the response cache and the requirement store."""
+    if cache is not None:
+        await cache.aset(cache_key, result)
+    if store is not None:
+        await asyncio.to_thread(store.save, result, variant)
+
+
+def cache_key_for(request: MarketRequirementsRequest, config) -> str:
+    """Return the response cache key of a lookup."""
+    return make_cache_key(
+        request.product_type,
+        request.market,
+        request.detailed,
+        config.model,
+        PROMPT_VERSION,
+    )
+
+
+def answer_variant(detailed: bool, config) -> str:
     """
+    Return the requirement store variant of a lookup: what besides the product
+    and market shapes its answer, so answers are only reused for the same
+    detail level, model and prompt.
+    """
+    return json.dumps([bool(detailed), config.model, PROMPT_VERSION])
+
+
+def for_request(result, request: MarketRequirementsRequest):
+    """Label a cached or shared result with the caller's own product and market."""
+    update = {"product_type": request.product_type, "market": request.market}
+    if isinstance(result, MarketRequirementsResponse):
+        return result.model_copy(update=update)
+    return {**result, **update}
+
+
+# Concurrent identical lookups share one upstream call
+flights = SingleFlight()
+
+# Background refreshes of stale cached answers, by cache key
+refreshes: Dict[str, asyncio.Task] = {}
+
 
+async def gated_fetch(gate, client, config, request, cache, cache_key, store):
+    """Run ``fetch_requirements`` holding a slot of the admission gate, if there is one."""
+    if gate is None:
+        return await fetch_requirements(client, config, request, cache, cache_key, store)
+    async with gate.slot():
+        return await fetch_requirements(client, config, request, cache, cache_key, store)
+
+
+async def refresh_answer(client, config, request, cache, cache_key, store, stale, gate=None):
+    """
+    Replace a stale cached answer with a fresh one and record what changed.
+
+    Args:
+        client: The shared LLM client
+        config: Configuration settings
+        request: The lookup being refreshed
+        cache: Response cache the fresh answer is written to
+        cache_key: Key of the lookup in the cache
+        store: Requirement store, where changed requirement names are recorded
+        stale: The answer being replaced
+        gate: Admission gate the refresh passes like any other call to
+            OpenAI; when it is full the stale answer is kept for now
+    """
     try:
-        # Call OpenAI API
-        logger.info(f"Calling OpenAI API with model: {config.model}")
+        success, result = await flights.do(
+            cache_key,
+            lambda: gated_fetch(gate, client, config, request, cache, cache_key, store),
+        )
+    except Exception as e:
+        success, result = False, {"error": f"{type(e).__name__}: {e}"}
+    if not success:
+        CACHE_REFRESHES.inc("failed")
+        logger.warning(
+            "Refresh of %s in %s market failed, keeping the stale answer: %s",
+            request.product_type,
+            request.market,
+            result["error"],
+        )
+        return
+
+    added, removed = diff_requirement_names(stale, result)
+    if not added and not removed:
+        CACHE_REFRESHES.inc("unchanged")
+        return
+    CACHE_REFRESHES.inc("changed")
+    logger.info(
+        "Requirements for %s in %s market changed: added %s, removed %s",
+        request.product_type,
+        request.market,
+        added,
+        removed,
+    )
+    if store is not None:
+        await asyncio.to_thread(store.record_change, result, added, removed)
+
+
+async def cached_answer(
+    client, config, request: MarketRequirementsRequest, cache, store=None, gate=None
+):
+    """
+    Look up a cached answer, refreshing it in the background once it is stale.
+
+    Answers younger than the market's soft TTL are served as they are. Older
+    ones, up to the hard TTL, are still served at once while a single
+    background task per lookup fetches a replacement through ``gate``.
 
-        # Use the correct format for web search according to API docs
-        response = client.chat.completions.create(
-            model=config.model,
-            web_search_options={},
-            messages=[{"role": "user", "content": prompt}],
+    Returns:
+        Optional[tuple]: (answer labelled for the request, age in seconds,
+        whether it is being refreshed), or None on a miss
+    """
+    if cache is None:
+        return None
+    soft_ttl, hard_ttl = market_ttls(config, request.market)
+    cache_key = cache_key_for(request, config)
+    # Another worker may already have refreshed an answer this one remembers
+    entry = await cache.aget_with_age(cache_key, hard_ttl, recheck_age=soft_ttl)
+    if entry is None:
+        return None
+    cached, age = entry
+    revalidating = age >= soft_ttl
+    if revalidating and cache_key not in refreshes:
+        # The refresh outlives the request, so it keeps the client open itself
+        client.retain()
+        task = asyncio.create_task(
+            refresh_answer(client, config, request, cache, cache_key, store, cached, gate)
         )
+        refreshes[cache_key] = task
+
+        def refresh_done(_):
+            refreshes.pop(cache_key, None)
+            client.release()
+
+        task.add_done_callback(refresh_done)
+    logger.info(
+        "Cache hit for %s in %s market (age %.0fs%s)",
+        request.product_type,
+        request.market,
+        age,
+        ", refreshing" if revalidating else "",
+    )
+    return for_request(cached, request), age, revalidating
 
-        # Log API call success
-        logger.info("API call successful")
 
-        # Get content from the response
-        response_content = response.choices[0].message.content
+async def find_similar_answer(config, request: MarketRequirementsRequest, store):
+    """
+    Reuse a stored answer for a similarly described product in the same market.
+
+    Returns:
+        Optional[MarketRequirementsResponse]: The reused answer, labelled with
+        the caller's product and the product it was stored for, or None
+    """
+    if store is None or not config.similar_match_enabled or not request.allow_similar:
+        return None
+    match = await asyncio.to_thread(
+        store.find_similar,
+        request.product_type,
+        request.market,
+        config.similar_match_threshold,
+        market_ttls(config, request.market)[1],
+        answer_variant(request.detailed, config),
+    )
+    if match is None:
+        return None
+    result, score = match
+    logger.info(
+        "Reusing answer for %r (similarity %.2f) for %s in %s market",
+        result.product_type,
+        score,
+        request.product_type,
+        request.market,
+    )
+    return for_request(result, request).model_copy(
+        update={"matched_product_type": result.product_type, "similarity": score}
+    )
 
-        # Parse and validate the response
-        success, result = parse_regulation_data(
-            response_content, request.product_type, request.market
+
+async def resolve_requirements(client, config, request, cache, store=None, gate=None):
+    """
+    Answer a lookup from the cache, a stored answer for a similar product, an
+    in-flight identical lookup, or OpenAI.
+
+    Args:
+        client: The shared LLM client
+        config: Configuration settings
+        request: The market requirements request
+        cache: Response cache, or None when caching is disabled
+        store: Requirement store that new answers are added to, if enabled
+        gate: Admission gate a call to OpenAI must pass, or None; answers
+            found locally do not wait for it
+
+    Returns:
+        tuple: (success (bool), result (MarketRequirementsResponse or error
+        dict), freshness ((age, revalidating) for cached answers, else None))
+    """
+    cached = await cached_answer(client, config, request, cache, store, gate)
+    if cached is not None:
+        result, age, revalidating = cached
+        return True, result, (age, revalidating)
+
+    similar = await find_similar_answer(config, request, store)
+    if similar is not None:
+        return True, similar, None
+
+    cache_key = cache_key_for(request, config)
+    # Only the leader of identical concurrent lookups takes a slot
+    success, result = await flights.do(
+        cache_key,
+        lambda: gated_fetch(gate, client, config, request, cache, cache_key, store),
+    )
+    return success, for_request(result, request), None
+
+
+@app.post("/api/requirements", response_model=MarketRequirementsResponse)
+async def get_market_requirements(
+    request: MarketRequirementsRequest,
+    openai_data=Depends(get_openai_client),
+    cache=Depends(get_response_cache),
+    store=Depends(get_requirement_store),
+    gate=Depends(admit_client),
+):
+    """
+    Get regulatory requirements for a product in a specific market.
+
+    Args:
+        request: The market requirements request containing product type and market
+        openai_data: Tuple containing the shared LLM client and configuration
+        cache: Response cache, or None when caching is disabled
+        store: Requirement store, or None when it is disabled
+        gate: Admission gate for calls to OpenAI, after the caller's quota was charged
+
+    Returns:
+        MarketRequirementsResponse: Structured response with requirements and summary
+    """
+    client, config = openai_data
+
+    try:
+        success, result, freshness = await resolve_requirements(
+            client, config, request, cache, store, gate
         )
 
-        if success:
-            return result
-        else:
-            # If parsing failed, return the error result (not raising an exception)
-            # This helps with debugging by returning the raw response
-            return result
+        # If parsing failed, return the error result (not raising an exception)
+        # This helps with debugging by returning the raw response
+        if not success:
+            return JSONResponse(result, status_code=502)
+        return model_response(result, freshness_headers(freshness))
 
+    except RateLimitError as e:
+        # Retries were exhausted; pass the upstream back-off on to the caller
+        error_msg = f"OpenAI rate limit exceeded: {str(e)}"
+        logger.error(error_msg)
+        retry_after = retry_after_seconds(e)
+        raise HTTPException(
+            status_code=429,
+            detail=error_msg,
+            headers={"Retry-After": str(math.ceil(retry_after or 1))},
+        )
+    except Overloaded as e:
+        raise too_many_requests(e)
+    except (DeadlineExceeded, APITimeoutError) as e:
+        error_msg = f"OpenAI API timeout: {str(e)}"
+        logger.error(error_msg)
+        raise HTTPException(status_code=504, detail=error_msg)
     except OpenAIError as e:
         error_msg = f"OpenAI API error: {str(e)}"
         logger.error(error_msg, exc_info=True)
@@ -141,3 +827,476 @@ async def get_market_requirements(
         error_msg = f"Unexpected error: {str(e)}"
         logger.error(error_msg, exc_info=True)
         raise HTTPException(status_code=500, detail=error_msg)
+
+
+async def resolve_or_error(client, config, request, cache, store=None, gate=None):
+    """
+    Resolve one lookup of a multi-market request, reporting failures as a
+    message instead of raising so the other lookups are still answered.
+
+    Returns:
+        tuple: (MarketRequirementsResponse or None, error message or None)
+    """
+    try:
+        success, result, _ = await resolve_requirements(
+            client, config, request, cache, store, gate
+        )
+        if success:
+            return result, None
+        return None, result["error"]
+    except Overloaded as e:
+        error = f"{e}, retry in {math.ceil(e.retry_after)}s"
+        logger.warning(error)
+    except (DeadlineExceeded, APITimeoutError) as e:
+        error = f"OpenAI API timeout: {str(e)}"
+        logger.error(error)
+    except OpenAIError as e:
+        error = f"OpenAI API error: {str(e)}"
+        logger.error(error, exc_info=True)
+    except Exception as e:
+        error = f"Unexpected error: {str(e)}"
+        logger.error(error, exc_info=True)
+    return None, error
+
+
+@app.post("/api/requirements/batch", response_model=BatchRequirementsResponse)
+async def get_batch_market_requirements(
+    request: BatchRequirementsRequest,
+    http_request: Request,
+    openai_data=Depends(get_openai_client),
+    cache=Depends(get_response_cache),
+    store=Depends(get_requirement_store),
+):
+    """
+    Get regulatory requirements for several product/market pairs concurrently.
+
+    Args:
+        request: Either one product type with a list of markets, or explicit items
+        http_request: The HTTP request, whose client is charged one lookup per item
+        openai_data: Tuple containing the shared LLM client and configuration
+        cache: Response cache, or None when caching is disabled
+        store: Requirement store, or None when it is disabled
+
+    Returns:
+        BatchRequirementsResponse: Per-item responses or errors with timings
+    """
+    client, config = openai_data
+
+    items = list(request.items)
+    if request.product_type:
+        items += [
+            MarketRequirementsRequest(
+                product_type=request.product_type,
+                market=market,
+                detailed=request.detailed,
+            )
+            for market in request.markets
+        ]
+    if not items:
+        raise HTTPException(
+            status_code=400,
+            detail="Provide product_type with markets, or a list of items",
+        )
+    if len(items) > config.batch_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch exceeds the limit of {config.batch_max_items} items",
+        )
+    gate = await admit(http_request, len(items))
+
+    max_parallel = min(
+        request.max_parallel or config.batch_max_parallel, config.batch_max_parallel
+    )
+    semaphore = asyncio.Semaphore(max_parallel)
+
+    logger.info(
+        "Processing batch of %d lookups, %d in parallel", len(items), max_parallel
+    )
+
+    async def run_item(item: MarketRequirementsRequest) -> BatchItemResult:
+        async with semaphore:
+            start = time.perf_counter()
+            response, error = await resolve_or_error(
+                client, config, item, cache, store, gate
+            )
+            return BatchItemResult(
+                product_type=item.product_type,
+                market=item.market,
+                response=response,
+                error=error,
+                elapsed_seconds=time.perf_counter() - start,
+            )
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*[run_item(item) for item in items])
+    wall_time = time.perf_counter() - start
+    summed_time = sum(result.elapsed_seconds for result in results)
+
+    logger.info(
+        "Batch of %d finished in %.2fs (%.2fs summed per item)",
+        len(items),
+        wall_time,
+        summed_time,
+    )
+
+    return model_response(
+        BatchRequirementsResponse(
+            results=results,
+            wall_time_seconds=wall_time,
+            summed_item_seconds=summed_time,
+        )
+    )
+
+
+async def local_answer(
+    client, config, request: MarketRequirementsRequest, cache, store=None, gate=None
+):
+    """
+    Answer a lookup from the response cache or the requirement store only.
+
+    Stored answers are used up to the market's hard TTL, like cached ones;
+    stale cached answers are refreshed in the background through ``gate``.
+
+    Returns:
+        Optional[MarketRequirementsResponse]: The answer, or None if neither has one
+    """
+    cached = await cached_answer(client, config, request, cache, store, gate)
+    if cached is not None:
+        return cached[0]
+    if store is None:
+        return None
+    stored = await asyncio.to_thread(
+        store.get,
+        request.product_type,
+        request.market,
+        max_age=market_ttls(config, request.market)[1],
+        variant=answer_variant(request.detailed, config),
+    )
+    return for_request(stored, request) if stored is not None else None
+
+
+@app.post("/api/requirements/compare", response_model=MarketComparisonResponse)
+async def compare_market_requirements(
+    request: ComparisonRequest,
+    http_request: Request,
+    openai_data=Depends(get_openai_client),
+    cache=Depends(get_response_cache),
+    store=Depends(get_requirement_store),
+):
+    """
+    Compare a product's requirements across markets.
+
+    Markets already cached or stored are compared as they are; only the
+    others are looked up, concurrently and within ``batch_max_parallel``.
+
+    Args:
+        request: The product, the markets to compare and whether to fetch missing ones
+        http_request: The HTTP request, whose client is charged one lookup per
+            market that has to be fetched
+        openai_data: Tuple containing the shared LLM client and configuration
+        cache: Response cache, or None when caching is disabled
+        store: Requirement store, or None when it is disabled
+
+    Returns:
+        MarketComparisonResponse: Deduplicated requirements with the markets
+        they apply to, and those shared by all or specific to one market
+    """
+    client, config = openai_data
+
+    # Markets differing only in case or spacing are compared once
+    markets, seen = [], set()
+    for market in request.markets:
+        if normalize_text(market) not in seen:
+            seen.add(normalize_text(market))
+            markets.append(market)
+    if not markets:
+        raise HTTPException(status_code=400, detail="Provide at least one market")
+    if len(markets) > config.batch_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Comparison exceeds the limit of {config.batch_max_items} markets",
+        )
+
+    lookups = [
+        MarketRequirementsRequest(
+            product_type=request.product_type, market=market, detailed=request.detailed
+        )
+        for market in markets
+    ]
+    upstream = get_admission_gate(http_request)
+    answers = {
+        lookup.market: await local_answer(client, config, lookup, cache, store, upstream)
+        for lookup in lookups
+    }
+    missing = [lookup for lookup in lookups if answers[lookup.market] is None]
+    errors = {}
+    if missing and request.fetch_missing:
+        gate = await admit(http_request, len(missing))
+        semaphore = asyncio.Semaphore(config.batch_max_parallel)
+
+        async def fetch(lookup: MarketRequirementsRequest):
+            async with semaphore:
+                return await resolve_or_error(client, config, lookup, cache, store, gate)
+
+        logger.info(
+            "Comparing %d markets for %s, looking up %d",
+            len(markets),
+            request.product_type,
+            len(missing),
+        )
+        for lookup, (response, error) in zip(
+            missing, await asyncio.gather(*[fetch(lookup) for lookup in missing])
+        ):
+            answers[lookup.market] = response
+            if error is not None:
+                errors[lookup.market] = error
+    elif missing:
+        for lookup in missing:
+            errors[lookup.market] = "Not cached or stored"
+
+    comparison = compare_answers(
+        request.product_type,
+        [answers[market] for market in markets if answers[market] is not None],
+    )
+    comparison.fetched = [lookup.market for lookup in missing] if request.fetch_missing else []
+    comparison.errors = errors
+    return model_response(comparison)
+
+
+async def run_job(app: FastAPI, request: MarketRequirementsRequest):
+    """
+    Answer a queued lookup with the client that is current when it starts.
+
+    Raises:
+        RuntimeError: If the lookup failed; the message is stored with the job
+    """
+    llm = app.state.llm
+    if llm is None:
+        raise RuntimeError(app.state.llm_error or "OpenAI client not initialized")
+    try:
+        with llm.in_use():
+            success, result, _ = await resolve_requirements(
+                llm,
+                llm.settings,
+                request,
+                app.state.cache,
+                getattr(app.state, "store", None),
+            )
+    except (DeadlineExceeded, APITimeoutError) as e:
+        raise RuntimeError(f"OpenAI API timeout: {str(e)}") from e
+    except OpenAIError as e:
+        raise RuntimeError(f"OpenAI API error: {str(e)}") from e
+    if not success:
+        raise RuntimeError(result["error"])
+    return result
+
+
+# Jobs are charged to the caller's quota but not gated: the job workers
+# already bound how many run at once
+@app.post(
+    "/api/jobs",
+    response_model=JobStatus,
+    status_code=202,
+    dependencies=[Depends(admit_client)],
+)
+async def submit_job(
+    request: MarketRequirementsRequest,
+    response: Response,
+    openai_data=Depends(get_openai_client),
+    jobs=Depends(get_job_queue),
+):
+    """
+    Queue a lookup to run in the background.
+
+    Meant for detailed lookups that take longer than clients or proxies keep a
+    connection open. Poll ``/api/jobs/{job_id}`` for the result.
+
+    Args:
+        request: The market requirements request containing product type and market
+        response: Used to set the Location header of the job
+        openai_data: Tuple containing the shared LLM client and configuration
+        jobs: The background job queue
+
+    Returns:
+        JobStatus: The queued job
+    """
+    job = await jobs.submit(request)
+    logger.info(
+        "Queued job %s for %s in %s market (%d waiting)",
+        job.job_id,
+        request.product_type,
+        request.market,
+        jobs.depth(),
+    )
+    response.headers["Location"] = f"/api/jobs/{job.job_id}"
+    return job
+
+
+@app.get("/api/jobs/{job_id}", response_model=JobStatus)
+async def get_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, allow_inf_nan=False),
+    openai_data=Depends(get_openai_client),
+    jobs=Depends(get_job_queue),
+):
+    """
+    Return the state of a job, and its result once it has finished.
+
+    Args:
+        job_id: ID returned when the job was submitted
+        wait: Seconds to wait for the job to finish before answering (long
+            polling), capped by ``job_max_wait``
+        openai_data: Tuple containing the shared LLM client and configuration
+        jobs: The background job queue
+
+    Returns:
+        JobStatus: The job's status, result or error
+    """
+    _, config = openai_data
+    # Not every FastAPI release enforces allow_inf_nan on query parameters
+    if not math.isfinite(wait):
+        raise HTTPException(status_code=422, detail="wait must be a finite number")
+    job = await jobs.wait(job_id, min(wait, config.job_max_wait))
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return model_response(job)
+
+
+def ndjson_line(event: dict) -> str:
+    return json.dumps(event) + "\n"
+
+
+def requirement_line(requirement: Requirement) -> str:
+    """Serialize a ``requirement`` event without building an intermediate dict."""
+    return f'{{"type": "requirement", "data": {requirement.model_dump_json()}}}\n'
+
+
+@app.post("/api/requirements/stream")
+async def stream_market_requirements(
+    request: MarketRequirementsRequest,
+    openai_data=Depends(get_openai_client),
+    cache=Depends(get_response_cache),
+    store=Depends(get_requirement_store),
+    gate=Depends(admit_client),
+):
+    """
+    Stream regulatory requirements as newline-delimited JSON events.
+
+    Each requirement is sent as a ``requirement`` event as soon as it has been
+    generated and parsed, followed by a ``summary`` event and a final ``done``
+    event carrying the validated response and timings. Failures are reported
+    as an ``error`` event.
+
+    Args:
+        request: The market requirements request containing product type and market
+        openai_data: Tuple containing the shared LLM client and configuration
+        cache: Response cache, or None when caching is disabled
+        store: Requirement store, or None when it is disabled
+        gate: Admission gate for calls to OpenAI, after the caller's quota was charged
+
+    Returns:
+        StreamingResponse: NDJSON event stream
+    """
+    client, config = openai_data
+    cache_key = cache_key_for(request, config)
+    freshness = None
+    cached = await cached_answer(client, config, request, cache, store, gate)
+    if cached is not None:
+        cached, age, revalidating = cached
+        freshness = (age, revalidating)
+    else:
+        cached = await find_similar_answer(config, request, store)
+
+    # A stream from OpenAI holds a slot until it ends; waiting happens before
+    # the response starts so a rejection can still be sent as a 429
+    slot = None
+    if cached is None and gate is not None:
+        try:
+            slot = await gate.acquire()
+        except Overloaded as e:
+            raise too_many_requests(e)
+
+    async def events():
+        start = time.perf_counter()
+        time_to_first = None
+
+        if cached is not None:
+            result = cached
+            for requirement in result.requirements:
+                if time_to_first is None:
+                    time_to_first = time.perf_counter() - start
+                yield requirement_line(requirement)
+        else:
+            logger.info(
+                "Streaming requirements for %s in %s market",
+                request.product_type,
+                request.market,
+            )
+            parser = IncrementalRequirementsParser()
+            try:
+                async for fragment in client.stream_completion(build_prompt(request)):
+                    for data in parser.feed(fragment):
+                        try:
+                            requirement = Requirement.model_validate(data)
+                        except ValueError:
+                            continue
+                        if time_to_first is None:
+                            time_to_first = time.perf_counter() - start
+                        yield requirement_line(requirement)
+            except DeadlineExceeded as e:
+                error_msg = f"OpenAI API timeout: {str(e)}"
+                logger.error(error_msg)
+                yield ndjson_line({"type": "error", "error": error_msg})
+                return
+            except OpenAIError as e:
+                error_msg = f"OpenAI API error: {str(e)}"
+                logger.error(error_msg, exc_info=True)
+                yield ndjson_line({"type": "error", "error": error_msg})
+                return
+
+            success, result = parse_regulation_data(
+                parser.content,
+                request.product_type,
+                request.market,
+                json_mode=client.json_mode is not None,
+            )
+            if not success:
+                yield ndjson_line({"type": "error", **result})
+                return
+            await save_result(
+                cache, cache_key, store, answer_variant(request.detailed, config), result
+            )
+
+        total_time = time.perf_counter() - start
+        logger.info(
+            "Streamed %d requirements for %s in %s: first after %.2fs, total %.2fs",
+            len(result.requirements),
+            request.product_type,
+            request.market,
+            time_to_first if time_to_first is not None else total_time,
+            total_time,
+        )
+        yield ndjson_line({"type": "summary", "data": result.summary})
+        yield ndjson_line(
+            {
+                "type": "done",
+                "response": result.model_dump(),
+                "time_to_first_requirement": time_to_first,
+                "total_time": total_time,
+            }
+        )
+
+    async def gated_events():
+        try:
+            async for line in events():
+                yield line
+        finally:
+            slot.release()
+
+    return StreamingResponse(
+        events() if slot is None else gated_events(),
+        media_type="application/x-ndjson",
+        headers=freshness_headers(freshness),
+        # Releases the slot should the stream be abandoned before it ends
+        background=BackgroundTask(slot.release) if slot is not None else None,
+    )
@@ -0,0 +1,257 @@
+"""
+Prometheus-style metrics for the regulation extraction application.
+
+A deliberately small registry: metrics are plain counters keyed by label
+values, so recording a sample is a dictionary update (plus a bisect for
+histograms) and cheap enough to stay enabled in production. The ``/metrics``
+endpoint renders everything in the Prometheus text exposition format.
+"""
+
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+_registry: List["_Metric"] = []
+
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Sequence[str]) -> str:
+    if not labelnames:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(str(value))}"' for name, value in zip(labelnames, labelvalues)
+    )
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _registry.append(self)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, optionally split by labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labelvalues, amount: float = 1):
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues) -> float:
+        return self._values.get(labelvalues, 0)
+
+    def render(self) -> Iterable[str]:
+        yield from super().render()
+        for labelvalues, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    """Value that can go up and down, such as requests in flight."""
+
+    kind = "gauge"
+
+    def dec(self, *labelvalues, amount: float = 1):
+        self.inc(*labelvalues, amount=-amount)
+
+    def set(self, value: float, *labelvalues):
+        self._values[labelvalues] = value
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: Sequence[float],
+        labelnames: Sequence[str] = (),
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # label values -> [per-bucket counts, sum, count]
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *labelvalues):
+        entry = self._values.get(labelvalues)
+        if entry is None:
+            entry = self._values[labelvalues] = [[0] * len(self.buckets), 0.0, 0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def count(self, *labelvalues) -> int:
+        entry = self._values.get(labelvalues)
+        return entry[2] if entry else 0
+
+    def time(self, *labelvalues) -> "_Timer":
+        """Context manager observing the duration of its block in seconds."""
+        return _Timer(self, labelvalues)
+
+    def render(self) -> Iterable[str]:
+        yield from super().render()
+        labelnames = self.labelnames + ("le",)
+        for labelvalues, (bucket_counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                labels = _format_labels(labelnames, labelvalues + (_format_value(bound),))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, labelvalues)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_labelvalues", "_start")
+
+    def __init__(self, histogram: Histogram, labelvalues: Tuple):
+        self._histogram = histogram
+        self._labelvalues = labelvalues
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._histogram.observe(time.perf_counter() - self._start, *self._labelvalues)
+
+
+def render_metrics(extra_lines: Iterable[str] = ()) -> str:
+    """Render every registered metric in the Prometheus text format."""
+    lines = [line for metric in _registry for line in metric.render()]
+    lines.extend(extra_lines)
+    return "\n".join(lines) + "\n"
+
+
+def render_family(name: str, kind: str, documentation: str, samples: Dict[str, float]):
+    """
+    Render values owned by another component (e.g. cache counters) as one family.
+
+    Args:
+        name (str): Metric name
+        kind (str): Prometheus metric type
+        documentation (str): Help text
+        samples (dict): Value per ``result`` label
+    """
+    yield f"# HELP {name} {documentation}"
+    yield f"# TYPE {name} {kind}"
+    for label, value in samples.items():
+        yield f'{name}{{result="{_escape(label)}"}} {_format_value(value)}'
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+PARSE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "path", "status")
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", LATENCY_BUCKETS, ("path",)
+)
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being served")
+LLM_REQUEST_SECONDS = Histogram(
+    "llm_request_duration_seconds", "Upstream completion latency", LATENCY_BUCKETS, ("outcome",)
+)
+LLM_IN_FLIGHT = Gauge("llm_requests_in_flight", "Upstream completions in flight")
+LLM_RETRIES = Counter("llm_retries_total", "Retried completion attempts", ("error",))
+LLM_QUOTA_WAIT_SECONDS = Histogram(
+    "llm_quota_wait_seconds", "Time spent waiting for rate-limit quota", LATENCY_BUCKETS
+)
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens used by completions", ("type",))
+LLM_REQUEST_TOKENS = Histogram(
+    "llm_request_tokens",
+    "Prompt and completion tokens per completion",
+    (100, 250, 500, 1000, 2000, 4000, 8000, 16000),
+    ("type",),
+)
+STARTUP_SECONDS = Gauge(
+    "app_startup_seconds", "Seconds from importing the application to serving requests"
+)
+CACHE_REFRESHES = Counter(
+    "cache_refreshes_total", "Background refreshes of stale cached answers", ("outcome",)
+)
+ADMISSION_REJECTED = Counter(
+    "admission_rejected_total", "Requests turned away with 429", ("reason",)
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "admission_queue_depth", "Lookups waiting for an upstream slot"
+)
+JOBS = Counter("jobs_total", "Background jobs finished", ("outcome",))
+JOB_QUEUE_DEPTH = Gauge("job_queue_depth", "Background jobs waiting for a worker")
+JOB_WAIT_SECONDS = Histogram(
+    "job_wait_seconds", "Time background jobs spent queued", LATENCY_BUCKETS
+)
+JOB_RUN_SECONDS = Histogram(
+    "job_run_seconds", "Time spent running background jobs", LATENCY_BUCKETS
+)
+PARSE_SECONDS = Histogram(
+    "parse_duration_seconds",
+    "Time spent in clean_json_content and parse_regulation_data",
+    PARSE_BUCKETS,
+)
+PARSE_FAILURES = Counter(
+    "parse_failures_total", "Responses that could not be parsed", ("reason",)
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting HTTP requests, statuses, latency and concurrency.
+
+    Requests are labelled with the matched route template (e.g.
+    ``/api/requirements``) or mount point (``/static``) rather than the raw URL
+    to keep label cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = scope.get("route")
+            path = route.path if route is not None else scope.get("root_path") or "unmatched"
+            HTTP_REQUESTS.inc(scope["method"], path, str(status))
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, path)
@@ -2,17 +2,79 @@
 Data models for the regulation extraction application.
 """
 
-from typing import List, Optional
-from pydantic import BaseModel
+import ipaddress
+from typing import Dict, List, Optional
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 
 
-class ConfigSettings:
+class ConfigSettings(BaseModel):
     """Configuration settings for the application."""
 
-    openai_api_key: str
-    model: str
-    max_tokens: int
-    temperature: float
+    # Settings are shared by concurrent requests and replaced as a whole on reload
+    model_config = ConfigDict(frozen=True)
+
+    openai_api_key: str = ""
+    openai_base_url: Optional[str] = None
+    model: str = "gpt-4o-search-preview"
+    max_tokens: int = 2000
+    temperature: float = 0.2
+    max_connections: int = 100
+    max_concurrent_requests: int = 32
+    llm_timeout: float = 60
+    llm_deadline: float = 120
+    llm_max_retries: int = 3
+    llm_backoff_base: float = 0.5
+    llm_backoff_max: float = 20
+    llm_requests_per_minute: int = 0
+    llm_tokens_per_minute: int = 0
+    llm_json_mode: str = "auto"
+    # Quota buckets shared by all processes; empty keeps them per process
+    rate_limit_path: str = "ratelimit.sqlite3"
+    cache_enabled: bool = True
+    cache_path: str = "cache.sqlite3"
+    cache_ttl_seconds: int = 7 * 24 * 3600
+    cache_soft_ttl_seconds: int = 24 * 3600
+    # Per-market overrides: {"EU": {"soft_ttl_seconds": ..., "ttl_seconds": ...}}
+    cache_market_ttls: Dict[str, Dict[str, int]] = {}
+    cache_memory_entries: int = 1000
+    store_enabled: bool = True
+    store_path: str = "requirements.sqlite3"
+    similar_match_enabled: bool = True
+    similar_match_threshold: float = 0.8
+    # Admission control: lookups per minute per client IP, and per API key sent
+    # as X-API-Key (0 for unlimited), shared by workers through rate_limit_path
+    client_requests_per_minute: int = 0
+    client_burst: int = 10
+    api_keys: Dict[str, int] = {}
+    # Addresses or networks of proxies whose client IP header is believed
+    trusted_proxies: List[str] = []
+    client_ip_header: str = "X-Forwarded-For"
+    # Lookups calling OpenAI at once, and how many may wait and for how long
+    max_in_flight_lookups: int = 0
+    admission_queue_size: int = 100
+    admission_queue_timeout: float = 10
+    batch_max_parallel: int = 10
+    batch_max_items: int = 50
+    job_store_path: str = "jobs.sqlite3"
+    job_workers: int = 4
+    job_result_ttl_seconds: int = 24 * 3600
+    job_max_wait: float = 30
+    config_reload_interval: float = 0
+    assets_reload_interval: float = 0
+    workers: int = 0
+    shutdown_timeout: float = 30
+    log_level: str = "INFO"
+    log_format: str = "text"
+    log_file: Optional[str] = "app.log"
+    log_max_bytes: int = 10 * 1024 * 1024
+    log_backup_count: int = 5
+
+    @field_validator("trusted_proxies")
+    @classmethod
+    def _check_networks(cls, value: List[str]) -> List[str]:
+        for network in value:
+            ipaddress.ip_network(network, strict=False)
+        return value
 
 
 class MarketRequirementsRequest(BaseModel):
@@ -21,6 +83,8 @@ class MarketRequirementsRequest(BaseModel):
     product_type: str
     market: str
     detailed: bool = False
+    # Set to False to skip answers stored for similarly described products
+    allow_similar: bool = True
 
 
 class Requirement(BaseModel):
@@ -32,6 +96,44 @@ class Requirement(BaseModel):
     source: Optional[str] = None
 
 
+class RequirementsPayload(BaseModel):
+    """JSON object the model is asked to answer with."""
+
+    requirements: List[Requirement]
+    summary: str
+
+
+class StoredRequirement(Requirement):
+    """A requirement from the local store with the lookup it belongs to."""
+
+    product_type: str
+    market: str
+    fetched_at: float
+
+
+class RequirementSearchResponse(BaseModel):
+    """Response model for a search of the local requirement store."""
+
+    results: List[StoredRequirement]
+    elapsed_ms: float
+
+
+class RequirementChange(BaseModel):
+    """Requirement names that changed when a stored answer was refreshed."""
+
+    product_type: str
+    market: str
+    changed_at: float
+    added: List[str]
+    removed: List[str]
+
+
+class RequirementChangesResponse(BaseModel):
+    """Response model for the audit log of refreshed answers."""
+
+    changes: List[RequirementChange]
+
+
 class MarketRequirementsResponse(BaseModel):
     """Response model for market requirements query."""
 
@@ -39,3 +141,84 @@ class MarketRequirementsResponse(BaseModel):
     market: str
     requirements: List[Requirement]
     summary: str
+    # Set when the answer was reused from a similarly described product
+    matched_product_type: Optional[str] = None
+    similarity: Optional[float] = None
+
+
+class BatchRequirementsRequest(BaseModel):
+    """Request model for checking several markets in one call."""
+
+    product_type: Optional[str] = None
+    markets: List[str] = []
+    items: List[MarketRequirementsRequest] = []
+    detailed: bool = False
+    max_parallel: Optional[int] = Field(None, ge=1)
+
+
+class BatchItemResult(BaseModel):
+    """Outcome of a single product/market lookup within a batch."""
+
+    product_type: str
+    market: str
+    response: Optional[MarketRequirementsResponse] = None
+    error: Optional[str] = None
+    elapsed_seconds: float
+
+
+class BatchRequirementsResponse(BaseModel):
+    """Response model for a batch of market requirements lookups."""
+
+    results: List[BatchItemResult]
+    wall_time_seconds: float
+    summed_item_seconds: float
+
+
+class ComparisonRequest(BaseModel):
+    """Request model for comparing one product's requirements across markets."""
+
+    product_type: str
+    markets: List[str]
+    detailed: bool = False
+    # Set to False to compare only answers that are already cached or stored
+    fetch_missing: bool = True
+
+
+class ComparedRequirement(BaseModel):
+    """A requirement deduplicated across markets."""
+
+    key: str
+    name: str
+    category: str
+    # Positions in the comparison's ``markets`` of the markets it applies to
+    present_in: List[int]
+
+
+class MarketComparisonResponse(BaseModel):
+    """Response model for a comparison of markets for one product."""
+
+    product_type: str
+    markets: List[str]
+    requirements: List[ComparedRequirement]
+    # Keys of requirements that apply in every market
+    shared: List[str]
+    # Keys of requirements that apply in only one market, by market
+    market_specific: Dict[str, List[str]]
+    # Markets that were not cached or stored and had to be looked up
+    fetched: List[str] = []
+    # Markets left out of the comparison because their lookup failed
+    errors: Dict[str, str] = {}
+    elapsed_ms: float
+
+
+class JobStatus(BaseModel):
+    """State of a background lookup, including its result once finished."""
+
+    job_id: str
+    status: str
+    request: MarketRequirementsRequest
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[MarketRequirementsResponse] = None
+    error: Optional[str] = None
@@ -0,0 +1,131 @@
+"""
+Prompt templates for the regulation extraction application.
+
+Templates are trimmed of indentation and blank lines once, when the module is
+imported, so each lookup only substitutes its values. The instructions and
+the answer format live in a system message that is identical for every
+lookup, which keeps the per-request text short and lets providers reuse a
+cached prompt prefix.
+"""
+
+import json
+from typing import Dict, List
+
+# Shape of the answer, used both in the instructions and for structured output
+REQUIREMENTS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "requirements": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "description": {"type": "string"},
+                    "category": {"type": "string"},
+                    "source": {"type": ["string", "null"]},
+                },
+                "required": ["name", "description", "category", "source"],
+                "additionalProperties": False,
+            },
+        },
+        "summary": {"type": "string"},
+    },
+    "required": ["requirements", "summary"],
+    "additionalProperties": False,
+}
+
+# ``response_format`` for each JSON mode a model may support
+RESPONSE_FORMATS = {
+    "json_schema": {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "market_requirements",
+            "strict": True,
+            "schema": REQUIREMENTS_SCHEMA,
+        },
+    },
+    "json_object": {"type": "json_object"},
+}
+
+EXAMPLE_ANSWER = json.dumps(
+    {
+        "requirements": [
+            {
+                "name": "Requirement/certification name",
+                "description": "Detailed description",
+                "category": "Category (e.g., Safety, Labeling, Testing)",
+                "source": "Source of information (if available)",
+            }
+        ],
+        "summary": "Brief summary of key requirements",
+    },
+    separators=(",", ":"),
+)
+
+
+def trim(text: str) -> str:
+    """Strip indentation, trailing spaces and blank lines from a template."""
+    return "\n".join(line.strip() for line in text.strip().splitlines() if line.strip())
+
+
+class PromptTemplate:
+    """
+    Chat prompt made of a fixed system message and a user message template.
+
+    Args:
+        system (str): Instructions shared by every request
+        user (str): ``str.format`` template for the per-request message
+    """
+
+    def __init__(self, system: str, user: str):
+        self.system = trim(system)
+        self.user = trim(user)
+
+    def render(self, **values) -> List[Dict[str, str]]:
+        """Return the chat messages with ``values`` substituted."""
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.user.format(**values)},
+        ]
+
+
+REQUIREMENTS_PROMPT = PromptTemplate(
+    system=f"""
+    You are a regulatory compliance expert. List the regulatory requirements,
+    certifications and standards a product must meet to legally enter and be
+    sold in a market.
+    Include:
+    1. Required certifications and their descriptions
+    2. Safety standards that must be met
+    3. Labeling requirements
+    4. Testing requirements
+    5. Import regulations
+    6. Any other relevant compliance requirements
+    Answer with only a JSON object of this structure:
+    {EXAMPLE_ANSWER}
+    """,
+    user="""
+    Provide a {detail_level} list of all regulatory requirements for a
+    {product_type} in the {market} market.
+    """,
+)
+
+
+def requirements_messages(product_type: str, market: str, detailed: bool) -> List[Dict[str, str]]:
+    """
+    Build the chat messages for a requirements lookup.
+
+    Args:
+        product_type (str): The type of product
+        market (str): The target market
+        detailed (bool): Whether a detailed answer was requested
+
+    Returns:
+        list: Messages for the chat completions API
+    """
+    return REQUIREMENTS_PROMPT.render(
+        detail_level="detailed and comprehensive" if detailed else "concise",
+        product_type=product_type,
+        market=market,
+    )
@@ -0,0 +1,330 @@
+"""
+Rate limiting primitives for the regulation extraction application.
+"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    """
+    Async token bucket refilled continuously at a fixed rate.
+
+    A caller reserves its tokens at once, driving the balance negative if
+    necessary, and then sleeps until the reservation is covered. Callers are
+    therefore served in the order they reserved, and a caller knows its full
+    wait before it starts sleeping. The balance may also go negative after
+    ``adjust`` debits actual usage that exceeded an estimate; later callers
+    then wait for the debt to be repaid.
+    """
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    @classmethod
+    def per_minute(cls, limit: float) -> "TokenBucket":
+        """Bucket allowing ``limit`` units per minute with a one-minute burst."""
+        return cls(limit / 60.0, limit)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1, max_wait: float = None) -> float:
+        """
+        Take ``amount`` tokens, waiting for them if necessary.
+
+        Args:
+            amount (float): Tokens to take; capped at the bucket capacity so a
+                single oversized request can still proceed
+            max_wait (float): Raise instead of waiting longer than this
+
+        Returns:
+            float: Seconds spent waiting
+
+        Raises:
+            asyncio.TimeoutError: If the wait would exceed ``max_wait``; no
+                tokens are taken
+        """
+        # Nothing is awaited until the tokens are reserved, so no lock is needed
+        self._refill()
+        needed = min(amount, self.capacity)
+        wait = max(0.0, (needed - self.tokens) / self.rate)
+        if max_wait is not None and wait > max_wait:
+            raise asyncio.TimeoutError(f"Rate limit wait of {wait:.1f}s exceeds deadline")
+        self.tokens -= amount
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
+
+    def adjust(self, amount: float):
+        """Debit (positive) or credit (negative) tokens after the fact."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+    async def settle(self, amount: float):
+        """``adjust`` from a coroutine, for parity with ``SharedTokenBucket``."""
+        self.adjust(amount)
+
+
+class SharedTokenBucket:
+    """
+    Token bucket kept in a SQLite file so several processes share one budget.
+
+    Worker processes of the same deployment open the same file and row, so a
+    per-minute quota holds for the deployment as a whole rather than for each
+    worker. Instead of waiting in a queue, a caller reserves its tokens at
+    once, driving the balance negative if necessary, and then sleeps until
+    the reservation is covered; callers are therefore served in the order
+    they reserved. State survives restarts, and clock time is used because
+    monotonic clocks are not comparable across processes. Another process
+    may hold the file's write lock for a moment, so the coroutine methods
+    run their transaction in a worker thread rather than on the event loop.
+
+    Args:
+        path (str): SQLite file holding the buckets
+        name (str): Row identifying the bucket in the file
+        rate_per_second (float): Refill rate
+        capacity (float): Largest balance (the burst size)
+    """
+
+    def __init__(self, path: str, name: str, rate_per_second: float, capacity: float):
+        self.name = name
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        # Transactions are managed explicitly to take the write lock up front
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS buckets (
+                name TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute(
+            "INSERT OR IGNORE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+            (name, capacity, time.time()),
+        )
+
+    @classmethod
+    def per_minute(cls, path: str, name: str, limit: float) -> "SharedTokenBucket":
+        """Bucket allowing ``limit`` units per minute with a one-minute burst."""
+        return cls(path, name, limit / 60.0, limit)
+
+    def _take(self, amount: float, max_wait: float = None) -> float:
+        """Refill, debit ``amount`` and return how long the caller must wait."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                tokens, updated = self._db.execute(
+                    "SELECT tokens, updated FROM buckets WHERE name = ?", (self.name,)
+                ).fetchone()
+                now = time.time()
+                tokens = min(self.capacity, tokens + max(0.0, now - updated) * self.rate)
+                needed = min(amount, self.capacity)
+                wait = max(0.0, (needed - tokens) / self.rate)
+                if max_wait is not None and wait > max_wait:
+                    raise asyncio.TimeoutError(
+                        f"Rate limit wait of {wait:.1f}s exceeds deadline"
+                    )
+                self._db.execute(
+                    "UPDATE buckets SET tokens = ?, updated = ? WHERE name = ?",
+                    (min(self.capacity, tokens - amount), now, self.name),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return wait
+
+    async def acquire(self, amount: float = 1, max_wait: float = None) -> float:
+        """
+        Take ``amount`` tokens, waiting for them if necessary.
+
+        Args:
+            amount (float): Tokens to take; capped at the bucket capacity so a
+                single oversized request can still proceed
+            max_wait (float): Raise instead of waiting longer than this
+
+        Returns:
+            float: Seconds spent waiting
+
+        Raises:
+            asyncio.TimeoutError: If the wait would exceed ``max_wait``
+        """
+        wait = await asyncio.to_thread(self._take, amount, max_wait)
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
+
+    def adjust(self, amount: float):
+        """Debit (positive) or credit (negative) tokens after the fact."""
+        self._take(amount)
+
+    async def settle(self, amount: float):
+        """``adjust`` without blocking the event loop."""
+        await asyncio.to_thread(self._take, amount)
+
+    def close(self):
+        """Close the SQLite connection."""
+        with self._lock:
+            self._db.close()
+
+
+class KeyedTokenBuckets:
+    """
+    Token buckets per key, such as per client, that reject instead of waiting.
+
+    Each bucket is a balance and a timestamp in a dictionary, so a check is
+    O(1). Only the ``max_keys`` most recently used keys are remembered; a
+    forgotten key starts again with a full bucket.
+
+    Args:
+        max_keys (int): Number of keys to remember
+    """
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    def take(self, key: str, rate_per_second: float, capacity: float, amount: float = 1) -> float:
+        """
+        Take ``amount`` tokens from the bucket of ``key`` if it holds enough.
+
+        Args:
+            key (str): Identity of the bucket
+            rate_per_second (float): Refill rate
+            capacity (float): Largest balance (the burst size)
+            amount (float): Tokens to take. More than the capacity can be
+                taken from a full bucket, leaving it in debt, so a large
+                request is still charged in full
+
+        Returns:
+            float: 0 if the tokens were taken, else the seconds until they
+            would be available (nothing is taken)
+        """
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [capacity, now]
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate_per_second)
+            bucket[1] = now
+        needed = min(amount, capacity)
+        if bucket[0] < needed:
+            return (needed - bucket[0]) / rate_per_second
+        bucket[0] -= amount
+        return 0.0
+
+    async def charge(
+        self, key: str, rate_per_second: float, capacity: float, amount: float = 1
+    ) -> float:
+        """``take`` from a coroutine, for parity with ``SharedKeyedTokenBuckets``."""
+        return self.take(key, rate_per_second, capacity, amount)
+
+
+class SharedKeyedTokenBuckets:
+    """
+    Token buckets per key kept in a SQLite file so several processes share them.
+
+    The file-backed counterpart of ``KeyedTokenBuckets``: worker processes
+    opening the same file draw on one balance per key, so a client's quota
+    holds for the deployment as a whole rather than for each worker. Each row
+    records when its bucket will be full again, and rows past that time are
+    deleted, as a forgotten key starts with a full bucket anyway. ``charge``
+    runs the transaction in a worker thread, since another process may hold
+    the file's write lock for a moment.
+
+    Args:
+        path (str): SQLite file holding the buckets
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        # Transactions are managed explicitly to take the write lock up front
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS keyed_buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL,
+                full_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS keyed_buckets_full_at ON keyed_buckets (full_at)"
+        )
+
+    def take(self, key: str, rate_per_second: float, capacity: float, amount: float = 1) -> float:
+        """
+        Take ``amount`` tokens from the bucket of ``key`` if it holds enough.
+
+        Args:
+            key (str): Identity of the bucket
+            rate_per_second (float): Refill rate
+            capacity (float): Largest balance (the burst size)
+            amount (float): Tokens to take. More than the capacity can be
+                taken from a full bucket, leaving it in debt, so a large
+                request is still charged in full
+
+        Returns:
+            float: 0 if the tokens were taken, else the seconds until they
+            would be available (nothing is taken)
+        """
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                self._db.execute("DELETE FROM keyed_buckets WHERE full_at <= ?", (now,))
+                row = self._db.execute(
+                    "SELECT tokens, updated FROM keyed_buckets WHERE key = ?", (key,)
+                ).fetchone()
+                tokens = capacity
+                if row is not None:
+                    tokens = min(capacity, row[0] + max(0.0, now - row[1]) * rate_per_second)
+                needed = min(amount, capacity)
+                wait = 0.0
+                if tokens < needed:
+                    wait = (needed - tokens) / rate_per_second
+                else:
+                    tokens -= amount
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO keyed_buckets (key, tokens, updated, full_at)"
+                        " VALUES (?, ?, ?, ?)",
+                        (key, tokens, now, now + (capacity - tokens) / rate_per_second),
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return wait
+
+    async def charge(
+        self, key: str, rate_per_second: float, capacity: float, amount: float = 1
+    ) -> float:
+        """``take`` without blocking the event loop."""
+        return await asyncio.to_thread(self.take, key, rate_per_second, capacity, amount)
+
+    def close(self):
+        """Close the SQLite connection."""
+        with self._lock:
+            self._db.close()
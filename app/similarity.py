@@ -0,0 +1,152 @@
+"""
+Near-duplicate matching of product descriptions.
+
+Users describe the same product in many ways ("fitness band with lithium
+battery", "lithium battery fitness bands"), so exact cache keys miss answers
+that could be reused. Descriptions are compared as TF-IDF weighted vectors of
+character trigrams, which tolerate word order, plurals and small spelling
+differences without any model or network access. Vectors are sparse, so the
+index is an inverted list of trigram postings in plain Python: a query only
+touches documents that share at least one trigram with it.
+"""
+
+import heapq
+import math
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from app.cache import normalize_text
+
+NGRAM_SIZE = 3
+
+# Connecting words that carry no meaning for matching product descriptions
+STOP_WORDS = frozenset({"a", "an", "and", "for", "in", "of", "the", "to", "with"})
+
+
+def singular(word: str) -> str:
+    """Strip common English plural endings ("batteries" -> "battery")."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def char_ngrams(text: str, n: int = NGRAM_SIZE) -> Counter:
+    """
+    Count the character n-grams of each word of a normalized description.
+
+    Words are reduced to their singular form and padded with spaces so that
+    n-grams at word starts and ends are distinct from those in the middle of a
+    word.
+    """
+    grams: Counter = Counter()
+    for word in normalize_text(text).split():
+        if word in STOP_WORDS:
+            continue
+        padded = f" {singular(word)} "
+        if len(padded) <= n:
+            grams[padded] += 1
+            continue
+        for i in range(len(padded) - n + 1):
+            grams[padded[i : i + n]] += 1
+    return grams
+
+
+class NgramIndex:
+    """
+    Cosine-similarity search over character n-gram TF-IDF vectors.
+
+    Documents are added incrementally; inverse document frequencies and the
+    document norms that depend on them are recomputed lazily on the next
+    search after the corpus changed.
+    """
+
+    def __init__(self):
+        self._docs: Dict[str, Counter] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._idf: Dict[str, float] = {}
+        self._norms: Dict[str, float] = {}
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, key: str, text: str):
+        """Index ``text`` under ``key``, replacing an earlier document with that key."""
+        self.remove(key)
+        grams = char_ngrams(text)
+        if not grams:
+            return
+        self._docs[key] = grams
+        for gram, count in grams.items():
+            self._postings.setdefault(gram, {})[key] = count
+        self._dirty = True
+
+    def remove(self, key: str):
+        """Drop the document indexed under ``key``, if any."""
+        grams = self._docs.pop(key, None)
+        if grams is None:
+            return
+        for gram in grams:
+            postings = self._postings[gram]
+            del postings[key]
+            if not postings:
+                del self._postings[gram]
+        self._dirty = True
+
+    def _reweight(self):
+        # Smoothed IDF, so a corpus of one document still gives usable weights
+        total = len(self._docs) + 1
+        self._idf = {
+            gram: math.log(total / (len(postings) + 1)) + 1
+            for gram, postings in self._postings.items()
+        }
+        self._norms = {
+            key: math.sqrt(sum((count * self._idf[gram]) ** 2 for gram, count in grams.items()))
+            for key, grams in self._docs.items()
+        }
+        self._dirty = False
+
+    def search(self, text: str, limit: int = 1) -> List[Tuple[str, float]]:
+        """
+        Find the documents most similar to ``text``.
+
+        Args:
+            text (str): Description to match
+            limit (int): Maximum number of matches
+
+        Returns:
+            List[Tuple[str, float]]: (key, cosine similarity) pairs, best first
+        """
+        if self._dirty:
+            self._reweight()
+        # Trigrams never seen in the corpus cannot match but still count
+        # towards the query norm, so unrelated words lower the score
+        default_idf = math.log(len(self._docs) + 1) + 1
+        query = {
+            gram: count * self._idf.get(gram, default_idf)
+            for gram, count in char_ngrams(text).items()
+        }
+        query_norm = math.sqrt(sum(weight * weight for weight in query.values()))
+        if not query_norm:
+            return []
+
+        scores: Dict[str, float] = {}
+        for gram, weight in query.items():
+            postings = self._postings.get(gram)
+            if postings is None:
+                continue
+            idf = self._idf[gram]
+            for key, count in postings.items():
+                scores[key] = scores.get(key, 0.0) + weight * count * idf
+
+        # Rounding can put identical descriptions a hair above 1
+        return heapq.nlargest(
+            limit,
+            (
+                (key, min(1.0, score / (query_norm * self._norms[key])))
+                for key, score in scores.items()
+            ),
+            key=lambda match: match[1],
+        )
@@ -0,0 +1,75 @@
+"""
+Request coalescing for the regulation extraction application.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """An upstream call shared by every caller waiting on the same key."""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Share one in-flight call between concurrent callers using the same key.
+
+    The first caller for a key starts the call as a separate task; callers that
+    arrive while it is running await the same task instead of starting their
+    own. Results and exceptions are delivered to every waiter. A caller that is
+    cancelled (e.g. its client disconnected) stops waiting without cancelling
+    the shared call, unless it was the last waiter, in which case the upstream
+    call is cancelled too.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.stats: Dict[str, int] = {"leaders": 0, "followers": 0}
+
+    def in_flight(self) -> int:
+        """Return the number of distinct keys currently being fetched."""
+        return len(self._flights)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run ``fn`` for ``key`` unless an identical call is already running.
+
+        Args:
+            key (str): Identity of the call, e.g. a cache key
+            fn (Callable): Coroutine factory performing the upstream call
+
+        Returns:
+            Any: The result of the shared call
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.create_task(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.stats["leaders"] += 1
+        else:
+            self.stats["followers"] += 1
+            logger.info("Joining in-flight lookup for %s", key)
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                # Nobody is left to receive the result
+                flight.task.cancel()
+                self._forget(key, flight)
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
@@ -0,0 +1,431 @@
+"""
+Requirement knowledge store for the regulation extraction application.
+
+Every validated answer is written to SQLite in normalized form: one row per
+product/market lookup and one row per requirement, with a full-text index
+(FTS5) over the requirement text. This lets the API answer questions such as
+"which requirements apply to market X, in category Y, mentioning Z" from
+local data in milliseconds, without calling the LLM.
+
+Answers are kept per variant, an opaque string naming what besides the
+product and market shapes an answer (detail level, model, prompt version),
+so an answer is only served back to lookups of the variant it was made for.
+
+When a cached answer is refreshed, the requirement names that were added or
+removed are recorded in a ``changes`` table for auditing.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.cache import normalize_text
+from app.models import MarketRequirementsResponse, RequirementChange, StoredRequirement
+from app.similarity import NgramIndex
+
+logger = logging.getLogger(__name__)
+
+LOOKUPS_TABLE = """
+CREATE TABLE IF NOT EXISTS lookups (
+    id INTEGER PRIMARY KEY,
+    product_key TEXT NOT NULL,
+    market_key TEXT NOT NULL,
+    variant TEXT NOT NULL DEFAULT '',
+    product_type TEXT NOT NULL,
+    market TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    UNIQUE (product_key, market_key, variant)
+);
+"""
+
+SCHEMA = LOOKUPS_TABLE + """
+CREATE INDEX IF NOT EXISTS lookups_market ON lookups (market_key);
+
+CREATE TABLE IF NOT EXISTS requirements (
+    id INTEGER PRIMARY KEY,
+    lookup_id INTEGER NOT NULL REFERENCES lookups (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    category TEXT NOT NULL COLLATE NOCASE,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS requirements_lookup ON requirements (lookup_id, position);
+CREATE INDEX IF NOT EXISTS requirements_category ON requirements (category);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS requirements_fts USING fts5 (
+    name, description, category, source,
+    content='requirements', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS requirements_ai AFTER INSERT ON requirements BEGIN
+    INSERT INTO requirements_fts (rowid, name, description, category, source)
+    VALUES (new.id, new.name, new.description, new.category, new.source);
+END;
+CREATE TRIGGER IF NOT EXISTS requirements_ad AFTER DELETE ON requirements BEGIN
+    INSERT INTO requirements_fts (requirements_fts, rowid, name, description, category, source)
+    VALUES ('delete', old.id, old.name, old.description, old.category, old.source);
+END;
+
+CREATE TABLE IF NOT EXISTS changes (
+    id INTEGER PRIMARY KEY,
+    product_key TEXT NOT NULL,
+    market_key TEXT NOT NULL,
+    product_type TEXT NOT NULL,
+    market TEXT NOT NULL,
+    changed_at REAL NOT NULL,
+    added TEXT NOT NULL,
+    removed TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS changes_market ON changes (market_key, changed_at);
+"""
+
+
+def fts_query(text: str) -> str:
+    """
+    Turn free text into an FTS5 query matching all of its terms.
+
+    Each term is quoted so punctuation in standard numbers ("UN 38.3",
+    "EN 71-1") is not read as query syntax; the last term matches as a prefix
+    so partially typed words still find results.
+    """
+    terms = ['"' + term.replace('"', '""') + '"' for term in text.split()]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+def diff_requirement_names(
+    old: MarketRequirementsResponse, new: MarketRequirementsResponse
+) -> Tuple[List[str], List[str]]:
+    """
+    Compare the requirement names of two answers, ignoring case and spacing.
+
+    Returns:
+        tuple: (names only in ``new``, names only in ``old``), in answer order
+    """
+    old_keys = {normalize_text(req.name) for req in old.requirements}
+    new_keys = {normalize_text(req.name) for req in new.requirements}
+    added = [req.name for req in new.requirements if normalize_text(req.name) not in old_keys]
+    removed = [req.name for req in old.requirements if normalize_text(req.name) not in new_keys]
+    return added, removed
+
+
+class RequirementStore:
+    """Normalized, searchable SQLite store of validated answers."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._add_variants()
+        self._db.execute("PRAGMA foreign_keys=ON")
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+        # Product descriptions answered so far, per market and variant, for
+        # near-duplicate matching
+        self._products: Dict[Tuple[str, str], NgramIndex] = {}
+        for product_key, market_key, variant in self._db.execute(
+            "SELECT product_key, market_key, variant FROM lookups"
+        ):
+            self._products.setdefault((market_key, variant), NgramIndex()).add(
+                product_key, product_key
+            )
+
+    def _add_variants(self):
+        """
+        Rebuild a lookups table from before answers were kept per variant.
+
+        Its answers are kept under the empty variant, so they stay searchable
+        but are never served as an answer to a lookup. Runs with foreign keys
+        off, so dropping the old table leaves the requirements in place.
+        """
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(lookups)")}
+        if not columns or "variant" in columns:
+            return
+        logger.info("Upgrading the requirement store to keep answers per variant")
+        # The new table is built under another name and renamed once the old
+        # one is gone, so the requirements' foreign key keeps naming "lookups"
+        with self._db:
+            self._db.execute(LOOKUPS_TABLE.replace("lookups", "lookups_new"))
+            self._db.execute(
+                "INSERT INTO lookups_new (id, product_key, market_key, product_type, market,"
+                " summary, fetched_at) SELECT id, product_key, market_key, product_type,"
+                " market, summary, fetched_at FROM lookups"
+            )
+            self._db.execute("DROP TABLE lookups")
+            self._db.execute("ALTER TABLE lookups_new RENAME TO lookups")
+
+    def save(self, response: MarketRequirementsResponse, variant: str = ""):
+        """
+        Store an answer, replacing any earlier answer for the same lookup.
+
+        Args:
+            response (MarketRequirementsResponse): Validated response to store
+            variant (str): Variant the answer was made for
+        """
+        product_key = normalize_text(response.product_type)
+        market_key = normalize_text(response.market)
+        with self._lock, self._db:
+            # Deleting the lookup cascades to its requirements and their index rows
+            self._db.execute(
+                "DELETE FROM lookups WHERE product_key = ? AND market_key = ? AND variant = ?",
+                (product_key, market_key, variant),
+            )
+            lookup_id = self._db.execute(
+                "INSERT INTO lookups (product_key, market_key, variant, product_type, market,"
+                " summary, fetched_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    product_key,
+                    market_key,
+                    variant,
+                    response.product_type,
+                    response.market,
+                    response.summary,
+                    time.time(),
+                ),
+            ).lastrowid
+            self._db.executemany(
+                "INSERT INTO requirements (lookup_id, position, name, description,"
+                " category, source) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (lookup_id, position, req.name, req.description, req.category, req.source)
+                    for position, req in enumerate(response.requirements)
+                ],
+            )
+            self._products.setdefault((market_key, variant), NgramIndex()).add(
+                product_key, product_key
+            )
+
+    def get(
+        self,
+        product_type: str,
+        market: str,
+        max_age: Optional[float] = None,
+        variant: str = "",
+    ) -> Optional[MarketRequirementsResponse]:
+        """
+        Return the stored answer for a product/market lookup.
+
+        Args:
+            product_type (str): The type of product
+            market (str): The target market
+            max_age (Optional[float]): Ignore an answer fetched longer ago than
+                this (seconds)
+            variant (str): Only an answer made for this variant
+
+        Returns:
+            Optional[MarketRequirementsResponse]: The latest stored answer, or None
+        """
+        oldest = time.time() - max_age if max_age is not None else float("-inf")
+        with self._lock:
+            lookup = self._db.execute(
+                "SELECT id, product_type, market, summary FROM lookups"
+                " WHERE product_key = ? AND market_key = ? AND variant = ?"
+                " AND fetched_at >= ?",
+                (normalize_text(product_type), normalize_text(market), variant, oldest),
+            ).fetchone()
+            if lookup is None:
+                return None
+            rows = self._db.execute(
+                "SELECT name, description, category, source FROM requirements"
+                " WHERE lookup_id = ? ORDER BY position",
+                (lookup[0],),
+            ).fetchall()
+        return MarketRequirementsResponse(
+            product_type=lookup[1],
+            market=lookup[2],
+            summary=lookup[3],
+            requirements=[
+                {"name": name, "description": description, "category": category, "source": source}
+                for name, description, category, source in rows
+            ],
+        )
+
+    def find_similar(
+        self,
+        product_type: str,
+        market: str,
+        threshold: float,
+        max_age: float,
+        variant: str = "",
+    ) -> Optional[Tuple[MarketRequirementsResponse, float]]:
+        """
+        Return a recent stored answer for a similarly described product.
+
+        Args:
+            product_type (str): The type of product, in the caller's words
+            market (str): The target market; only answers for it are considered
+            threshold (float): Minimum cosine similarity of the descriptions
+            max_age (float): Ignore answers fetched longer ago than this (seconds)
+            variant (str): Only answers made for this variant are considered
+
+        Returns:
+            Optional[Tuple[MarketRequirementsResponse, float]]: The stored
+            answer and the similarity, or None if nothing is close enough
+        """
+        with self._lock:
+            index = self._products.get((normalize_text(market), variant))
+            matches = index.search(product_type, limit=1) if index is not None else []
+        if not matches or matches[0][1] < threshold:
+            return None
+        product_key, score = matches[0]
+        result = self.get(product_key, market, max_age=max_age, variant=variant)
+        return (result, score) if result is not None else None
+
+    def record_change(
+        self, response: MarketRequirementsResponse, added: List[str], removed: List[str]
+    ) -> RequirementChange:
+        """
+        Record which requirement names a refresh of ``response`` added and removed.
+
+        Args:
+            response (MarketRequirementsResponse): The refreshed answer
+            added (List[str]): Names that are new in the refreshed answer
+            removed (List[str]): Names that are no longer in it
+
+        Returns:
+            RequirementChange: The recorded change
+        """
+        change = RequirementChange(
+            product_type=response.product_type,
+            market=response.market,
+            changed_at=time.time(),
+            added=added,
+            removed=removed,
+        )
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO changes (product_key, market_key, product_type, market,"
+                " changed_at, added, removed) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    normalize_text(change.product_type),
+                    normalize_text(change.market),
+                    change.product_type,
+                    change.market,
+                    change.changed_at,
+                    json.dumps(added),
+                    json.dumps(removed),
+                ),
+            )
+        return change
+
+    def changes(
+        self,
+        market: Optional[str] = None,
+        product_type: Optional[str] = None,
+        limit: int = 50,
+    ) -> List[RequirementChange]:
+        """
+        Return recorded changes, newest first.
+
+        Args:
+            market (str): Only changes for this market
+            product_type (str): Only changes for this product type
+            limit (int): Maximum number of changes
+
+        Returns:
+            List[RequirementChange]: Matching changes
+        """
+        clauses = []
+        params = []
+        if market:
+            clauses.append("market_key = ?")
+            params.append(normalize_text(market))
+        if product_type:
+            clauses.append("product_key = ?")
+            params.append(normalize_text(product_type))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        params.append(limit)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT product_type, market, changed_at, added, removed FROM changes"
+                f" {where} ORDER BY changed_at DESC LIMIT ?",
+                params,
+            ).fetchall()
+        return [
+            RequirementChange(
+                product_type=product_type,
+                market=market,
+                changed_at=changed_at,
+                added=json.loads(added),
+                removed=json.loads(removed),
+            )
+            for product_type, market, changed_at, added, removed in rows
+        ]
+
+    def search(
+        self,
+        market: Optional[str] = None,
+        category: Optional[str] = None,
+        text: Optional[str] = None,
+        product_type: Optional[str] = None,
+        limit: int = 50,
+    ) -> List[StoredRequirement]:
+        """
+        Find stored requirements matching every given filter.
+
+        Args:
+            market (str): Only requirements for this market
+            category (str): Only requirements in this category (case-insensitive)
+            text (str): Full-text terms to match in name, description, category
+                or source; results are ranked by relevance
+            product_type (str): Only requirements for this product type
+            limit (int): Maximum number of results
+
+        Returns:
+            List[StoredRequirement]: Matching requirements, most relevant (or
+            most recently fetched) first
+        """
+        clauses = []
+        params = []
+        if text and text.split():
+            source = "requirements_fts JOIN requirements r ON r.id = requirements_fts.rowid"
+            clauses.append("requirements_fts MATCH ?")
+            params.append(fts_query(text))
+            order = "requirements_fts.rank"
+        else:
+            source = "requirements r"
+            order = "l.fetched_at DESC, r.position"
+        if market:
+            clauses.append("l.market_key = ?")
+            params.append(normalize_text(market))
+        if product_type:
+            clauses.append("l.product_key = ?")
+            params.append(normalize_text(product_type))
+        if category:
+            clauses.append("r.category = ?")
+            params.append(category.strip())
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        params.append(limit)
+
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT r.name, r.description, r.category, r.source, l.product_type,"
+                f" l.market, l.fetched_at FROM {source}"
+                f" JOIN lookups l ON l.id = r.lookup_id {where}"
+                f" ORDER BY {order} LIMIT ?",
+                params,
+            ).fetchall()
+        return [
+            StoredRequirement(
+                name=name,
+                description=description,
+                category=category,
+                source=source_url,
+                product_type=product_type,
+                market=market,
+                fetched_at=fetched_at,
+            )
+            for name, description, category, source_url, product_type, market, fetched_at in rows
+        ]
+
+    def close(self):
+        """Close the SQLite connection."""
+        with self._lock:
+            self._db.close()
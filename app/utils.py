@@ -4,15 +4,123 @@ Utility functions for the regulation extraction application.
 
 import json
 import logging
+import re
+
+from pydantic import ValidationError
+
+from app.metrics import PARSE_FAILURES, PARSE_SECONDS
+from app.models import MarketRequirementsResponse, RequirementsPayload
 
 logger = logging.getLogger(__name__)
 
 
+# Shared decoder; raw_decode parses one JSON value starting at a given index
+_decoder = json.JSONDecoder()
+
+# Opening of a Markdown code fence including its optional language tag
+_FENCE_OPEN = re.compile(r"```[A-Za-z]*")
+
+# Start of a non-empty JSON object, or of an array holding objects/arrays.
+# Filtering on the next character avoids decode attempts at prose such as
+# "{section 4}" or citation markers like "[1]".
+_CANDIDATE_START = re.compile(r'\{\s*["}]|\[\s*[\[{]')
+
+# Matching closing character for each container opening
+_CLOSERS = {"{": "}", "[": "]"}
+
+# Characters decoded at first for a candidate; see _decode_candidate
+_DECODE_WINDOW = 512
+
+# Errors this close to the end of a window may be caused by the window itself
+_DECODE_MARGIN = 16
+
+# Strings and brackets, for finding the end of a value too deeply nested to decode
+_NESTING_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|[{}\[\]]')
+
+
+def _extract_fenced_json(content: str):
+    """
+    Return the body of the first Markdown code block shaped like JSON.
+
+    Only the outer characters are checked here; the body is validated once
+    when it is parsed.
+    """
+    fence = _FENCE_OPEN.search(content)
+    while fence:
+        end_idx = content.find("```", fence.end())
+        if end_idx < 0:
+            return None
+
+        body = content[fence.end() : end_idx].strip()
+        if body and _CLOSERS.get(body[0]) == body[-1]:
+            return body
+
+        # Skip past the closing fence to the next block
+        fence = _FENCE_OPEN.search(content, end_idx + 3)
+    return None
+
+
+def _skip_nested(content: str, start: int) -> int:
+    """
+    Return the position after the value opening at ``start``.
+
+    Brackets are counted iteratively, so nesting too deep for the decoder is
+    skipped in one linear pass. An unclosed value extends to the end.
+    """
+    depth = 0
+    for token in _NESTING_TOKEN.finditer(content, start):
+        char = token.group()
+        if char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                return token.end()
+    return len(content)
+
+
+def _decode_candidate(content: str, start: int):
+    """
+    Decode the JSON value starting at ``start``.
+
+    A decoding error counts lines from the start of the decoded string, so
+    decoding from the full content would make each failed candidate cost
+    O(start). The value is instead decoded from a window of the content,
+    doubled until the outcome cannot depend on where the window ends: a value
+    that decodes is complete, and an error is only trusted away from the end
+    of the window and outside an unterminated string.
+
+    Returns:
+        tuple: (True, end of the value) or (False, position to resume the scan)
+    """
+    size = _DECODE_WINDOW
+    while True:
+        window = content[start : start + size]
+        try:
+            _, end_idx = _decoder.raw_decode(window)
+            return True, start + end_idx
+        except json.JSONDecodeError as e:
+            if start + size >= len(content) or (
+                e.pos < size - _DECODE_MARGIN and not e.msg.startswith("Unterminated")
+            ):
+                # Resume after what the decoder already read
+                return False, start + max(e.pos, 1)
+        except RecursionError:
+            return False, _skip_nested(content, start)
+        size *= 2
+
+
 def clean_json_content(content: str) -> str:
     """
     Cleans JSON content by removing Markdown code block formatting and extracts
     valid JSON even when surrounded by descriptive text.
 
+    A fenced code block shaped like JSON is preferred. Otherwise the content is
+    scanned once for the first position where a complete JSON object (or array
+    of objects) can be decoded. A candidate that fails to decode is skipped
+    together with the part the decoder already read, so no character is
+    decoded twice and nested fragments of a broken value are not returned.
+
     Args:
         content (str): The raw response content possibly containing Markdown formatting
                       and surrounding text
@@ -26,80 +134,27 @@ def clean_json_content(content: str) -> str:
 
     # First try to extract JSON from Markdown code blocks
     if "```" in content:
-        # Extract content between code blocks
-        # If it starts with ```json or ```JSON
-        if "```json" in content or "```JSON" in content:
-            start_marker = "```json" if "```json" in content else "```JSON"
-            start_idx = content.find(start_marker) + len(start_marker)
-            end_idx = content.find("```", start_idx)
-
-            if end_idx > start_idx:
-                return content[start_idx:end_idx].strip()
-
-        # If it just has ``` but not json specifically
-        start_idx = content.find("```") + 3
-        end_idx = content.rfind("```")
-
-        if end_idx > start_idx:
-            potential_json = content[start_idx:end_idx].strip()
-            # Check if this looks like valid JSON
-            if (potential_json.startswith("{") and potential_json.endswith("}")) or (
-                potential_json.startswith("[") and potential_json.endswith("]")
-            ):
-                return potential_json
+        fenced = _extract_fenced_json(content)
+        if fenced is not None:
+            return fenced
 
-    # If no markdown blocks or extraction failed, try to find JSON by looking for curly braces
-    # This handles cases where JSON is embedded in descriptive text
-    try:
-        # Find the first opening brace
-        open_brace_idx = content.find("{")
-        if open_brace_idx >= 0:
-            # Track nested braces to find the matching closing brace
-            brace_count = 0
-            in_string = False
-            escape_next = False
-
-            for i in range(open_brace_idx, len(content)):
-                char = content[i]
-
-                # Handle string boundaries
-                if char == '"' and not escape_next:
-                    in_string = not in_string
-
-                # Handle escape sequences within strings
-                if char == "\\" and in_string and not escape_next:
-                    escape_next = True
-                    continue
-                escape_next = False
-
-                # Count braces only when not in a string
-                if not in_string:
-                    if char == "{":
-                        brace_count += 1
-                    elif char == "}":
-                        brace_count -= 1
-
-                        # If we've found the matching closing brace
-                        if brace_count == 0:
-                            # Extract the JSON object
-                            extracted_json = content[open_brace_idx : i + 1]
-
-                            # Validate that it looks like proper JSON
-                            try:
-                                json.loads(extracted_json)
-                                return extracted_json
-                            except json.JSONDecodeError:
-                                pass  # Not valid JSON, continue searching
-
-    except Exception as e:
-        logger.warning(f"Error while trying to extract JSON: {str(e)}")
+    # Find the first decodable JSON value embedded in descriptive text
+    candidate = _CANDIDATE_START.search(content)
+    while candidate:
+        start_idx = candidate.start()
+        decoded, end_idx = _decode_candidate(content, start_idx)
+        if decoded:
+            return content[start_idx:end_idx]
+        candidate = _CANDIDATE_START.search(content, end_idx)
 
     # If all extraction methods failed, return the original content
     # Let the JSON parser handle the error
     return content
 
 
-def parse_regulation_data(content: str, product_type: str, market: str):
+def parse_regulation_data(
+    content: str, product_type: str, market: str, json_mode: bool = False
+):
     """
     Parses the JSON response from OpenAI and validates its structure.
 
@@ -107,52 +162,195 @@ def parse_regulation_data(content: str, product_type: str, market: str):
         content (str): The cleaned JSON content
         product_type (str): The type of product
         market (str): The target market
+        json_mode (bool): The completion was requested as bare JSON, so it is
+            parsed directly; ``clean_json_content`` is only used if that fails
 
     Returns:
         tuple: (success (bool), result (dict or error message))
     """
-    from app.models import (
-        MarketRequirementsResponse,
-    )  # Import here to avoid circular imports
+    with PARSE_SECONDS.time():
+        return _parse_regulation_data(content, product_type, market, json_mode)
+
+
+def _validate_json(content: str, json_mode: bool):
+    """
+    Decode and validate an answer in one step.
+
+    Returns:
+        tuple: (content that was validated, RequirementsPayload)
 
+    Raises:
+        ValidationError: If the content is not valid JSON of the expected shape
+    """
+    if json_mode:
+        try:
+            return content, RequirementsPayload.model_validate_json(content)
+        except ValidationError as e:
+            if not _is_invalid_json(e):
+                raise
+            logger.warning("JSON mode answer is not bare JSON, cleaning it")
+    cleaned_content = clean_json_content(content)
+    logger.info("Cleaned JSON content (length: %d chars)", len(cleaned_content))
     try:
-        # Clean the content first
-        cleaned_content = clean_json_content(content)
-        logger.info(f"Cleaned JSON content (length: {len(cleaned_content)} chars)")
-
-        # Parse the JSON
-        regulation_data = json.loads(cleaned_content)
-
-        # Validate the structure
-        if "requirements" not in regulation_data or "summary" not in regulation_data:
-            logger.error(f"Invalid response structure: {regulation_data.keys()}")
-            return False, {
-                "product_type": product_type,
-                "market": market,
-                "error": "API response missing required fields",
-                "raw_response": cleaned_content,
-            }
-
-        # Create the structured response
-        response = MarketRequirementsResponse(
-            product_type=product_type,
-            market=market,
-            requirements=regulation_data["requirements"],
-            summary=regulation_data["summary"],
-        )
-
-        return True, response
-
-    except json.JSONDecodeError as e:
-        error_msg = f"JSON parsing error: {str(e)}"
+        return cleaned_content, RequirementsPayload.model_validate_json(cleaned_content)
+    except ValidationError as e:
+        # Keep the cleaned content for the error report
+        e.cleaned_content = cleaned_content
+        raise
+
+
+def _is_invalid_json(error: ValidationError) -> bool:
+    return any(item["type"] == "json_invalid" for item in error.errors())
+
+
+def _parse_regulation_data(content: str, product_type: str, market: str, json_mode: bool):
+    try:
+        cleaned_content, payload = _validate_json(content, json_mode)
+    except ValidationError as e:
+        cleaned_content = getattr(e, "cleaned_content", content)
+        errors = e.errors()
+        if _is_invalid_json(e):
+            reason = "invalid_json"
+            error_msg = f"JSON parsing error: {errors[0]['msg']}"
+        elif any(item["type"] == "missing" and len(item["loc"]) == 1 for item in errors):
+            reason = "missing_fields"
+            error_msg = "API response missing required fields"
+        else:
+            reason = "invalid_fields"
+            error_msg = f"Invalid requirement data: {errors[0]['msg']} at {errors[0]['loc']}"
+        PARSE_FAILURES.inc(reason)
         logger.error(error_msg)
-        logger.error(f"Failed to parse content")
+        logger.error("Failed to parse content")
 
         return False, {
             "product_type": product_type,
             "market": market,
             "error": error_msg,
-            "raw_response": cleaned_content
-            if "cleaned_content" in locals()
-            else content,
+            "raw_response": cleaned_content,
         }
+
+    # The parts were validated above, so the response is assembled without
+    # validating them again
+    response = MarketRequirementsResponse.model_construct(
+        product_type=product_type,
+        market=market,
+        requirements=payload.requirements,
+        summary=payload.summary,
+    )
+    return True, response
+
+
+class IncrementalRequirementsParser:
+    """
+    Extracts requirement objects from a streamed JSON response as they complete.
+
+    Tracks braces and string boundaries character by character and keeps that
+    state across chunks, so each object in the top-level ``"requirements"``
+    array can be emitted as soon as its closing brace arrives. Text outside the
+    JSON object (Markdown fences, descriptions) is ignored: an object only
+    starts at a ``{`` followed by a key, and an object that closes without a
+    ``"requirements"`` array is skipped, so braces in prose such as
+    "Annex {II}" do not end the scan.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._stack = []
+        self._in_string = False
+        self._escape_next = False
+        self._key_chars = None
+        self._last_key = None
+        self._array_key = None
+        self._pending = ""
+        self._capturing = False
+        self._opening = False
+        self._found = False
+        self._done = False
+
+    @property
+    def content(self) -> str:
+        """The full content received so far."""
+        return "".join(self._chunks)
+
+    def feed(self, chunk: str) -> list:
+        """
+        Consume the next chunk of streamed content.
+
+        Args:
+            chunk (str): Newly received text
+
+        Returns:
+            list: Requirement dictionaries completed by this chunk
+        """
+        self._chunks.append(chunk)
+        completed = []
+        if self._done:
+            return completed
+
+        capture_start = 0
+        for i, char in enumerate(chunk):
+            if self._in_string:
+                if self._escape_next:
+                    self._escape_next = False
+                elif char == "\\":
+                    self._escape_next = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._key_chars is not None:
+                        self._last_key = "".join(self._key_chars)
+                        self._key_chars = None
+                elif self._key_chars is not None:
+                    self._key_chars.append(char)
+                continue
+
+            if not self._stack:
+                # Skip everything before the top-level object, which opens
+                # with a brace and a key
+                if self._opening and char == '"':
+                    self._stack.append("{")
+                    self._opening = False
+                else:
+                    if not (self._opening and char.isspace()):
+                        self._opening = char == "{"
+                    continue
+
+            if char == '"':
+                self._in_string = True
+                # Strings directly inside the top-level object are keys or values;
+                # only the most recent one is needed to name the next array
+                self._key_chars = [] if len(self._stack) == 1 else None
+            elif char in "{[":
+                if len(self._stack) == 1 and char == "[":
+                    self._array_key = self._last_key
+                    self._found = self._found or self._array_key == "requirements"
+                self._stack.append(char)
+                if (
+                    len(self._stack) == 3
+                    and char == "{"
+                    and self._stack[1] == "["
+                    and self._array_key == "requirements"
+                ):
+                    self._capturing = True
+                    self._pending = ""
+                    capture_start = i
+            elif char in "}]":
+                self._stack.pop()
+                if self._capturing and len(self._stack) == 2:
+                    text = self._pending + chunk[capture_start : i + 1]
+                    self._capturing = False
+                    self._pending = ""
+                    try:
+                        completed.append(json.loads(text))
+                    except json.JSONDecodeError:
+                        logger.warning("Skipping malformed requirement in stream")
+                if not self._stack:
+                    if self._found:
+                        self._done = True
+                        break
+                    # Not the answer; keep looking for the next object
+                    self._last_key = None
+                    self._array_key = None
+
+        if self._capturing:
+            self._pending += chunk[capture_start:]
+        return completed
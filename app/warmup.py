@@ -0,0 +1,256 @@
+"""
+Precompute answers for a matrix of product types and markets.
+
+Runs the same prompt and parsing pipeline as the API for every pair in a CSV
+or YAML matrix and writes the results into the server's response cache and
+requirement store, so the first user to ask for a pair gets a cached answer.
+Completed pairs are appended to a checkpoint file, which lets an interrupted
+or partly failed run resume where it stopped. The checkpoint is deleted once
+a run has finished every pair, so the next scheduled run refreshes answers
+that have gone stale instead of skipping them.
+"""
+
+import argparse
+import asyncio
+import csv
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+import yaml
+from fastapi import HTTPException
+
+from app.cache import ResponseCache, longest_ttl, market_ttls
+from app.config import load_config
+from app.llm import LLMClient
+from app.logging_config import configure_logging
+from app.main import cache_key_for, fetch_requirements
+from app.metrics import LLM_TOKENS
+from app.models import ConfigSettings, MarketRequirementsRequest
+from app.store import RequirementStore
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WarmupReport:
+    """Outcome of a warm-up run."""
+
+    total: int = 0
+    succeeded: int = 0
+    skipped: int = 0
+    failures: Dict[str, str] = field(default_factory=dict)
+    elapsed_seconds: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    @property
+    def lookups_per_minute(self) -> float:
+        fetched = self.succeeded + len(self.failures)
+        return fetched / self.elapsed_seconds * 60 if self.elapsed_seconds else 0.0
+
+    def format(self) -> str:
+        lines = [
+            f"Pairs:        {self.total} ({self.skipped} already done)",
+            f"Succeeded:    {self.succeeded}",
+            f"Failed:       {len(self.failures)}",
+            f"Elapsed:      {self.elapsed_seconds:.1f}s",
+            f"Throughput:   {self.lookups_per_minute:.1f} lookups/minute",
+            f"Tokens:       {self.prompt_tokens} prompt + "
+            f"{self.completion_tokens} completion = "
+            f"{self.prompt_tokens + self.completion_tokens}",
+        ]
+        lines.extend(f"  failed {pair}: {error}" for pair, error in self.failures.items())
+        return "\n".join(lines)
+
+
+def load_matrix(path: str, detailed: bool = False) -> List[MarketRequirementsRequest]:
+    """
+    Read the product/market pairs to precompute.
+
+    CSV files need ``product_type`` and ``market`` columns (and may have a
+    ``detailed`` column). YAML files may list ``product_types`` and
+    ``markets``, which are combined into every pair, and/or explicit
+    ``items`` with ``product_type`` and ``market``.
+
+    Args:
+        path (str): CSV or YAML file
+        detailed (bool): Default for pairs that do not set ``detailed``
+
+    Returns:
+        List[MarketRequirementsRequest]: One request per distinct pair
+    """
+    if path.endswith(".csv"):
+        with open(path, newline="") as file:
+            items = [
+                {key: value for key, value in row.items() if value not in (None, "")}
+                for row in csv.DictReader(file)
+            ]
+    else:
+        with open(path, "r") as file:
+            matrix = yaml.safe_load(file) or {}
+        items = list(matrix.get("items", []))
+        items += [
+            {"product_type": product_type, "market": market}
+            for product_type in matrix.get("product_types", [])
+            for market in matrix.get("markets", [])
+        ]
+
+    requests = []
+    seen = set()
+    for item in items:
+        request = MarketRequirementsRequest(**{"detailed": detailed, **item})
+        pair = (request.product_type, request.market, request.detailed)
+        if pair not in seen:
+            seen.add(pair)
+            requests.append(request)
+    return requests
+
+
+def read_checkpoint(path: Optional[str]) -> Set[str]:
+    """Return the cache keys recorded as done by earlier runs."""
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, "r") as file:
+        return {line.rstrip("\n") for line in file if line.strip()}
+
+
+async def warm_up(
+    requests: List[MarketRequirementsRequest],
+    client: LLMClient,
+    cache: Optional[ResponseCache],
+    store: Optional[RequirementStore],
+    concurrency: int,
+    checkpoint_path: Optional[str] = None,
+    force: bool = False,
+) -> WarmupReport:
+    """
+    Fetch and store the answer for every request not already done.
+
+    Args:
+        requests: Pairs to precompute
+        client: LLM client; its rate limits pace the run
+        cache: Response cache the answers are written to
+        store: Requirement store the answers are written to
+        concurrency: Lookups run at the same time
+        checkpoint_path: File recording finished pairs, for resuming; deleted
+            when the run ends with no failures
+        force: Fetch pairs even if they are cached or checkpointed
+
+    Returns:
+        WarmupReport: Counts, failures, throughput and token use
+    """
+    config = client.settings
+    report = WarmupReport(total=len(requests))
+    done = set() if force else read_checkpoint(checkpoint_path)
+    checkpoint = open(checkpoint_path, "a") if checkpoint_path else None
+    semaphore = asyncio.Semaphore(concurrency)
+    prompt_tokens = LLM_TOKENS.value("prompt")
+    completion_tokens = LLM_TOKENS.value("completion")
+
+    async def run(request: MarketRequirementsRequest):
+        cache_key = cache_key_for(request, config)
+        pair = f"{request.product_type} / {request.market}"
+        # Answers past their soft TTL are fetched again, like a background refresh
+        soft_ttl, _ = market_ttls(config, request.market)
+        if not force and (
+            cache_key in done
+            or (cache is not None and await cache.aget_with_age(cache_key, soft_ttl))
+        ):
+            report.skipped += 1
+            return
+        async with semaphore:
+            try:
+                success, result = await fetch_requirements(
+                    client, config, request, cache, cache_key, store
+                )
+            except Exception as e:
+                report.failures[pair] = f"{type(e).__name__}: {e}"
+                logger.error("Warm-up of %s failed: %s", pair, e)
+                return
+        if not success:
+            report.failures[pair] = result["error"]
+            return
+        report.succeeded += 1
+        if checkpoint is not None:
+            checkpoint.write(cache_key + "\n")
+            checkpoint.flush()
+        logger.info("Warmed up %s (%d/%d)", pair, report.succeeded, report.total)
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*[run(request) for request in requests])
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+        report.elapsed_seconds = time.perf_counter() - start
+        report.prompt_tokens = int(LLM_TOKENS.value("prompt") - prompt_tokens)
+        report.completion_tokens = int(LLM_TOKENS.value("completion") - completion_tokens)
+    # Nothing is left to resume; later runs go by the cache's TTLs again
+    if checkpoint_path and not report.failures and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return report
+
+
+async def main_async(args: argparse.Namespace, settings: ConfigSettings) -> WarmupReport:
+    requests = load_matrix(args.matrix, detailed=args.detailed)
+    client = LLMClient(settings, requests_per_minute=args.requests_per_minute)
+    cache = (
+        ResponseCache(settings.cache_path, longest_ttl(settings), settings.cache_memory_entries)
+        if settings.cache_enabled
+        else None
+    )
+    store = RequirementStore(settings.store_path) if settings.store_enabled else None
+    try:
+        return await warm_up(
+            requests,
+            client,
+            cache,
+            store,
+            concurrency=args.concurrency,
+            checkpoint_path=args.checkpoint,
+            force=args.force,
+        )
+    finally:
+        await client.aclose()
+        if cache is not None:
+            cache.close()
+        if store is not None:
+            store.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Precompute requirements for a matrix of product types and markets."
+    )
+    parser.add_argument("matrix", help="CSV or YAML file listing product types and markets")
+    parser.add_argument(
+        "--concurrency", type=int, default=4, help="lookups run at the same time (default 4)"
+    )
+    parser.add_argument(
+        "--requests-per-minute",
+        type=int,
+        help="limit this run's upstream requests; the configured quota still applies",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default="warmup.checkpoint",
+        help="file recording finished pairs so a rerun resumes (default warmup.checkpoint)",
+    )
+    parser.add_argument("--detailed", action="store_true", help="request detailed answers")
+    parser.add_argument(
+        "--force", action="store_true", help="refetch pairs that are cached or checkpointed"
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        settings = load_config()
+    except HTTPException as e:
+        parser.exit(2, f"{parser.prog}: {e.detail}\n")
+    configure_logging(settings)
+
+    report = asyncio.run(main_async(args, settings))
+    print(report.format())
+    return 1 if report.failures else 0
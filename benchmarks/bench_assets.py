@@ -0,0 +1,113 @@
+"""
+Measure the bytes and time needed to load the web interface.
+
+A browser visit is simulated against the application: ``/`` is fetched,
+then every ``/static`` script, stylesheet and image it references. The
+second visit repeats this with the validators and cache lifetimes of the
+first one, so files marked immutable are not requested again and others are
+revalidated. CDN resources are not counted.
+
+Each visit is compared with the original serving of the ``web`` directory
+(``StaticFiles`` and a ``FileResponse`` for ``/``, without compression).
+Load time is modelled from the bytes transferred over a link of the given
+bandwidth plus one round trip for the page and one for its resources, which
+browsers fetch in parallel.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_assets
+"""
+
+import argparse
+import asyncio
+import logging
+import re
+import time
+from typing import Dict, Tuple
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import FileResponse
+from fastapi.staticfiles import StaticFiles
+
+from app.main import WEB_DIR, app
+
+LOCAL_URL = re.compile(r'(?:src|href)="(/static/[^"]+)"')
+
+
+def legacy_app() -> FastAPI:
+    legacy = FastAPI()
+    legacy.mount("/static", StaticFiles(directory=WEB_DIR), name="static")
+
+    @legacy.get("/")
+    async def root():
+        return FileResponse(f"{WEB_DIR}/index.html")
+
+    return legacy
+
+
+def wire_size(response: httpx.Response) -> int:
+    # Body as sent (httpx decompresses ``content``), plus the headers
+    headers = sum(len(name) + len(value) + 4 for name, value in response.headers.raw)
+    return int(response.headers.get("content-length", 0)) + headers
+
+
+def fresh(response: httpx.Response) -> bool:
+    return "immutable" in response.headers.get("cache-control", "")
+
+
+async def visit(client: httpx.AsyncClient, cache: Dict[str, httpx.Response]) -> Tuple[int, int, float]:
+    """Load the page once; return bytes transferred, requests made and server time."""
+    transferred = requests = 0
+    started = time.perf_counter()
+
+    async def get(url):
+        nonlocal transferred, requests
+        cached = cache.get(url)
+        if cached is not None and fresh(cached):
+            return cached
+        headers = {"Accept-Encoding": "br, gzip"}
+        if cached is not None and "etag" in cached.headers:
+            headers["If-None-Match"] = cached.headers["etag"]
+        response = await client.get(url, headers=headers)
+        requests += 1
+        transferred += wire_size(response)
+        if response.status_code == 304:
+            return cached
+        cache[url] = response
+        return response
+
+    page = await get("/")
+    await asyncio.gather(*(get(url) for url in LOCAL_URL.findall(page.text)))
+    return transferred, requests, time.perf_counter() - started
+
+
+async def measure(target: FastAPI) -> list:
+    transport = httpx.ASGITransport(app=target)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        cache: Dict[str, httpx.Response] = {}
+        return [await visit(client, cache) for _ in range(2)]
+
+
+def report(name, visits, bandwidth, rtt):
+    for label, (transferred, requests, server) in zip(["first visit", "repeat visit"], visits):
+        modelled = server + transferred * 8 / (bandwidth * 1e6) + (2 if requests > 1 else 1) * rtt
+        print(
+            f"{name:8} {label:13} {transferred / 1024:8.1f} KiB  {requests:2d} requests  "
+            f"{modelled * 1000:7.1f} ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--bandwidth", type=float, default=1.6, help="link speed in Mbit/s")
+    parser.add_argument("--rtt", type=float, default=0.15, help="round trip time in seconds")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    report("original", asyncio.run(measure(legacy_app())), args.bandwidth, args.rtt)
+    report("current", asyncio.run(measure(app)), args.bandwidth, args.rtt)
+
+
+if __name__ == "__main__":
+    main()
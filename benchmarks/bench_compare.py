@@ -0,0 +1,109 @@
+"""
+Measure the comparison of one product's requirements across many markets.
+
+``compare_answers`` indexes every requirement once by its key; the reference
+implementation looks each requirement up in every other answer, which is how
+the matrix is built without an index. The end-to-end time of
+``/api/requirements/compare`` is measured with every market already in the
+requirement store, so no lookup is needed.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_compare
+"""
+
+import argparse
+import logging
+import os
+import random
+import tempfile
+import time
+
+from fastapi.testclient import TestClient
+
+from app.compare import compare_answers, requirement_key
+from app.main import app
+from app.models import MarketRequirementsResponse
+from app.store import RequirementStore
+from tests.fake_llm import create_fake_llm_app, make_llm_client
+
+BODIES = ["IEC", "EN", "ISO", "UL", "UN"]
+
+
+def make_answers(markets: int, requirements: int, seed: int = 0):
+    """Answers whose requirements are partly drawn from a common pool of standards."""
+    rng = random.Random(seed)
+    pool = [f"{rng.choice(BODIES)} {rng.randint(100, 99999)}" for _ in range(requirements * 2)]
+    answers = []
+    for market in range(markets):
+        names = rng.sample(pool, requirements // 2)
+        names += [f"Local registration scheme {market}-{n}" for n in range(requirements // 2)]
+        answers.append(
+            MarketRequirementsResponse(
+                product_type="fitness band",
+                market=f"Market {market}",
+                requirements=[
+                    {"name": name, "description": "Description.", "category": "Testing"}
+                    for name in names
+                ],
+                summary="Summary.",
+            )
+        )
+    return answers
+
+
+def pairwise(answers):
+    """Reference: find the markets of every requirement by scanning every other answer."""
+    present_in = {}
+    for answer in answers:
+        for requirement in answer.requirements:
+            key = requirement_key(requirement.name)
+            present_in[key] = [
+                position
+                for position, other in enumerate(answers)
+                if any(key == requirement_key(candidate.name) for candidate in other.requirements)
+            ]
+    return present_in
+
+
+def timed(function, *args, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--markets", type=int, default=30)
+    parser.add_argument("--requirements", type=int, default=300)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    answers = make_answers(args.markets, args.requirements)
+    print(f"{args.markets} markets x {args.requirements} requirements")
+    print(f"pairwise comparison:   {timed(pairwise, answers, repeat=1):9.1f} ms")
+    print(f"indexed comparison:    {timed(compare_answers, 'fitness band', answers):9.1f} ms")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = RequirementStore(os.path.join(tmpdir, "store.sqlite3"))
+        for answer in answers:
+            store.save(answer)
+        app.state.llm = make_llm_client(create_fake_llm_app())
+        app.state.store = store
+        client = TestClient(app)
+        body = {
+            "product_type": "fitness band",
+            "markets": [answer.market for answer in answers],
+            "fetch_missing": False,
+        }
+        endpoint = timed(lambda: client.post("/api/requirements/compare", json=body))
+        print(f"endpoint, all stored:  {endpoint:9.1f} ms")
+        app.state.llm = app.state.store = None
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Measure the per-request cost of obtaining settings and the OpenAI client.
+
+Compares the original dependency, which parsed config.yaml and built a new
+OpenAI client on every request, with the lookup of the shared client created
+at startup.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_config
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+from openai import OpenAI
+
+from app.config import load_config
+from app.llm import LLMClient
+from app.main import get_openai_client
+
+
+def legacy_get_openai_client():
+    """Original per-request dependency: parse the config and build a client."""
+    config = load_config()
+    client = OpenAI(api_key=config.openai_api_key)
+    return client, config
+
+
+def per_call_microseconds(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+async def dependency_microseconds(request, iterations: int) -> float:
+    """Enter and leave the shared-client dependency, as FastAPI does per request."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        dependency = get_openai_client(request)
+        await dependency.__anext__()
+        await dependency.aclose()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        config_path = os.path.join(tmpdir, "config.yaml")
+        with open(config_path, "w") as file:
+            file.write('openai_api_key: "sk-bench"\nmodel: "gpt-4o-search-preview"\n')
+        os.environ["CONFIG_PATH"] = config_path
+
+        app = SimpleNamespace(state=SimpleNamespace(llm=LLMClient(load_config())))
+        request = SimpleNamespace(app=app)
+
+        legacy = per_call_microseconds(legacy_get_openai_client, args.iterations)
+        current = asyncio.run(dependency_microseconds(request, args.iterations))
+
+    print(f"legacy (load config + new client): {legacy:10.1f} us/request")
+    print(f"shared client lookup:              {current:10.3f} us/request")
+    print(f"speedup:                           {legacy / current:10.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Benchmark clean_json_content against the original brace-matching implementation.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_json_cleaning
+"""
+
+import argparse
+import json
+import logging
+import random
+import time
+
+from app.utils import clean_json_content
+
+logger = logging.getLogger(__name__)
+
+
+def legacy_clean_json_content(content: str) -> str:
+    """
+    Original implementation of clean_json_content, kept for comparison.
+    """
+    # Handle empty or None content
+    if not content:
+        return ""
+
+    # First try to extract JSON from Markdown code blocks
+    if "```" in content:
+        # Extract content between code blocks
+        # If it starts with ```json or ```JSON
+        if "```json" in content or "```JSON" in content:
+            start_marker = "```json" if "```json" in content else "```JSON"
+            start_idx = content.find(start_marker) + len(start_marker)
+            end_idx = content.find("```", start_idx)
+
+            if end_idx > start_idx:
+                return content[start_idx:end_idx].strip()
+
+        # If it just has ``` but not json specifically
+        start_idx = content.find("```") + 3
+        end_idx = content.rfind("```")
+
+        if end_idx > start_idx:
+            potential_json = content[start_idx:end_idx].strip()
+            # Check if this looks like valid JSON
+            if (potential_json.startswith("{") and potential_json.endswith("}")) or (
+                potential_json.startswith("[") and potential_json.endswith("]")
+            ):
+                return potential_json
+
+    # If no markdown blocks or extraction failed, try to find JSON by looking for curly braces
+    # This handles cases where JSON is embedded in descriptive text
+    try:
+        # Find the first opening brace
+        open_brace_idx = content.find("{")
+        if open_brace_idx >= 0:
+            # Track nested braces to find the matching closing brace
+            brace_count = 0
+            in_string = False
+            escape_next = False
+
+            for i in range(open_brace_idx, len(content)):
+                char = content[i]
+
+                # Handle string boundaries
+                if char == '"' and not escape_next:
+                    in_string = not in_string
+
+                # Handle escape sequences within strings
+                if char == "\\" and in_string and not escape_next:
+                    escape_next = True
+                    continue
+                escape_next = False
+
+                # Count braces only when not in a string
+                if not in_string:
+                    if char == "{":
+                        brace_count += 1
+                    elif char == "}":
+                        brace_count -= 1
+
+                        # If we've found the matching closing brace
+                        if brace_count == 0:
+                            # Extract the JSON object
+                            extracted_json = content[open_brace_idx : i + 1]
+
+                            # Validate that it looks like proper JSON
+                            try:
+                                json.loads(extracted_json)
+                                return extracted_json
+                            except json.JSONDecodeError:
+                                pass  # Not valid JSON, continue searching
+
+    except Exception as e:
+        logger.warning(f"Error while trying to extract JSON: {str(e)}")
+
+    # If all extraction methods failed, return the original content
+    # Let the JSON parser handle the error
+    return content
+
+
+
+
+def make_payload(requirement_count: int) -> str:
+    """Build a regulation JSON document with the given number of requirements."""
+    return json.dumps(
+        {
+            "requirements": [
+                {
+                    "name": f"Requirement {i}",
+                    "description": "Products must comply with {section} " * 5,
+                    "category": "Safety",
+                    "source": f"https://example.org/regulation/{i}",
+                }
+                for i in range(requirement_count)
+            ],
+            "summary": "Summary of the requirements.",
+        },
+        indent=4,
+    )
+
+
+def make_noise(size: int, seed: int = 0) -> str:
+    """Build descriptive text sprinkled with stray braces, brackets and quotes."""
+    rng = random.Random(seed)
+    fragments = [
+        "Regulations may vary by product category. ",
+        "See section {4.2} of the directive [1]. ",
+        'The so-called "essential requirements" apply. ',
+        "Refer to [DOC 3] and {annex II}. ",
+        "Consult a local expert before import. ",
+    ]
+    parts = []
+    length = 0
+    while length < size:
+        fragment = rng.choice(fragments)
+        parts.append(fragment)
+        length += len(fragment)
+    return "".join(parts)
+
+
+def make_cases(size: int):
+    """Return (name, content) pairs of roughly ``size`` characters."""
+    payload = make_payload(max(1, size // 400))
+    noise = make_noise(size)
+    return [
+        ("fenced json", f"```json\n{payload}\n```"),
+        ("noise then json", f"{noise}\n{payload}"),
+        ("noise, fenced json, noise", f"{noise}\n```json\n{payload}\n```\n{noise}"),
+        ("noise only", noise),
+        # Candidates that each fail to decode, and nesting too deep to decode
+        ("unclosed objects", '{"a": 1, ' * (size // 9)),
+        ("deeply nested", '{"a": ' * (size // 6) + f"\n{payload}"),
+    ]
+
+
+def time_call(fn, content: str, repeat: int):
+    """Return the best time of ``repeat`` calls and the last result."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(content)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def is_valid_json(text: str) -> bool:
+    try:
+        json.loads(text)
+        return True
+    except (json.JSONDecodeError, RecursionError):
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=1_000_000, help="characters per case")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement")
+    args = parser.parse_args()
+
+    # The implementations log warnings for malformed input; keep the output readable
+    logging.disable(logging.WARNING)
+
+    print(f"{'case':<28}{'legacy ms':>12}{'current ms':>12}{'speedup':>10}  valid (legacy/current)")
+    for name, content in make_cases(args.size):
+        legacy_time, legacy_result = time_call(legacy_clean_json_content, content, args.repeat)
+        current_time, current_result = time_call(clean_json_content, content, args.repeat)
+        print(
+            f"{name:<28}{legacy_time * 1000:>12.1f}{current_time * 1000:>12.1f}"
+            f"{legacy_time / current_time:>9.1f}x  "
+            f"{is_valid_json(legacy_result)}/{is_valid_json(current_result)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Compare the original inline prompt with the precompiled prompt template.
+
+Reports prompt size (characters and an estimate of tokens at ~4 characters
+per token), the share of the prompt that is identical across lookups, render
+time, and parse time of a bare JSON answer with and without the JSON mode
+fast path.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_prompt
+"""
+
+import argparse
+import json
+import time
+
+from app.prompts import requirements_messages
+from app.utils import parse_regulation_data
+
+
+def legacy_build_prompt(product_type: str, market: str, detailed: bool) -> str:
+    """The f-string prompt used before prompt templates."""
+    detail_level = "detailed and comprehensive" if detailed else "concise"
+
+    return f"""
+    Please provide a {detail_level} list of all regulatory requirements, certifications, and standards that a {product_type}
+    must meet to legally enter and be sold in the {market} market.
+
+    Include:
+    1. Required certifications and their descriptions
+    2. Safety standards that must be met
+    3. Labeling requirements
+    4. Testing requirements
+    5. Import regulations
+    6. Any other relevant compliance requirements
+
+    Format the response as a JSON object with the following structure:
+    {{
+        "requirements": [
+            {{
+                "name": "Requirement/certification name",
+                "description": "Detailed description",
+                "category": "Category (e.g., Safety, Labeling, Testing)",
+                "source": "Source of information (if available)"
+            }}
+        ],
+        "summary": "Brief summary of key requirements"
+    }}
+    """
+
+
+def per_call_microseconds(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--requirements", type=int, default=20)
+    args = parser.parse_args()
+
+    args_ = ("fitness band with lithium battery", "EU", False)
+    legacy = legacy_build_prompt(*args_)
+    messages = requirements_messages(*args_)
+    system, user = (message["content"] for message in messages)
+    templated = len(system) + len(user)
+
+    print(f"{'':24} {'chars':>6} {'~tokens':>8} {'render us':>10}")
+    print(
+        f"{'legacy f-string':24} {len(legacy):6d} {len(legacy) // 4:8d} "
+        f"{per_call_microseconds(lambda: legacy_build_prompt(*args_), args.iterations):10.2f}"
+    )
+    print(
+        f"{'template':24} {templated:6d} {templated // 4:8d} "
+        f"{per_call_microseconds(lambda: requirements_messages(*args_), args.iterations):10.2f}"
+    )
+    print(f"shared system prefix: {len(system)} chars ({len(system) / templated:.0%} of prompt)")
+
+    answer = json.dumps(
+        {
+            "requirements": [
+                {
+                    "name": f"Requirement {i}",
+                    "description": "Conformity assessment and documentation " * 3,
+                    "category": "Certification",
+                    "source": "https://example.org/regulation",
+                }
+                for i in range(args.requirements)
+            ],
+            "summary": "Summary of the key requirements.",
+        }
+    )
+    iterations = max(args.iterations // 20, 1)
+    cleaned = per_call_microseconds(
+        lambda: parse_regulation_data(answer, "toys", "EU"), iterations
+    )
+    fast = per_call_microseconds(
+        lambda: parse_regulation_data(answer, "toys", "EU", json_mode=True), iterations
+    )
+    print()
+    print(f"parse {args.requirements} requirements, cleaned:   {cleaned:8.1f} us")
+    print(f"parse {args.requirements} requirements, JSON mode: {fast:8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Compare the original answer parsing and response serialization with the
+one-step validation path.
+
+The legacy path cleans the answer, decodes it with ``json``, builds the
+response model (validating every requirement), then lets FastAPI validate it
+again against ``response_model`` and encode it through ``jsonable_encoder``.
+The current path validates the JSON text with pydantic-core in one step,
+assembles the response without revalidating and serializes it with
+``model_dump_json``.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_response
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.models import MarketRequirementsResponse
+from app.utils import clean_json_content, parse_regulation_data
+
+RESPONSE_FIELD = create_response_field(name="response", type_=MarketRequirementsResponse)
+LOOP = asyncio.new_event_loop()
+
+
+def make_answer(count: int) -> str:
+    return json.dumps(
+        {
+            "requirements": [
+                {
+                    "name": f"Requirement {i}",
+                    "description": "Conformity assessment and technical documentation " * 3,
+                    "category": "Certification",
+                    "source": "https://example.org/regulation",
+                }
+                for i in range(count)
+            ],
+            "summary": "Summary of the key requirements.",
+        }
+    )
+
+
+def legacy(answer: str) -> bytes:
+    data = json.loads(clean_json_content(answer))
+    response = MarketRequirementsResponse(
+        product_type="toys",
+        market="EU",
+        requirements=data["requirements"],
+        summary=data["summary"],
+    )
+    content = LOOP.run_until_complete(
+        serialize_response(field=RESPONSE_FIELD, response_content=response, is_coroutine=True)
+    )
+    return json.dumps(jsonable_encoder(content)).encode()
+
+
+def current(answer: str) -> bytes:
+    _, response = parse_regulation_data(answer, "toys", "EU", json_mode=True)
+    return response.model_dump_json().encode()
+
+
+def per_call_microseconds(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--requirements", type=int, default=300)
+    args = parser.parse_args()
+
+    answer = make_answer(args.requirements)
+    assert json.loads(legacy(answer)) == json.loads(current(answer))
+
+    old = per_call_microseconds(lambda: legacy(answer), args.iterations)
+    new = per_call_microseconds(lambda: current(answer), args.iterations)
+    print(f"{args.requirements} requirements, {len(answer)} bytes")
+    print(f"legacy parse + serialize:  {old:10.1f} us")
+    print(f"one-step validate + dump:  {new:10.1f} us ({old / new:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
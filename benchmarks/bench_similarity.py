@@ -0,0 +1,149 @@
+"""
+Measure the accuracy and latency of near-duplicate product matching.
+
+Accuracy is measured on a small labelled set of rephrased product
+descriptions (which should reuse the stored answer) and descriptions of
+different products (which must not), at several similarity thresholds.
+Latency is measured for indexes of increasing size filled with generated
+product descriptions.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_similarity
+"""
+
+import argparse
+import itertools
+import random
+import time
+
+from app.similarity import NgramIndex
+
+STORED = [
+    "fitness band with lithium battery",
+    "smartphone",
+    "laptop computer",
+    "electric bicycle",
+    "electric scooter",
+    "wireless earbuds",
+    "bluetooth speaker",
+    "baby stroller",
+    "led light bulb",
+    "power bank",
+    "smart watch",
+    "hair dryer",
+    "coffee maker",
+    "children's toys",
+    "kitchen knife",
+    "cosmetics",
+]
+
+# (query, stored description it should reuse, or None when it must not match)
+LABELLED = [
+    ("fitness bands with lithium batteries", "fitness band with lithium battery"),
+    ("lithium battery fitness band", "fitness band with lithium battery"),
+    ("smartphones", "smartphone"),
+    ("smart phone", "smartphone"),
+    ("laptop computers", "laptop computer"),
+    ("electric bicycles", "electric bicycle"),
+    ("electric scooters", "electric scooter"),
+    ("wireless ear buds", "wireless earbuds"),
+    ("bluetooth speakers", "bluetooth speaker"),
+    ("baby strollers", "baby stroller"),
+    ("LED light bulbs", "led light bulb"),
+    ("power banks", "power bank"),
+    ("smart watches", "smart watch"),
+    ("smartwatch", "smart watch"),
+    ("hair dryers", "hair dryer"),
+    ("coffee makers", "coffee maker"),
+    ("toys for children", "children's toys"),
+    ("kitchen knives", "kitchen knife"),
+    ("cosmetic", "cosmetics"),
+    ("electric bike", None),
+    ("bluetooth earbuds", None),
+    ("smart speaker", None),
+    ("baby bottle", None),
+    ("led strip", None),
+    ("power tool", None),
+    ("coffee grinder", None),
+    ("hair straightener", None),
+    ("kitchen scale", None),
+    ("electric toothbrush", None),
+    ("wireless charger", None),
+    ("laptop bag", None),
+    ("drone", None),
+]
+
+ADJECTIVES = [
+    "wireless", "electric", "portable", "smart", "rechargeable", "industrial",
+    "children's", "outdoor", "digital", "solar", "waterproof", "ceramic",
+    "stainless steel", "plastic", "wooden", "medical", "automotive", "gas",
+    "battery powered", "handheld",
+]
+NOUNS = [
+    "speaker", "heater", "lamp", "charger", "camera", "scale", "kettle", "fan",
+    "drill", "toy", "watch", "tracker", "thermometer", "blender", "grill",
+    "helmet", "monitor", "router", "lock", "doorbell", "vacuum cleaner",
+    "toothbrush", "headphones", "keyboard", "mouse",
+]
+
+
+def evaluate(thresholds):
+    index = NgramIndex()
+    for product in STORED:
+        index.add(product, product)
+
+    print(f"{'threshold':>9} {'precision':>9} {'recall':>6} {'false matches':>13}")
+    for threshold in thresholds:
+        true_positive = false_positive = positives = 0
+        for query, expected in LABELLED:
+            matches = index.search(query)
+            matched = matches[0][0] if matches and matches[0][1] >= threshold else None
+            positives += expected is not None
+            if matched is not None:
+                if matched == expected:
+                    true_positive += 1
+                else:
+                    false_positive += 1
+        precision = true_positive / (true_positive + false_positive or 1)
+        recall = true_positive / positives
+        print(f"{threshold:9.2f} {precision:9.2f} {recall:6.2f} {false_positive:13d}")
+
+
+def measure_latency(sizes, queries: int):
+    products = [f"{a} {n}" for a, n in itertools.product(ADJECTIVES, NOUNS)]
+    rng = random.Random(0)
+    print()
+    print(f"{'indexed':>8} {'build ms':>9} {'first query ms':>14} {'query us':>9}")
+    for size in sizes:
+        index = NgramIndex()
+        start = time.perf_counter()
+        for i in range(size):
+            text = f"{products[i % len(products)]} model {i // len(products)}"
+            index.add(str(i), text)
+        build = time.perf_counter() - start
+
+        # The first search after changes recomputes IDF weights and norms
+        start = time.perf_counter()
+        index.search("wireless speaker")
+        first = time.perf_counter() - start
+
+        sample = [rng.choice(products) + "s" for _ in range(queries)]
+        start = time.perf_counter()
+        for query in sample:
+            index.search(query)
+        per_query = (time.perf_counter() - start) / queries
+        print(f"{size:8d} {build * 1e3:9.1f} {first * 1e3:14.1f} {per_query * 1e6:9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    evaluate([0.6, 0.7, 0.75, 0.8, 0.85, 0.9])
+    measure_latency([100, 1000, 10000], args.queries)
+
+
+if __name__ == "__main__":
+    main()
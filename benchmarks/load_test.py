@@ -0,0 +1,365 @@
+"""
+Load-test /api/requirements against a local fake completion server.
+
+The fake OpenAI API from ``tests.fake_llm`` is served on a local socket with
+a configurable latency, and the application is started with uvicorn in a
+separate process, configured to call it. Each scenario sets the answer the
+fake server returns (bare JSON, a markdown-wrapped answer with prose around
+it, or an answer without JSON) and drives the endpoint at each concurrency
+level, reporting requests per second, latency percentiles and the resident
+memory of every server process. Micro-benchmarks of ``clean_json_content``
+and ``parse_regulation_data`` on the same answers are included.
+
+Results are written to ``benchmarks/results/`` as JSON, named after the
+commit, and ``--compare`` prints the change against an earlier file.
+
+Run from the repository root:
+
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --compare benchmarks/results/<earlier>.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+import uvicorn
+import yaml
+
+from app.utils import clean_json_content, parse_regulation_data
+from benchmarks.bench_json_cleaning import make_payload
+from tests.fake_llm import create_fake_llm_app
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+
+def scenario_contents(requirements: int) -> Dict[str, str]:
+    """Answers returned by the fake server, keyed by scenario name."""
+    payload = make_payload(requirements)
+    return {
+        "bare json": payload,
+        "markdown wrapped": (
+            "Here are the regulatory requirements for toys in Brazil:\n\n"
+            f"```json\n{payload}\n```\n\n"
+            "Note that requirements may change; see {INMETRO Ordinance 217} for details."
+        ),
+        "no json": "I could not find specific requirements for this product [1].",
+    }
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def process_tree(pid: int) -> List[int]:
+    """Return ``pid`` and its descendants (Linux only; just ``pid`` elsewhere)."""
+    parents = {}
+    for entry in os.listdir("/proc") if os.path.isdir("/proc") else []:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as file:
+                # The command name may contain spaces; the ppid follows its ")"
+                parents[int(entry)] = int(file.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+    tree = [pid]
+    for current in tree:
+        tree.extend(child for child, parent in parents.items() if parent == current)
+    return tree
+
+
+def memory_mb(pid: int) -> Dict[str, Optional[float]]:
+    """Current and peak resident memory of a process, in MiB."""
+    usage = {"rss_mb": None, "peak_rss_mb": None}
+    try:
+        with open(f"/proc/{pid}/status") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    usage["rss_mb"] = int(line.split()[1]) / 1024
+                elif line.startswith("VmHWM:"):
+                    usage["peak_rss_mb"] = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return usage
+
+
+def write_config(directory: str, llm_url: str, args: argparse.Namespace) -> str:
+    """Write the configuration used by the server under test."""
+    config = {
+        "openai_api_key": "load-test",
+        "openai_base_url": llm_url,
+        "model": args.model,
+        "llm_max_retries": 0,
+        "max_concurrent_requests": args.upstream_concurrency,
+        "cache_enabled": args.cache,
+        "cache_path": os.path.join(directory, "cache.sqlite3"),
+        "store_enabled": False,
+        "similar_match_enabled": False,
+        "job_store_path": os.path.join(directory, "jobs.sqlite3"),
+        "log_level": "WARNING",
+        "log_file": os.path.join(directory, "app.log"),
+    }
+    path = os.path.join(directory, "config.yaml")
+    with open(path, "w") as file:
+        yaml.safe_dump(config, file)
+    return path
+
+
+async def start_fake_llm(latency: float, port: int):
+    """Serve the fake completion API on ``port`` in the running event loop."""
+    fake_llm = create_fake_llm_app(latency=latency)
+    server = uvicorn.Server(
+        uvicorn.Config(fake_llm, host="127.0.0.1", port=port, log_level="warning")
+    )
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    return fake_llm, server, task
+
+
+async def wait_until_up(url: str, process: subprocess.Popen, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited with status {process.returncode}")
+            try:
+                await client.get(url + "/metrics")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError(f"Server did not start within {timeout}s")
+
+
+async def drive(url: str, requests: int, concurrency: int, label: str) -> dict:
+    """
+    Send ``requests`` lookups with at most ``concurrency`` in flight.
+
+    Every lookup names a different product so that neither the cache nor
+    request coalescing hides the cost of the pipeline.
+
+    Returns:
+        dict: Throughput, latency percentiles in milliseconds and status counts
+    """
+    latencies = []
+    statuses: Dict[str, int] = {}
+    queue = iter(range(requests))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async def worker(client: httpx.AsyncClient):
+        for i in queue:
+            body = {"product_type": f"{label} product {i}", "market": "Brazil"}
+            start = time.perf_counter()
+            try:
+                response = await client.post("/api/requirements", json=body)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=120) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*[worker(client) for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "seconds": elapsed,
+        "rps": requests / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+        "statuses": statuses,
+    }
+
+
+def micro_benchmarks(contents: Dict[str, str], repeat: int) -> Dict[str, dict]:
+    """Best-of-``repeat`` time, in microseconds, of the parsing steps per answer."""
+
+    def best(fn) -> float:
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        return min(times) * 1e6
+
+    logging.disable(logging.CRITICAL)
+    try:
+        return {
+            name: {
+                "clean_json_content_us": best(lambda: clean_json_content(content)),
+                "parse_regulation_data_us": best(
+                    lambda: parse_regulation_data(content, "toys", "Brazil")
+                ),
+            }
+            for name, content in contents.items()
+        }
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+async def run_load(args: argparse.Namespace, contents: Dict[str, str]) -> dict:
+    llm_port, app_port = free_port(), free_port()
+    fake_llm, fake_server, fake_task = await start_fake_llm(args.latency, llm_port)
+    url = f"http://127.0.0.1:{app_port}"
+    results = {"scenarios": {}, "memory": {}}
+
+    with tempfile.TemporaryDirectory() as directory:
+        config_path = write_config(directory, f"http://127.0.0.1:{llm_port}/v1", args)
+        command = [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--host", "127.0.0.1", "--port", str(app_port),
+            "--workers", str(args.workers), "--log-level", "warning", "--app-dir", ROOT,
+        ]
+        # The server runs in the scratch directory and its console output
+        # (parse errors in the "no json" scenario) goes to a file there
+        server_log = open(os.path.join(directory, "server.log"), "w")
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            command,
+            cwd=directory,
+            env={**os.environ, "CONFIG_PATH": config_path},
+            stdout=server_log,
+            stderr=subprocess.STDOUT,
+        )
+        try:
+            await wait_until_up(url, process)
+            results["startup_seconds"] = time.perf_counter() - started
+            for name, content in contents.items():
+                fake_llm.state.content = content
+                runs = []
+                for concurrency in args.concurrency:
+                    run = await drive(url, args.requests, concurrency, f"{name} c{concurrency}")
+                    runs.append(run)
+                    print(
+                        f"{name:<18}{concurrency:>6}{run['rps']:>9.1f}"
+                        f"{run['p50_ms']:>10.1f}{run['p95_ms']:>10.1f}{run['p99_ms']:>10.1f}"
+                        f"  {run['statuses']}"
+                    )
+                results["scenarios"][name] = runs
+            results["upstream_calls"] = fake_llm.state.calls
+            results["memory"] = {
+                str(pid): memory_mb(pid) for pid in process_tree(process.pid)
+            }
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+            server_log.close()
+            fake_server.should_exit = True
+            await fake_task
+    return results
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: dict, baseline: dict):
+    """Print the change of each measurement against ``baseline``."""
+    print(f"\nCompared with {baseline['commit']} ({baseline['timestamp']}):")
+    for name, runs in results["load"]["scenarios"].items():
+        before = {run["concurrency"]: run for run in baseline["load"]["scenarios"].get(name, [])}
+        for run in runs:
+            old = before.get(run["concurrency"])
+            if old is None:
+                continue
+            print(
+                f"  {name:<18} c{run['concurrency']:<4} rps {old['rps']:.1f} -> {run['rps']:.1f}"
+                f" ({run['rps'] / old['rps'] - 1:+.0%}), p95 {old['p95_ms']:.1f} -> "
+                f"{run['p95_ms']:.1f} ms ({run['p95_ms'] / old['p95_ms'] - 1:+.0%})"
+            )
+    for name, timings in results["micro"].items():
+        for key, value in timings.items():
+            old = baseline["micro"].get(name, {}).get(key)
+            if old:
+                print(f"  {name:<18} {key:<26} {old:.1f} -> {value:.1f} us ({value / old - 1:+.0%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200, help="lookups per run")
+    parser.add_argument(
+        "--concurrency", type=lambda value: [int(n) for n in value.split(",")],
+        default=[1, 8, 32], help="comma-separated concurrency levels (default 1,8,32)",
+    )
+    parser.add_argument("--latency", type=float, default=0.05, help="fake upstream latency (s)")
+    parser.add_argument("--requirements", type=int, default=20, help="requirements per answer")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--upstream-concurrency", type=int, default=32)
+    parser.add_argument("--model", default="gpt-4o-search-preview")
+    parser.add_argument("--cache", action="store_true", help="enable the response cache")
+    parser.add_argument("--repeat", type=int, default=50, help="runs per micro-benchmark")
+    parser.add_argument("--output", help="results file (default benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    contents = scenario_contents(args.requirements)
+    print(f"{'scenario':<18}{'conc':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    load = asyncio.run(run_load(args, contents))
+    micro = micro_benchmarks(contents, args.repeat)
+
+    print(f"\nstartup: {load['startup_seconds']:.2f}s, upstream calls: {load['upstream_calls']}")
+    for pid, usage in load["memory"].items():
+        if usage["rss_mb"] is not None:
+            print(f"process {pid}: rss {usage['rss_mb']:.1f} MiB, peak {usage['peak_rss_mb']:.1f} MiB")
+    for name, timings in micro.items():
+        print(
+            f"{name:<18} clean_json_content {timings['clean_json_content_us']:8.1f} us, "
+            f"parse_regulation_data {timings['parse_regulation_data_us']:8.1f} us"
+        )
+
+    commit = current_commit()
+    results = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "args": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "load": load,
+        "micro": micro,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(results, file, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,78 @@
 """
 Runner script for the regulation extraction API.
+
+Without options the server runs as a single process that reloads on code
+changes, for development. ``--production`` runs several worker processes
+without reloading; they share the SQLite response cache, requirement store,
+job queue and rate-limit buckets configured in ``config.yaml``. In both modes
+a supervising process passes ``SIGHUP`` on to the server processes, which
+reload their configuration.
 """
 
+import argparse
+import multiprocessing
+import os
+import signal
+
 import uvicorn
+from fastapi import HTTPException
+
+from app.config import load_config
+from app.logging_config import WORKERS_ENV
+from app.models import ConfigSettings
+
+
+def forward_sighup(signum, frame):
+    """Pass SIGHUP on to the server processes, which reload the configuration."""
+    for process in multiprocessing.active_children():
+        try:
+            os.kill(process.pid, signal.SIGHUP)
+        except ProcessLookupError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the regulation extraction API.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--production", action="store_true", help="run worker processes without reloading"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="worker processes in production mode "
+        "(default: workers from the config, or the number of CPUs)",
+    )
+    args = parser.parse_args()
+
+    # The supervisor only handles SIGINT and SIGTERM, and SIGHUP would end it
+    # and orphan the server processes. A server running in this process
+    # replaces the handler with its own.
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, forward_sighup)
+
+    if not args.production:
+        uvicorn.run("app.main:app", host=args.host, port=args.port, reload=True)
+        return
+
+    try:
+        settings = load_config()
+    except HTTPException:
+        # The server reports the problem itself and serves the web interface
+        settings = ConfigSettings()
+    workers = args.workers or settings.workers or os.cpu_count() or 1
+    # Read by the workers, which then log to a file of their own
+    os.environ[WORKERS_ENV] = str(workers)
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        # Requests in flight get this long to finish after a shutdown signal
+        timeout_graceful_shutdown=settings.shutdown_timeout,
+    )
+
 
 if __name__ == "__main__":
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
+    main()
@@ -0,0 +1,161 @@
+"""
+Local stand-in for the OpenAI chat completions API used by the tests.
+
+The fake server answers ``POST /v1/chat/completions`` with a canned completion
+after a configurable delay and records how many calls were in flight at once,
+so tests can check concurrency without touching the network.
+"""
+
+import asyncio
+import json
+import time
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.llm import LLMClient
+from app.models import ConfigSettings
+
+DEFAULT_CONTENT = json.dumps(
+    {
+        "requirements": [
+            {
+                "name": "CE Marking",
+                "description": "Conformity marking for products sold in the EEA.",
+                "category": "Certification",
+                "source": "https://ec.europa.eu/growth/single-market/ce-marking_en",
+            }
+        ],
+        "summary": "Toys sold in the EU must carry the CE marking.",
+    }
+)
+
+
+def completion_payload(content: str, model: str = "fake-model") -> dict:
+    """Build a chat completion body in the shape returned by the OpenAI API."""
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150},
+    }
+
+
+def chunk_payload(content: str, model: str = "fake-model", finish_reason=None) -> dict:
+    """Build a streamed chat completion chunk carrying a content delta."""
+    delta = {"content": content} if content else {}
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+def create_fake_llm_app(
+    latency: float = 0.0,
+    content: str = DEFAULT_CONTENT,
+    chunk_size: int = 20,
+    chunk_delay: float = 0.0,
+) -> FastAPI:
+    """
+    Create the fake completion server.
+
+    Failures can be injected by appending ``(status, headers)`` tuples to
+    ``app.state.failures``; each call consumes one before answering normally.
+
+    Args:
+        latency (float): Seconds to wait before answering each completion
+        content (str): Message content returned by every completion
+        chunk_size (int): Characters per chunk when ``stream`` is requested
+        chunk_delay (float): Seconds to wait between streamed chunks
+
+    Returns:
+        FastAPI: App whose ``state`` exposes ``calls``, ``in_flight`` and
+        ``peak_in_flight`` counters and the ``last_body`` received
+    """
+    app = FastAPI()
+    app.state.latency = latency
+    app.state.content = content
+    app.state.chunk_size = chunk_size
+    app.state.chunk_delay = chunk_delay
+    # Queue of (status, headers) answers returned before any successful completion
+    app.state.failures = []
+    app.state.calls = 0
+    app.state.last_body = None
+    app.state.in_flight = 0
+    app.state.peak_in_flight = 0
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        state = request.app.state
+        state.calls += 1
+        state.last_body = body
+        state.in_flight += 1
+        state.peak_in_flight = max(state.peak_in_flight, state.in_flight)
+        model = body.get("model", "fake-model")
+        if state.failures:
+            status, headers = state.failures.pop(0)
+            try:
+                await asyncio.sleep(state.latency)
+            finally:
+                state.in_flight -= 1
+            return JSONResponse(
+                {"error": {"message": f"Injected {status}", "type": "fake_error"}},
+                status_code=status,
+                headers=headers,
+            )
+        if body.get("stream"):
+            return StreamingResponse(
+                stream_chunks(state, model), media_type="text/event-stream"
+            )
+        try:
+            await asyncio.sleep(state.latency)
+        finally:
+            state.in_flight -= 1
+        return completion_payload(state.content, model)
+
+    async def stream_chunks(state, model):
+        try:
+            await asyncio.sleep(state.latency)
+            content = state.content
+            for i in range(0, len(content), state.chunk_size):
+                payload = chunk_payload(content[i : i + state.chunk_size], model)
+                yield f"data: {json.dumps(payload)}\n\n"
+                await asyncio.sleep(state.chunk_delay)
+            yield f"data: {json.dumps(chunk_payload('', model, 'stop'))}\n\n"
+            yield "data: [DONE]\n\n"
+        finally:
+            state.in_flight -= 1
+
+    return app
+
+
+def make_settings(**overrides) -> ConfigSettings:
+    """Build test settings pointing at the fake server."""
+    values = {
+        "openai_api_key": "test-key",
+        "openai_base_url": "http://fake-llm/v1",
+        "model": "fake-model",
+        # Keep quota buckets in memory so tests do not share state via a file
+        "rate_limit_path": "",
+    }
+    values.update(overrides)
+    return ConfigSettings(**values)
+
+
+def make_llm_client(fake_app: FastAPI, **overrides) -> LLMClient:
+    """Create an ``LLMClient`` whose HTTP traffic is served by ``fake_app``."""
+    http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake_app))
+    return LLMClient(make_settings(**overrides), http_client=http_client)
@@ -0,0 +1,262 @@
+# Test per-client quotas and the upstream admission gate
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+
+import httpx
+from starlette.requests import Request
+
+from app.admission import AdmissionController, AdmissionGate, Overloaded
+from app.cache import ResponseCache
+from app.main import app, refreshes
+from app.metrics import ADMISSION_REJECTED, CACHE_REFRESHES
+from app.ratelimit import KeyedTokenBuckets
+from tests.fake_llm import create_fake_llm_app, make_llm_client, make_settings
+
+
+class TestKeyedTokenBuckets(unittest.TestCase):
+    """Test cases for KeyedTokenBuckets."""
+
+    def test_rejects_without_taking(self):
+        buckets = KeyedTokenBuckets()
+        self.assertEqual(buckets.take("a", 1.0, 2), 0)
+        self.assertEqual(buckets.take("a", 1.0, 2), 0)
+        wait = buckets.take("a", 1.0, 2)
+        self.assertAlmostEqual(wait, 1.0, delta=0.05)
+        # Other keys have buckets of their own
+        self.assertEqual(buckets.take("b", 1.0, 2), 0)
+
+    def test_large_amounts_are_charged_in_full(self):
+        buckets = KeyedTokenBuckets()
+        self.assertEqual(buckets.take("a", 10 / 60, 10, 50), 0)
+        # A full bucket admits the request, then has to repay 40 tokens of debt
+        self.assertAlmostEqual(buckets.take("a", 10 / 60, 10), 41 * 6, delta=0.1)
+        self.assertEqual(buckets.take("b", 10 / 60, 10, 5), 0)
+        self.assertGreater(buckets.take("b", 10 / 60, 10, 50), 0)
+
+    def test_least_recently_used_keys_are_forgotten(self):
+        buckets = KeyedTokenBuckets(max_keys=2)
+        buckets.take("a", 0.001, 1)
+        buckets.take("b", 0.001, 1)
+        buckets.take("a", 0.001, 1)
+        buckets.take("c", 0.001, 1)
+        # "b" was evicted and starts full again; "a" is still empty
+        self.assertGreater(buckets.take("a", 0.001, 1), 0)
+        self.assertEqual(buckets.take("b", 0.001, 1), 0)
+
+
+class TestAdmissionGate(unittest.IsolatedAsyncioTestCase):
+    """Test cases for AdmissionGate."""
+
+    async def test_slots_are_handed_over_in_order(self):
+        gate = AdmissionGate(max_in_flight=1, queue_size=10, queue_timeout=5)
+        order = []
+
+        async def lookup(name):
+            async with gate.slot():
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(lookup(n) for n in range(5)))
+        self.assertEqual(order, list(range(5)))
+        self.assertEqual((gate.in_flight, gate.queued), (0, 0))
+
+    async def test_full_queue_is_rejected(self):
+        gate = AdmissionGate(max_in_flight=1, queue_size=1, queue_timeout=5)
+        held = await gate.acquire()
+        waiter = asyncio.create_task(gate.acquire())
+        await asyncio.sleep(0)
+        with self.assertRaises(Overloaded) as raised:
+            await gate.acquire()
+        self.assertGreaterEqual(raised.exception.retry_after, 1)
+
+        held.release()
+        (await waiter).release()
+        self.assertEqual((gate.in_flight, gate.queued), (0, 0))
+
+    async def test_waiters_that_give_up_are_skipped(self):
+        gate = AdmissionGate(max_in_flight=1, queue_size=10, queue_timeout=0.2)
+        held = await gate.acquire()
+        with self.assertRaises(Overloaded):
+            await gate.acquire()
+        cancelled = asyncio.create_task(gate.acquire())
+        waiting = asyncio.create_task(gate.acquire())
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await cancelled
+        self.assertEqual(gate.queued, 1)
+
+        held.release()
+        slot = await waiting
+        self.assertEqual((gate.in_flight, gate.queued), (1, 0))
+        slot.release()
+        slot.release()
+        self.assertEqual(gate.in_flight, 0)
+
+    async def test_raising_the_cap_admits_waiters(self):
+        gate = AdmissionGate(max_in_flight=1, queue_size=10, queue_timeout=5)
+        await gate.acquire()
+        waiter = asyncio.create_task(gate.acquire())
+        await asyncio.sleep(0)
+        gate.configure(2, 10, 5)
+        await asyncio.wait_for(waiter, 1)
+        self.assertEqual(gate.in_flight, 2)
+
+
+def make_request(host="203.0.113.7", forwarded_for=None):
+    headers = [(b"x-forwarded-for", forwarded_for.encode())] if forwarded_for else []
+    return Request({"type": "http", "headers": headers, "client": (host, 50000)})
+
+
+class TestAdmissionController(unittest.IsolatedAsyncioTestCase):
+    """Test cases for AdmissionController."""
+
+    def test_client_address_behind_trusted_proxies(self):
+        admission = AdmissionController(
+            make_settings(trusted_proxies=["10.0.0.0/8", "192.0.2.1"])
+        )
+        # The header is ignored unless the connection comes from a trusted proxy
+        request = make_request(forwarded_for="198.51.100.1")
+        self.assertEqual(admission.client_address(request), "203.0.113.7")
+        # Entries added by trusted proxies are skipped; earlier ones may be forged
+        request = make_request(
+            "10.1.2.3", forwarded_for="1.2.3.4, 198.51.100.1, 192.0.2.1"
+        )
+        self.assertEqual(admission.client_address(request), "198.51.100.1")
+        request = make_request("10.1.2.3", forwarded_for="10.0.0.9")
+        self.assertEqual(admission.client_address(request), "10.0.0.9")
+        self.assertEqual(admission.client_address(make_request("10.1.2.3")), "10.1.2.3")
+
+    async def test_workers_share_client_quotas(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            settings = make_settings(
+                client_requests_per_minute=6,
+                client_burst=2,
+                rate_limit_path=os.path.join(tmpdir, "ratelimit.sqlite3"),
+            )
+            workers = [AdmissionController(settings), AdmissionController(settings)]
+            try:
+                await workers[0].admit(make_request())
+                await workers[1].admit(make_request())
+                with self.assertRaises(Overloaded):
+                    await workers[0].admit(make_request())
+                # Other clients have buckets of their own
+                await workers[1].admit(make_request("198.51.100.1"))
+            finally:
+                for admission in workers:
+                    admission.close()
+
+
+class TestAdmissionControl(unittest.IsolatedAsyncioTestCase):
+    """Admission control in front of the lookup endpoints."""
+
+    async def asyncSetUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.fake_llm = create_fake_llm_app(latency=0.3)
+        self.cache = ResponseCache(os.path.join(self.tmpdir.name, "cache.sqlite3"), 60)
+        app.state.llm = make_llm_client(self.fake_llm)
+        app.state.cache = self.cache
+        transport = httpx.ASGITransport(app=app)
+        self.client = httpx.AsyncClient(transport=transport, base_url="http://test")
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        await app.state.llm.aclose()
+        app.state.llm = app.state.cache = app.state.admission = None
+        self.cache.close()
+
+    def use_admission(self, **overrides):
+        app.state.admission = AdmissionController(make_settings(**overrides))
+
+    async def lookup(self, market="EU", **headers):
+        return await self.client.post(
+            "/api/requirements",
+            json={"product_type": "toys", "market": market},
+            headers=headers,
+        )
+
+    async def test_client_quota(self):
+        self.use_admission(
+            client_requests_per_minute=6, client_burst=2, api_keys={"partner": 600}
+        )
+        rejected = ADMISSION_REJECTED.value("quota")
+        self.assertEqual((await self.lookup()).status_code, 200)
+        self.assertEqual((await self.lookup()).status_code, 200)
+
+        response = await self.lookup()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["retry-after"], "10")
+        self.assertEqual(ADMISSION_REJECTED.value("quota"), rejected + 1)
+
+        # Listed API keys have a quota of their own; unknown keys are ignored
+        self.assertEqual((await self.lookup(**{"X-API-Key": "partner"})).status_code, 200)
+        self.assertEqual((await self.lookup(**{"X-API-Key": "made-up"})).status_code, 429)
+
+    async def test_batch_is_charged_per_item(self):
+        self.use_admission(client_requests_per_minute=6, client_burst=2)
+        response = await self.client.post(
+            "/api/requirements/batch",
+            json={"product_type": "toys", "markets": ["EU", "US", "UK", "Japan"]},
+        )
+        self.assertEqual(response.status_code, 200)
+        response = await self.lookup()
+        self.assertEqual(response.status_code, 429)
+        # Two tokens of debt and one for the lookup, at one token per 10s
+        self.assertEqual(response.headers["retry-after"], "30")
+
+    async def test_refreshes_pass_the_gate(self):
+        app.state.llm = make_llm_client(self.fake_llm, cache_soft_ttl_seconds=0)
+        self.use_admission(max_in_flight_lookups=1, admission_queue_size=0)
+        await self.lookup("EU")
+        failed = CACHE_REFRESHES.value("failed")
+
+        held = await app.state.admission.gate.acquire()
+        response = await self.lookup("EU")
+        await asyncio.gather(*refreshes.values())
+        held.release()
+
+        # The stale answer is served, but its refresh found no free slot
+        self.assertEqual(response.headers["x-revalidating"], "true")
+        self.assertEqual(self.fake_llm.state.calls, 1)
+        self.assertEqual(CACHE_REFRESHES.value("failed"), failed + 1)
+
+    async def test_cache_hits_skip_the_upstream_queue(self):
+        self.use_admission(max_in_flight_lookups=1, admission_queue_size=0)
+        await self.lookup("EU")
+
+        slow = asyncio.create_task(self.lookup("US"))
+        await asyncio.sleep(0.1)
+        rejected = await self.lookup("Japan")
+        start = time.perf_counter()
+        cached = await self.lookup("EU")
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(rejected.status_code, 429)
+        self.assertIn("retry-after", rejected.headers)
+        self.assertEqual(cached.status_code, 200)
+        self.assertLess(elapsed, 0.2)
+        self.assertEqual((await slow).status_code, 200)
+
+    async def test_queued_lookups_wait_for_a_slot(self):
+        self.use_admission(max_in_flight_lookups=1, admission_queue_size=5)
+        responses = await asyncio.gather(*(self.lookup(market) for market in ["EU", "US", "UK"]))
+        self.assertEqual([response.status_code for response in responses], [200] * 3)
+        self.assertEqual(self.fake_llm.state.peak_in_flight, 1)
+        self.assertEqual(app.state.admission.gate.in_flight, 0)
+
+    async def test_stream_holds_a_slot(self):
+        self.use_admission(max_in_flight_lookups=1, admission_queue_size=0)
+        body = {"product_type": "toys", "market": "EU"}
+        stream = asyncio.create_task(self.client.post("/api/requirements/stream", json=body))
+        await asyncio.sleep(0.1)
+        self.assertEqual((await self.lookup("US")).status_code, 429)
+        self.assertEqual((await stream).status_code, 200)
+        self.assertEqual(app.state.admission.gate.in_flight, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+# Test compressed, content-hashed static assets
+import json
+import os
+import re
+import tempfile
+import unittest
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.assets import IMMUTABLE, StaticAssets, accepted_encodings, etag_matches
+from app.main import WEB_DIR, app
+
+
+class TestHeaderParsing(unittest.TestCase):
+    """Test cases for Accept-Encoding and If-None-Match parsing."""
+
+    def test_accepted_encodings(self):
+        self.assertEqual(accepted_encodings("gzip, deflate, br"), {"gzip", "deflate", "br"})
+        self.assertEqual(accepted_encodings("br;q=0, GZIP;q=0.5"), {"gzip"})
+        self.assertEqual(accepted_encodings(""), set())
+
+    def test_etag_matches(self):
+        self.assertTrue(etag_matches('"abc"', "abc"))
+        self.assertTrue(etag_matches('W/"abc-gzip", "other"', "abc"))
+        self.assertTrue(etag_matches("*", "abc"))
+        self.assertFalse(etag_matches('"abcd"', "abc"))
+
+
+class TestWebInterface(unittest.TestCase):
+    """The application serves the web directory through the asset pipeline."""
+
+    def setUp(self):
+        self.client = TestClient(app)
+
+    def hashed_url(self, name):
+        stem, ext = os.path.splitext(name)
+        page = self.client.get("/").text
+        match = re.search(rf'"(/static/{re.escape(stem)}\.[0-9a-f]{{12}}{re.escape(ext)})"', page)
+        self.assertIsNotNone(match, f"{name} is not referenced by its hashed name")
+        return match.group(1)
+
+    def test_index_is_revalidated(self):
+        response = self.client.get("/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["cache-control"], "no-cache")
+        self.assertNotIn('"/static/query.js"', response.text)
+
+        repeat = self.client.get("/", headers={"If-None-Match": response.headers["etag"]})
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(repeat.content, b"")
+
+    def test_hashed_asset_is_compressed_and_immutable(self):
+        response = self.client.get(
+            self.hashed_url("query.js"), headers={"Accept-Encoding": "gzip"}
+        )
+        self.assertEqual(response.headers["cache-control"], IMMUTABLE)
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(response.headers["vary"], "Accept-Encoding")
+        self.assertTrue(response.headers["content-type"].startswith("text/javascript"))
+        with open(os.path.join(WEB_DIR, "query.js"), "rb") as file:
+            original = file.read()
+        self.assertLess(int(response.headers["content-length"]), len(original) / 2)
+        self.assertEqual(response.content, original)
+
+    def test_identity_when_compression_is_refused(self):
+        response = self.client.get(
+            self.hashed_url("styles.css"), headers={"Accept-Encoding": "gzip;q=0"}
+        )
+        self.assertNotIn("content-encoding", response.headers)
+
+    def test_original_names_still_work(self):
+        response = self.client.get("/static/logo.svg")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["cache-control"], "no-cache")
+        self.assertEqual(self.client.get("/static/missing.js").status_code, 404)
+        self.assertEqual(self.client.get("/static/../config.yaml").status_code, 404)
+
+    def test_sample_queries_are_loaded_lazily(self):
+        with open(os.path.join(WEB_DIR, "query.js")) as file:
+            self.assertNotIn("## Mandatory Certifications", file.read())
+        samples = self.client.get(self.hashed_url("sample-queries.json")).json()
+        self.assertIn("eu", samples["fitness band with lithium battery"])
+
+
+class TestStaticAssets(unittest.TestCase):
+    """Test cases for StaticAssets on a directory of its own."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.write("index.html", '<script src="/static/app.js"></script><img src="/static/x.png">')
+        self.write("app.js", "console.log('first');\n" * 50)
+        self.assets = StaticAssets(self.tmpdir.name)
+        test_app = FastAPI()
+
+        @test_app.get("/")
+        async def root(request: Request):
+            return self.assets.index(request)
+
+        @test_app.get("/static/{path:path}")
+        async def static_file(path: str, request: Request):
+            return self.assets.file(path, request)
+
+        self.client = TestClient(test_app)
+
+    def write(self, name, text):
+        with open(os.path.join(self.tmpdir.name, name), "w") as file:
+            file.write(text)
+
+    def test_unknown_references_are_left_alone(self):
+        self.assertIn('"/static/x.png"', self.client.get("/").text)
+
+    def test_changed_files_get_new_names(self):
+        first = self.assets.url("app.js")
+        self.write("app.js", "console.log('second');\n" * 50)
+        # Requests keep being served from the assets built before
+        self.assertIn(first, self.client.get("/").text)
+        self.assertEqual(self.client.get(first).status_code, 200)
+
+        self.assets.refresh()
+        page = self.client.get("/").text
+        second = self.assets.url("app.js")
+
+        self.assertNotEqual(first, second)
+        self.assertIn(second, page)
+        self.assertEqual(self.client.get(first).status_code, 404)
+        response = self.client.get(second, headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertIn("second", response.text)
+
+    def test_small_files_are_not_compressed(self):
+        self.write("tiny.json", json.dumps({"a": 1}))
+        self.assets.refresh()
+        response = self.client.get("/static/tiny.json", headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("content-encoding", response.headers)
+
+
+if __name__ == "__main__":
+    unittest.main()
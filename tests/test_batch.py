@@ -0,0 +1,77 @@
+# Test the batch multi-market endpoint
+import unittest
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from tests.fake_llm import create_fake_llm_app, make_llm_client
+
+
+class TestBatchRequirements(unittest.TestCase):
+    """Test cases for /api/requirements/batch."""
+
+    def setUp(self):
+        self.fake_llm = create_fake_llm_app(latency=0.1)
+        app.state.llm = make_llm_client(self.fake_llm)
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        app.state.llm = None
+
+    def test_markets_are_fetched_in_parallel(self):
+        markets = ["EU", "US", "Brazil", "Japan", "UK", "Canada"]
+        response = self.client.post(
+            "/api/requirements/batch",
+            json={"product_type": "toys", "markets": markets},
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+
+        self.assertEqual([r["market"] for r in data["results"]], markets)
+        for result in data["results"]:
+            self.assertIsNone(result["error"])
+            self.assertEqual(result["response"]["market"], result["market"])
+        self.assertEqual(self.fake_llm.state.peak_in_flight, len(markets))
+        self.assertLess(data["wall_time_seconds"], data["summed_item_seconds"] / 2)
+
+    def test_parallelism_cap(self):
+        response = self.client.post(
+            "/api/requirements/batch",
+            json={
+                "items": [
+                    {"product_type": "toys", "market": "EU"},
+                    {"product_type": "phones", "market": "EU"},
+                    {"product_type": "shoes", "market": "EU"},
+                ],
+                "max_parallel": 1,
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.fake_llm.state.peak_in_flight, 1)
+
+    def test_parse_failures_are_reported_per_item(self):
+        self.fake_llm.state.content = "No JSON here"
+        response = self.client.post(
+            "/api/requirements/batch",
+            json={"product_type": "toys", "markets": ["EU"]},
+        )
+        result = response.json()["results"][0]
+        self.assertIsNone(result["response"])
+        self.assertIn("JSON parsing error", result["error"])
+
+    def test_empty_batch_is_rejected(self):
+        response = self.client.post("/api/requirements/batch", json={"markets": ["EU"]})
+        self.assertEqual(response.status_code, 400)
+
+    def test_parallelism_must_be_positive(self):
+        for max_parallel in (0, -1):
+            response = self.client.post(
+                "/api/requirements/batch",
+                json={"product_type": "toys", "markets": ["EU"], "max_parallel": max_parallel},
+            )
+            self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.fake_llm.state.calls, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+# Test the two-tier response cache
+import os
+import tempfile
+import time
+import unittest
+
+from fastapi.testclient import TestClient
+
+from app.cache import ResponseCache, make_cache_key
+from app.main import app
+from app.models import MarketRequirementsResponse
+from tests.fake_llm import create_fake_llm_app, make_llm_client
+
+
+def sample_response(product_type="toys", market="EU"):
+    return MarketRequirementsResponse(
+        product_type=product_type,
+        market=market,
+        requirements=[
+            {"name": "CE Marking", "description": "Conformity", "category": "Certification"}
+        ],
+        summary="CE marking required.",
+    )
+
+
+class TestResponseCache(unittest.TestCase):
+    """Test cases for ResponseCache."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "cache.sqlite3")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_key_is_normalized(self):
+        """Case and whitespace differences map to the same key."""
+        self.assertEqual(
+            make_cache_key("  Toys ", "eu", False, "m", "1"),
+            make_cache_key("toys", "EU", False, "m", "1"),
+        )
+        self.assertNotEqual(
+            make_cache_key("toys", "EU", False, "m", "1"),
+            make_cache_key("toys", "EU", True, "m", "1"),
+        )
+
+    def test_hit_and_miss_counters(self):
+        cache = ResponseCache(self.path, ttl_seconds=60)
+        self.assertIsNone(cache.get("k"))
+        cache.set("k", sample_response())
+        self.assertEqual(cache.get("k").summary, "CE marking required.")
+        self.assertEqual(cache.stats["misses"], 1)
+        self.assertEqual(cache.stats["memory_hits"], 1)
+        cache.close()
+
+    def test_survives_restart(self):
+        """Entries are read back from SQLite by a new cache instance."""
+        cache = ResponseCache(self.path, ttl_seconds=60)
+        cache.set("k", sample_response())
+        cache.close()
+
+        reopened = ResponseCache(self.path, ttl_seconds=60)
+        self.assertEqual(reopened.get("k"), sample_response())
+        self.assertEqual(reopened.stats["disk_hits"], 1)
+        reopened.close()
+
+    def test_expired_entries_are_misses(self):
+        cache = ResponseCache(self.path, ttl_seconds=0.05)
+        cache.set("k", sample_response())
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("k"))
+        self.assertEqual(cache.stats["misses"], 1)
+        cache.close()
+
+    def test_memory_tier_is_bounded(self):
+        cache = ResponseCache(self.path, ttl_seconds=60, max_memory_entries=2)
+        for key in ("a", "b", "c"):
+            cache.set(key, sample_response())
+        self.assertEqual(list(cache._memory), ["b", "c"])
+        # The evicted entry is still served from disk
+        self.assertIsNotNone(cache.get("a"))
+        self.assertEqual(cache.stats["disk_hits"], 1)
+        cache.close()
+
+
+class TestRequirementsCaching(unittest.TestCase):
+    """The endpoint caches successful parses only."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.fake_llm = create_fake_llm_app()
+        app.state.llm = make_llm_client(self.fake_llm)
+        app.state.cache = ResponseCache(
+            os.path.join(self.tmpdir.name, "cache.sqlite3"), ttl_seconds=60
+        )
+        self.client = TestClient(app, raise_server_exceptions=False)
+
+    def tearDown(self):
+        app.state.cache.close()
+        app.state.cache = None
+        app.state.llm = None
+        self.tmpdir.cleanup()
+
+    def test_repeated_lookup_skips_upstream(self):
+        first = self.client.post(
+            "/api/requirements", json={"product_type": "toys", "market": "EU"}
+        )
+        second = self.client.post(
+            "/api/requirements", json={"product_type": "Toys", "market": "eu"}
+        )
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.json()["product_type"], "Toys")
+        self.assertEqual(second.json()["requirements"], first.json()["requirements"])
+        self.assertEqual(self.fake_llm.state.calls, 1)
+
+    def test_failed_parse_is_not_cached(self):
+        self.fake_llm.state.content = "Sorry, I could not find anything."
+        for _ in range(2):
+            self.client.post(
+                "/api/requirements", json={"product_type": "toys", "market": "EU"}
+            )
+        self.assertEqual(self.fake_llm.state.calls, 2)
+        self.assertEqual(app.state.cache.stats["stores"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
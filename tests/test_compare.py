@@ -0,0 +1,143 @@
+# Test the comparison of requirements across markets
+import os
+import tempfile
+import time
+import unittest
+
+from fastapi.testclient import TestClient
+
+from app.compare import compare_answers, requirement_key
+from app.main import answer_variant, app
+from app.models import MarketRequirementsResponse
+from app.store import RequirementStore
+from tests.fake_llm import create_fake_llm_app, make_llm_client
+from tests.test_store import battery_response
+
+
+def answer(market, names):
+    return MarketRequirementsResponse(
+        product_type="fitness band",
+        market=market,
+        requirements=[{"name": name, "description": "d", "category": "c"} for name in names],
+        summary="s",
+    )
+
+
+class TestRequirementKey(unittest.TestCase):
+    """Test cases for requirement_key."""
+
+    def test_identifiers_match_across_wording(self):
+        self.assertEqual(requirement_key("UN 38.3"), "UN 38.3")
+        self.assertEqual(requirement_key("Lithium battery transport testing (UN38.3)"), "UN 38.3")
+        self.assertEqual(requirement_key("IEC 62133-2:2017"), "IEC 62133-2")
+        self.assertEqual(requirement_key("ETSI EN 301 489-1"), "ETSI EN 301 489-1")
+        self.assertEqual(requirement_key("Radio Equipment Directive 2014/53/EU"), "EU 2014/53")
+        self.assertEqual(requirement_key("Regulation (EU) 2023/648"), "EU 2023/648")
+        self.assertEqual(requirement_key("49 CFR 173.185"), "49 CFR 173.185")
+
+    def test_names_without_one_identifier(self):
+        self.assertEqual(requirement_key("CE  Marking"), "ce marking")
+        self.assertEqual(
+            requirement_key("CE marking (RED 2014/53/EU, LVD 2014/35/EU)"), "ce marking"
+        )
+        self.assertEqual(requirement_key("California Proposition 65"), "california proposition 65")
+
+
+class TestCompareAnswers(unittest.TestCase):
+    """Test cases for compare_answers."""
+
+    def test_matrix(self):
+        comparison = compare_answers(
+            "fitness band",
+            [
+                answer("EU", ["CE Marking", "UN 38.3", "RoHS"]),
+                answer("US", ["FCC Part 15", "UN 38.3 transport testing"]),
+                answer("UK", ["UKCA marking", "UN38.3", "RoHS Regulations"]),
+            ],
+        )
+        self.assertEqual(comparison.markets, ["EU", "US", "UK"])
+        self.assertEqual(comparison.shared, ["UN 38.3"])
+        self.assertEqual(
+            comparison.market_specific,
+            {
+                "EU": ["ce marking", "rohs"],
+                "US": ["FCC Part 15"],
+                "UK": ["ukca marking", "rohs regulations"],
+            },
+        )
+        first = comparison.requirements[0]
+        self.assertEqual((first.key, first.name, first.present_in), ("UN 38.3", "UN 38.3", [0, 1, 2]))
+
+    def test_thirty_markets_with_hundreds_of_requirements(self):
+        answers = [
+            answer(
+                f"Market {market}",
+                [f"IEC {60000 + n}" for n in range(150)]
+                + [f"Local requirement {market}-{n}" for n in range(150)],
+            )
+            for market in range(30)
+        ]
+        start = time.perf_counter()
+        comparison = compare_answers("fitness band", answers)
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual(len(comparison.shared), 150)
+        self.assertEqual(len(comparison.requirements), 150 + 30 * 150)
+
+
+class TestCompareEndpoint(unittest.TestCase):
+    """Test cases for /api/requirements/compare."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.store = RequirementStore(os.path.join(self.tmpdir.name, "store.sqlite3"))
+        self.addCleanup(self.store.close)
+        self.fake_llm = create_fake_llm_app()
+        app.state.llm = make_llm_client(self.fake_llm)
+        self.store.save(battery_response("EU"), answer_variant(False, app.state.llm.settings))
+        app.state.store = self.store
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        app.state.llm = app.state.store = None
+
+    def compare(self, **body):
+        return self.client.post(
+            "/api/requirements/compare", json={"product_type": "fitness band", **body}
+        )
+
+    def test_only_missing_markets_are_fetched(self):
+        response = self.compare(markets=["EU", "US", "eu"])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+
+        self.assertEqual(data["markets"], ["EU", "US"])
+        self.assertEqual(data["fetched"], ["US"])
+        self.assertEqual(self.fake_llm.state.calls, 1)
+        self.assertEqual(data["shared"], ["ce marking"])
+        self.assertEqual(data["market_specific"], {"EU": ["UN 38.3"], "US": []})
+
+        # The fetched answer is stored, so a second comparison needs no lookup
+        self.assertEqual(self.compare(markets=["EU", "US"]).json()["fetched"], [])
+        self.assertEqual(self.fake_llm.state.calls, 1)
+
+    def test_without_fetching(self):
+        data = self.compare(markets=["EU", "US"], fetch_missing=False).json()
+        self.assertEqual(data["markets"], ["EU"])
+        self.assertEqual(data["errors"], {"US": "Not cached or stored"})
+        self.assertEqual(self.fake_llm.state.calls, 0)
+
+    def test_failed_lookup_is_reported(self):
+        self.fake_llm.state.content = "no json here"
+        data = self.compare(markets=["EU", "US"]).json()
+        self.assertEqual(data["markets"], ["EU"])
+        self.assertIn("US", data["errors"])
+
+    def test_market_limit(self):
+        self.assertEqual(self.compare(markets=[]).status_code, 400)
+        markets = [f"Market {n}" for n in range(51)]
+        self.assertEqual(self.compare(markets=markets).status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
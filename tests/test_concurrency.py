@@ -0,0 +1,70 @@
+# Load test for /api/requirements against the local fake completion server
+import asyncio
+import time
+import unittest
+
+import httpx
+
+from app.main import app
+from tests.fake_llm import create_fake_llm_app, make_llm_client
+
+
+class TestConcurrentRequirements(unittest.IsolatedAsyncioTestCase):
+    """Concurrent lookups must not serialize on the event loop."""
+
+    LATENCY = 0.2
+    REQUESTS = 20
+
+    async def asyncSetUp(self):
+        self.fake_llm = create_fake_llm_app(latency=self.LATENCY)
+
+    async def asyncTearDown(self):
+        if app.state.llm is not None:
+            await app.state.llm.aclose()
+        app.state.llm = None
+
+    async def _run_load(self):
+        """Fire REQUESTS concurrent lookups and return the wall time."""
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            start = time.perf_counter()
+            responses = await asyncio.gather(
+                *[
+                    client.post(
+                        "/api/requirements",
+                        json={"product_type": f"toys {i}", "market": "EU"},
+                    )
+                    for i in range(self.REQUESTS)
+                ]
+            )
+            elapsed = time.perf_counter() - start
+
+        for response in responses:
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["requirements"][0]["name"], "CE Marking")
+        return elapsed
+
+    async def test_requests_run_concurrently(self):
+        """Twenty 200 ms lookups finish in far less than the serial 4 s."""
+        app.state.llm = make_llm_client(self.fake_llm)
+
+        elapsed = await self._run_load()
+
+        serial_time = self.LATENCY * self.REQUESTS
+        self.assertLess(elapsed, serial_time / 4)
+        self.assertEqual(self.fake_llm.state.calls, self.REQUESTS)
+        self.assertEqual(self.fake_llm.state.peak_in_flight, self.REQUESTS)
+
+    async def test_concurrency_limit_is_respected(self):
+        """The semaphore caps upstream calls in flight."""
+        app.state.llm = make_llm_client(self.fake_llm, max_concurrent_requests=4)
+
+        elapsed = await self._run_load()
+
+        self.assertEqual(self.fake_llm.state.peak_in_flight, 4)
+        # 20 calls in batches of 4 take at least five latency periods
+        self.assertGreaterEqual(elapsed, self.LATENCY * self.REQUESTS / 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+# Test configuration loading and hot reload
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import httpx
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+
+from app.admission import AdmissionController
+from app.config import load_config
+from app.main import app, apply_config
+from tests.fake_llm import create_fake_llm_app, make_llm_client, make_settings
+
+
+class ConfigFileTestCase(unittest.TestCase):
+    """Points CONFIG_PATH at a temporary config file."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.config_path = os.path.join(self.tmpdir.name, "config.yaml")
+        patcher = mock.patch.dict(os.environ, {"CONFIG_PATH": self.config_path})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def write_config(self, text):
+        with open(self.config_path, "w") as file:
+            file.write(text)
+
+
+class TestLoadConfig(ConfigFileTestCase):
+    """Test cases for load_config."""
+
+    def test_values_and_defaults(self):
+        self.write_config('openai_api_key: "sk-test"\nmax_tokens: 500\nunknown: 1\n')
+        settings = load_config()
+        self.assertEqual(settings.openai_api_key, "sk-test")
+        self.assertEqual(settings.max_tokens, 500)
+        self.assertEqual(settings.model, "gpt-4o-search-preview")
+
+    def test_settings_are_immutable(self):
+        self.write_config('openai_api_key: "sk-test"\n')
+        settings = load_config()
+        with self.assertRaises(ValidationError):
+            settings.model = "other"
+
+    def test_missing_api_key(self):
+        self.write_config('openai_api_key: ""\n')
+        with self.assertRaises(HTTPException) as ctx:
+            load_config()
+        self.assertEqual(ctx.exception.detail, "OpenAI API key not found in config")
+
+    def test_missing_file(self):
+        with self.assertRaises(HTTPException):
+            load_config()
+
+
+class TestLifespan(ConfigFileTestCase):
+    """Settings are loaded once at startup."""
+
+    def test_startup_loads_config_once(self):
+        cache_path = os.path.join(self.tmpdir.name, "cache.sqlite3")
+        jobs_path = os.path.join(self.tmpdir.name, "jobs.sqlite3")
+        self.write_config(
+            f'openai_api_key: "sk-test"\ncache_path: "{cache_path}"\n'
+            f'job_store_path: "{jobs_path}"\nstore_enabled: false\n'
+        )
+        with mock.patch("app.main.load_config", wraps=load_config) as loader:
+            with TestClient(app) as client:
+                client.get("/api/cache/stats")
+                client.get("/api/cache/stats")
+                self.assertEqual(app.state.llm.settings.openai_api_key, "sk-test")
+        self.assertEqual(loader.call_count, 1)
+
+    def test_missing_key_is_reported_by_api(self):
+        self.write_config('openai_api_key: ""\n')
+        with TestClient(app) as client:
+            response = client.post(
+                "/api/requirements", json={"product_type": "toys", "market": "EU"}
+            )
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json()["detail"], "OpenAI API key not found in config")
+
+
+class TestReload(ConfigFileTestCase, unittest.IsolatedAsyncioTestCase):
+    """Reloading swaps the client without dropping in-flight requests."""
+
+    def setUp(self):
+        super().setUp()
+        app.state.cache = None
+        app.state.store = None
+        app.state.jobs = None
+        app.state.background_tasks = set()
+
+    async def asyncTearDown(self):
+        if app.state.jobs is not None:
+            await app.state.jobs.stop()
+            app.state.jobs.store.close()
+            app.state.jobs = None
+        app.state.llm = app.state.admission = None
+
+    async def test_reload_keeps_in_flight_requests(self):
+        fake_llm = create_fake_llm_app(latency=0.2)
+        old_client = make_llm_client(fake_llm)
+        app.state.llm = old_client
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            in_flight = asyncio.create_task(
+                client.post(
+                    "/api/requirements", json={"product_type": "toys", "market": "EU"}
+                )
+            )
+            await asyncio.sleep(0.05)
+
+            jobs_path = os.path.join(self.tmpdir.name, "jobs.sqlite3")
+            self.write_config(
+                'openai_api_key: "sk-new"\nmodel: "new-model"\ncache_enabled: false\n'
+                'store_enabled: false\n'
+                f'job_store_path: "{jobs_path}"\n'
+            )
+            self.assertTrue(apply_config(app))
+            self.assertEqual(app.state.llm.settings.model, "new-model")
+
+            response = await in_flight
+
+        self.assertEqual(response.status_code, 200)
+        await asyncio.gather(*app.state.background_tasks)
+        self.assertTrue(old_client._http_client.is_closed)
+        await app.state.llm.aclose()
+
+    async def test_reload_keeps_queued_requests(self):
+        old_client = make_llm_client(create_fake_llm_app(latency=0.2))
+        app.state.llm = old_client
+        app.state.admission = AdmissionController(make_settings(max_in_flight_lookups=1))
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            lookups = [
+                asyncio.create_task(
+                    client.post(
+                        "/api/requirements", json={"product_type": "toys", "market": market}
+                    )
+                )
+                for market in ["EU", "US"]
+            ]
+            await asyncio.sleep(0.05)
+            self.assertEqual(app.state.admission.gate.queued, 1)
+
+            jobs_path = os.path.join(self.tmpdir.name, "jobs.sqlite3")
+            self.write_config(
+                'openai_api_key: "sk-new"\ncache_enabled: false\nstore_enabled: false\n'
+                f'max_in_flight_lookups: 1\njob_store_path: "{jobs_path}"\n'
+            )
+            self.assertTrue(apply_config(app))
+            responses = await asyncio.gather(*lookups)
+
+        # The queued lookup still runs on the client it started with
+        self.assertEqual([response.status_code for response in responses], [200, 200])
+        await asyncio.gather(*app.state.background_tasks)
+        self.assertTrue(old_client._http_client.is_closed)
+        await app.state.llm.aclose()
+
+    async def test_invalid_reload_keeps_current_settings(self):
+        app.state.llm = make_llm_client(create_fake_llm_app())
+        self.write_config('openai_api_key: ""\n')
+        self.assertFalse(apply_config(app))
+        self.assertEqual(app.state.llm.settings.openai_api_key, "test-key")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,205 @@
+# Test background jobs for long-running lookups
+import asyncio
+import os
+import tempfile
+import unittest
+from functools import partial
+
+import httpx
+
+from app.jobs import FAILED, QUEUED, SUCCEEDED, JobQueue, JobStore
+from app.main import app, run_job
+from app.metrics import JOB_WAIT_SECONDS
+from app.models import MarketRequirementsRequest, MarketRequirementsResponse
+from tests.fake_llm import create_fake_llm_app, make_llm_client
+
+
+def sample_request(product_type="toys", market="EU"):
+    return MarketRequirementsRequest(product_type=product_type, market=market, detailed=True)
+
+
+class JobStoreTestCase(unittest.IsolatedAsyncioTestCase):
+    """Provides a job store in a temporary directory."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "jobs.sqlite3")
+        self.addCleanup(self.tmpdir.cleanup)
+        self.store = JobStore(self.path, result_ttl_seconds=60)
+        self.addCleanup(self.store.close)
+
+
+class TestJobQueue(JobStoreTestCase):
+    """Test cases for JobQueue."""
+
+    async def test_worker_pool_is_bounded(self):
+        running = 0
+        peak = 0
+
+        async def run(request):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.05)
+            running -= 1
+            return MarketRequirementsResponse(
+                product_type=request.product_type,
+                market=request.market,
+                requirements=[],
+                summary="done",
+            )
+
+        jobs = JobQueue(self.store, run, workers=2)
+        jobs.start()
+        waits_before = JOB_WAIT_SECONDS.count()
+        submitted = [await jobs.submit(sample_request(market=f"M{i}")) for i in range(5)]
+        self.assertEqual(submitted[0].status, QUEUED)
+
+        finished = [await jobs.wait(job.job_id, timeout=5) for job in submitted]
+        await jobs.stop()
+
+        self.assertEqual(peak, 2)
+        self.assertEqual([job.status for job in finished], [SUCCEEDED] * 5)
+        self.assertEqual(finished[4].result.market, "M4")
+        self.assertEqual(JOB_WAIT_SECONDS.count() - waits_before, 5)
+
+    async def test_failure_is_recorded(self):
+        async def run(request):
+            raise RuntimeError("upstream unavailable")
+
+        jobs = JobQueue(self.store, run, workers=1)
+        jobs.start()
+        job = await jobs.wait((await jobs.submit(sample_request())).job_id, timeout=5)
+        await jobs.stop()
+
+        self.assertEqual(job.status, FAILED)
+        self.assertEqual(job.error, "upstream unavailable")
+        self.assertIsNone(job.result)
+
+    async def test_wait_times_out_with_current_state(self):
+        async def run(request):
+            await asyncio.sleep(10)
+
+        jobs = JobQueue(self.store, run, workers=1)
+        jobs.start()
+        job = await jobs.submit(sample_request())
+        await asyncio.sleep(0.01)
+        state = await jobs.wait(job.job_id, timeout=0.05)
+        await jobs.stop()
+
+        self.assertEqual(state.status, "running")
+        self.assertIsNone(await jobs.wait("unknown", timeout=0))
+
+    async def test_waiting_for_a_job_run_elsewhere_leaves_nothing_behind(self):
+        async def run(request):
+            await asyncio.sleep(10)
+
+        # Another process's queue runs the job; this one only waits for it
+        jobs = JobQueue(self.store, run, workers=1, poll_interval=0.01)
+        job = await jobs.submit(sample_request())
+        states = await asyncio.gather(
+            jobs.wait(job.job_id, timeout=0.05), jobs.wait(job.job_id, timeout=0.02)
+        )
+
+        self.assertEqual([state.status for state in states], [QUEUED, QUEUED])
+        self.assertEqual(jobs._done_events, {})
+        self.assertEqual(jobs._waiters, {})
+
+    async def test_interrupted_jobs_resume_after_restart(self):
+        async def hang(request):
+            await asyncio.sleep(10)
+
+        jobs = JobQueue(self.store, hang, workers=1)
+        jobs.start()
+        first = await jobs.submit(sample_request(market="EU"))
+        second = await jobs.submit(sample_request(market="US"))
+        await asyncio.sleep(0.01)
+        await jobs.stop()
+        self.store.close()
+
+        async def run(request):
+            return MarketRequirementsResponse(
+                product_type=request.product_type,
+                market=request.market,
+                requirements=[],
+                summary="resumed",
+            )
+
+        self.store = JobStore(self.path, result_ttl_seconds=60)
+        jobs = JobQueue(self.store, run, workers=1)
+        jobs.start()
+        results = [await jobs.wait(job.job_id, timeout=5) for job in (first, second)]
+        await jobs.stop()
+
+        self.assertEqual([job.status for job in results], [SUCCEEDED, SUCCEEDED])
+        self.assertEqual([job.result.market for job in results], ["EU", "US"])
+
+
+class TestJobEndpoints(JobStoreTestCase):
+    """Test cases for /api/jobs."""
+
+    async def asyncSetUp(self):
+        self.fake_llm = create_fake_llm_app(latency=0.1)
+        app.state.llm = make_llm_client(self.fake_llm)
+        app.state.llm_error = None
+        app.state.cache = None
+        app.state.jobs = JobQueue(self.store, partial(run_job, app), workers=2)
+        app.state.jobs.start()
+
+    async def asyncTearDown(self):
+        await app.state.jobs.stop()
+        app.state.jobs = None
+        app.state.llm = None
+
+    async def test_submit_and_long_poll(self):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post(
+                "/api/jobs", json={"product_type": "toys", "market": "EU", "detailed": True}
+            )
+            self.assertEqual(response.status_code, 202)
+            job = response.json()
+            self.assertEqual(job["status"], QUEUED)
+            self.assertEqual(response.headers["location"], f"/api/jobs/{job['job_id']}")
+
+            response = await client.get(f"/api/jobs/{job['job_id']}", params={"wait": 5})
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["status"], SUCCEEDED)
+        self.assertEqual(data["result"]["requirements"][0]["name"], "CE Marking")
+        self.assertGreaterEqual(data["started_at"], data["created_at"])
+
+    async def test_upstream_error_fails_job(self):
+        self.fake_llm.state.failures = [(400, {})]
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            job = (
+                await client.post("/api/jobs", json={"product_type": "toys", "market": "EU"})
+            ).json()
+            data = (
+                await client.get(f"/api/jobs/{job['job_id']}", params={"wait": 5})
+            ).json()
+
+        self.assertEqual(data["status"], FAILED)
+        self.assertTrue(data["error"].startswith("OpenAI API error"))
+
+    async def test_unknown_job(self):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get("/api/jobs/missing")
+        self.assertEqual(response.status_code, 404)
+
+    async def test_invalid_wait_is_rejected(self):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            job = (
+                await client.post("/api/jobs", json={"product_type": "toys", "market": "EU"})
+            ).json()
+            for wait in ("nan", "inf", "-1"):
+                response = await client.get(f"/api/jobs/{job['job_id']}", params={"wait": wait})
+                self.assertEqual(response.status_code, 422)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,5 @@
 # Test the clean_json_content function independently
-from app.utils import clean_json_content
+from app.utils import clean_json_content, parse_regulation_data
 import json
 import unittest
 
@@ -142,6 +142,46 @@ It's crucial to consult with local authorities or compliance experts to confirm
         # Verify the summary is correctly extracted
         self.assertIn("wooden decorations in Brazil", parsed["summary"])
 
+    def test_skips_invalid_candidates(self):
+        """An invalid brace block before the JSON does not hide it."""
+        content = 'Scope {not json} {"broken": } see [1] and [DOC 3]: {"requirements": [], "summary": "ok"} end'
+        cleaned = clean_json_content(content)
+        self.assertEqual(json.loads(cleaned), {"requirements": [], "summary": "ok"})
+
+    def test_returns_first_of_multiple_objects(self):
+        """Only the first complete object is returned."""
+        content = '{"summary": "first"}\n\n{"summary": "second"}'
+        self.assertEqual(json.loads(clean_json_content(content))["summary"], "first")
+
+    def test_invalid_fenced_block_falls_back_to_text(self):
+        """A fenced block that is not JSON is skipped."""
+        content = '```python\nprint("hi")\n```\nResult: {"summary": "ok"}'
+        self.assertEqual(json.loads(clean_json_content(content))["summary"], "ok")
+
+    def test_array_of_objects(self):
+        content = 'Items: [{"name": "CE"}, {"name": "FCC"}] done'
+        self.assertEqual(len(json.loads(clean_json_content(content))), 2)
+
+    def test_failed_candidates_are_skipped_once(self):
+        """Many candidates failing to decode are skipped in linear time."""
+        answer = '{"requirements": [], "summary": "ok"}'
+        self.assertEqual(clean_json_content('{"a": 1, ' * 20000 + answer), answer)
+        self.assertEqual(clean_json_content("[{" * 20000), "[{" * 20000)
+
+    def test_deep_nesting_is_skipped(self):
+        """Nesting too deep to decode does not raise and hides nothing after it."""
+        answer = '{"requirements": [], "summary": "ok"}'
+        self.assertEqual(clean_json_content("[" * 5000 + "]" * 5000 + answer), answer)
+        unclosed = '{"a": ' * 5000
+        self.assertEqual(clean_json_content(unclosed), unclosed)
+        success, result = parse_regulation_data(unclosed, "toys", "Brazil")
+        self.assertFalse(success)
+        self.assertIn("JSON parsing error", result["error"])
+
+    def test_no_json_returns_content(self):
+        content = "I could not find any requirements {for this product."
+        self.assertEqual(clean_json_content(content), content)
+
 
 if __name__ == "__main__":
     unittest.main()
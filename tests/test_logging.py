@@ -0,0 +1,82 @@
+# Test the queue-based logging pipeline
+import json
+import logging
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from app import logging_config
+from app.main import app
+from app.models import ConfigSettings
+
+
+class TestLoggingPipeline(unittest.TestCase):
+    """Records are written by the listener as structured JSON."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.log_file = os.path.join(self.tmpdir.name, "app.log")
+        logging_config.configure_logging(
+            ConfigSettings(log_format="json", log_file=self.log_file, log_level="info")
+        )
+
+    def tearDown(self):
+        logging_config.configure_logging(ConfigSettings())
+        self.tmpdir.cleanup()
+
+    def read_records(self):
+        # Stopping the listener flushes everything still queued
+        logging_config.shutdown_logging()
+        with open(self.log_file) as file:
+            return [json.loads(line) for line in file]
+
+    def test_request_id_and_timing_are_logged(self):
+        response = TestClient(app).get("/api/cache/stats", headers={"X-Request-ID": "abc123"})
+        self.assertEqual(response.headers["x-request-id"], "abc123")
+
+        access = [r for r in self.read_records() if r["logger"] == "app.access"]
+        self.assertEqual(access[-1]["request_id"], "abc123")
+        self.assertEqual(access[-1]["path"], "/api/cache/stats")
+        self.assertEqual(access[-1]["status"], 200)
+        self.assertIn("duration_ms", access[-1])
+
+    def test_request_id_is_generated(self):
+        response = TestClient(app).get("/api/cache/stats")
+        self.assertTrue(response.headers["x-request-id"])
+
+    def test_level_and_exceptions(self):
+        logger = logging.getLogger("app.test")
+        logger.debug("hidden")
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.error("failed %s", "badly", exc_info=True)
+
+        records = [r for r in self.read_records() if r["logger"] == "app.test"]
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]["message"], "failed badly")
+        self.assertIn("ValueError: boom", records[0]["exc_info"])
+
+    def test_workers_log_to_their_own_file(self):
+        with mock.patch.dict(os.environ, {logging_config.WORKERS_ENV: "4"}):
+            logging_config.configure_logging(
+                ConfigSettings(log_format="json", log_file=self.log_file, log_level="info")
+            )
+        logging.getLogger("app.test").info("from a worker")
+        logging_config.shutdown_logging()
+
+        worker_file = os.path.join(self.tmpdir.name, f"app.{os.getpid()}.log")
+        with open(worker_file) as file:
+            records = [json.loads(line) for line in file]
+        self.assertEqual(records[-1]["message"], "from a worker")
+        self.assertEqual(
+            logging_config.log_file_path(ConfigSettings(log_file=self.log_file)),
+            self.log_file,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+# Test the metrics registry and /metrics endpoint
+import unittest
+
+from fastapi.testclient import TestClient
+
+from app import metrics
+from app.main import app
+from tests.fake_llm import create_fake_llm_app, make_llm_client
+
+
+class TestMetricTypes(unittest.TestCase):
+    """Test cases for the metric classes."""
+
+    def setUp(self):
+        self.registry = list(metrics._registry)
+
+    def tearDown(self):
+        metrics._registry[:] = self.registry
+
+    def test_counter_with_labels(self):
+        counter = metrics.Counter("test_events_total", "Events", ("kind",))
+        counter.inc("a")
+        counter.inc("a", amount=2)
+        self.assertEqual(counter.value("a"), 3)
+        self.assertIn('test_events_total{kind="a"} 3', list(counter.render()))
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = metrics.Histogram("test_seconds", "Latency", (0.1, 1))
+        for value in (0.05, 0.5, 0.5, 5):
+            histogram.observe(value)
+        lines = list(histogram.render())
+        self.assertIn('test_seconds_bucket{le="0.1"} 1', lines)
+        self.assertIn('test_seconds_bucket{le="1"} 3', lines)
+        self.assertIn('test_seconds_bucket{le="+Inf"} 4', lines)
+        self.assertIn("test_seconds_count 4", lines)
+        self.assertIn("test_seconds_sum 6.05", lines)
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+    """A lookup is reflected in the exported metrics."""
+
+    def setUp(self):
+        app.state.llm = make_llm_client(create_fake_llm_app())
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        app.state.llm = None
+
+    def test_lookup_is_instrumented(self):
+        requests_before = metrics.HTTP_REQUESTS.value("POST", "/api/requirements", "200")
+        llm_before = metrics.LLM_REQUEST_SECONDS.count("success")
+        parse_before = metrics.PARSE_SECONDS.count()
+        tokens_before = metrics.LLM_TOKENS.value("prompt")
+
+        response = self.client.post(
+            "/api/requirements", json={"product_type": "toys", "market": "EU"}
+        )
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(
+            metrics.HTTP_REQUESTS.value("POST", "/api/requirements", "200"),
+            requests_before + 1,
+        )
+        self.assertEqual(metrics.LLM_REQUEST_SECONDS.count("success"), llm_before + 1)
+        self.assertEqual(metrics.PARSE_SECONDS.count(), parse_before + 1)
+        self.assertEqual(metrics.LLM_TOKENS.value("prompt"), tokens_before + 100)
+        self.assertEqual(metrics.HTTP_IN_FLIGHT.value(), 0)
+
+        text = self.client.get("/metrics").text
+        self.assertIn('http_requests_total{method="POST",path="/api/requirements",status="200"}', text)
+        self.assertIn("# TYPE llm_request_duration_seconds histogram", text)
+        self.assertIn('singleflight_requests_total{result="leaders"}', text)
+
+    def test_parse_failures_are_counted_by_reason(self):
+        app.state.llm = make_llm_client(create_fake_llm_app(content="no json here"))
+        before = metrics.PARSE_FAILURES.value("invalid_json")
+        TestClient(app, raise_server_exceptions=False).post(
+            "/api/requirements", json={"product_type": "toys", "market": "EU"}
+        )
+        self.assertEqual(metrics.PARSE_FAILURES.value("invalid_json"), before + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+# Test answer validation and response serialization
+import json
+import unittest
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.metrics import PARSE_FAILURES
+from app.models import MarketRequirementsResponse
+from app.utils import parse_regulation_data
+from tests.fake_llm import DEFAULT_CONTENT, create_fake_llm_app, make_llm_client
+
+
+class TestParseRegulationData(unittest.TestCase):
+    """Test cases for parse_regulation_data."""
+
+    def test_valid_answer(self):
+        success, result = parse_regulation_data(DEFAULT_CONTENT, "toys", "EU")
+        self.assertTrue(success)
+        self.assertIsInstance(result, MarketRequirementsResponse)
+        self.assertEqual(
+            json.loads(result.model_dump_json())["requirements"],
+            json.loads(DEFAULT_CONTENT)["requirements"],
+        )
+
+    def test_missing_fields(self):
+        before = PARSE_FAILURES.value("missing_fields")
+        success, result = parse_regulation_data('{"requirements": []}', "toys", "EU")
+        self.assertFalse(success)
+        self.assertEqual(result["error"], "API response missing required fields")
+        self.assertEqual(PARSE_FAILURES.value("missing_fields"), before + 1)
+
+    def test_invalid_fields(self):
+        content = json.dumps({"requirements": [{"name": "CE Marking"}], "summary": "s"})
+        before = PARSE_FAILURES.value("invalid_fields")
+        success, result = parse_regulation_data(content, "toys", "EU")
+        self.assertFalse(success)
+        self.assertTrue(result["error"].startswith("Invalid requirement data"))
+        self.assertEqual(result["raw_response"], content)
+        self.assertEqual(PARSE_FAILURES.value("invalid_fields"), before + 1)
+
+    def test_invalid_json(self):
+        success, result = parse_regulation_data("no JSON here", "toys", "EU")
+        self.assertFalse(success)
+        self.assertTrue(result["error"].startswith("JSON parsing error"))
+
+
+class TestResponseSerialization(unittest.TestCase):
+    """The endpoint serializes the parsed model directly."""
+
+    def setUp(self):
+        self.fake_llm = create_fake_llm_app()
+        app.state.llm = make_llm_client(self.fake_llm)
+        self.client = TestClient(app, raise_server_exceptions=False)
+
+    def tearDown(self):
+        app.state.llm = None
+
+    def test_body_matches_model(self):
+        response = self.client.post(
+            "/api/requirements", json={"product_type": "toys", "market": "EU"}
+        )
+        self.assertEqual(response.status_code, 200)
+        _, expected = parse_regulation_data(DEFAULT_CONTENT, "toys", "EU")
+        self.assertEqual(response.content, expected.model_dump_json().encode())
+
+    def test_failed_parse_returns_raw_response(self):
+        self.fake_llm.state.content = "Sorry, I could not find anything."
+        response = self.client.post(
+            "/api/requirements", json={"product_type": "toys", "market": "EU"}
+        )
+        self.assertEqual(response.status_code, 502)
+        self.assertIn("raw_response", response.json())
+
+
+if __name__ == "__main__":
+    unittest.main()
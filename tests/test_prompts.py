@@ -0,0 +1,90 @@
+# Test prompt templates and completion parameters
+import json
+import unittest
+from unittest import mock
+
+from app.llm import completion_options
+from app.metrics import LLM_REQUEST_TOKENS
+from app.prompts import REQUIREMENTS_PROMPT, requirements_messages
+from app.utils import parse_regulation_data
+from tests.fake_llm import DEFAULT_CONTENT, create_fake_llm_app, make_llm_client, make_settings
+
+
+class TestPromptTemplate(unittest.TestCase):
+    """Test cases for the requirements prompt."""
+
+    def test_template_is_trimmed(self):
+        for text in (REQUIREMENTS_PROMPT.system, REQUIREMENTS_PROMPT.user):
+            lines = text.splitlines()
+            self.assertTrue(all(line == line.strip() and line for line in lines))
+
+    def test_render(self):
+        system, user = requirements_messages("toys", "EU", detailed=True)
+        self.assertEqual(system["role"], "system")
+        self.assertIn('"requirements":[', system["content"])
+        self.assertIn("detailed and comprehensive", user["content"])
+        self.assertIn("toys in the EU market", user["content"].replace("\n", " "))
+        # Values are substituted verbatim, braces included
+        _, user = requirements_messages("{odd} toys", "EU", detailed=False)
+        self.assertIn("{odd} toys", user["content"])
+
+
+class TestCompletionOptions(unittest.TestCase):
+    """Test cases for completion_options."""
+
+    def test_search_model(self):
+        options = completion_options(make_settings(model="gpt-4o-search-preview"))
+        self.assertEqual(options, {"max_tokens": 2000, "web_search_options": {}})
+
+    def test_structured_output(self):
+        options = completion_options(make_settings(model="gpt-4o", temperature=0.1))
+        self.assertEqual(options["temperature"], 0.1)
+        self.assertEqual(options["response_format"]["type"], "json_schema")
+        self.assertNotIn("web_search_options", options)
+
+    def test_json_mode_setting(self):
+        settings = make_settings(model="gpt-4o", llm_json_mode="json_object")
+        self.assertEqual(completion_options(settings)["response_format"], {"type": "json_object"})
+        settings = make_settings(model="gpt-4o", llm_json_mode="off")
+        self.assertNotIn("response_format", completion_options(settings))
+
+
+class TestCompletionRequest(unittest.IsolatedAsyncioTestCase):
+    """The configured limits are sent with each completion."""
+
+    async def test_request_body(self):
+        fake_llm = create_fake_llm_app()
+        client = make_llm_client(fake_llm, max_tokens=500, temperature=0.3)
+        before = LLM_REQUEST_TOKENS.count("prompt")
+
+        await client.create_completion(requirements_messages("toys", "EU", False))
+        await client.aclose()
+
+        body = fake_llm.state.last_body
+        self.assertEqual(body["max_tokens"], 500)
+        self.assertEqual(body["temperature"], 0.3)
+        self.assertEqual(body["response_format"]["json_schema"]["name"], "market_requirements")
+        self.assertEqual([m["role"] for m in body["messages"]], ["system", "user"])
+        self.assertEqual(client.json_mode, "json_schema")
+        self.assertEqual(LLM_REQUEST_TOKENS.count("prompt"), before + 1)
+
+
+class TestJsonModeParsing(unittest.TestCase):
+    """JSON mode answers skip the cleaning heuristics."""
+
+    def test_bare_json_is_not_cleaned(self):
+        with mock.patch("app.utils.clean_json_content") as cleaner:
+            success, result = parse_regulation_data(DEFAULT_CONTENT, "toys", "EU", json_mode=True)
+        self.assertTrue(success)
+        self.assertEqual(result.requirements[0].name, "CE Marking")
+        cleaner.assert_not_called()
+
+    def test_falls_back_to_cleaning(self):
+        content = "```json\n" + DEFAULT_CONTENT + "\n```"
+        success, result = parse_regulation_data(content, "toys", "EU", json_mode=True)
+        self.assertTrue(success)
+        self.assertEqual(result.summary, json.loads(DEFAULT_CONTENT)["summary"])
+
+
+if __name__ == "__main__":
+    unittest.main()
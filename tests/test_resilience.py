@@ -0,0 +1,166 @@
+# Test timeouts, retries and rate limiting of upstream calls
+import asyncio
+import time
+import unittest
+
+import httpx
+from openai import BadRequestError, RateLimitError
+
+from app.llm import DeadlineExceeded, retry_after_seconds
+from app.main import app
+from app.ratelimit import TokenBucket
+from tests.fake_llm import create_fake_llm_app, make_llm_client
+
+
+class TestTokenBucket(unittest.IsolatedAsyncioTestCase):
+    """Test cases for TokenBucket."""
+
+    async def test_burst_beyond_capacity_waits(self):
+        bucket = TokenBucket(rate_per_second=20, capacity=2)
+        start = time.perf_counter()
+        waits = [await bucket.acquire() for _ in range(4)]
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(waits[:2], [0.0, 0.0])
+        self.assertGreater(waits[2], 0)
+        self.assertGreaterEqual(elapsed, 0.09)
+
+    async def test_wait_beyond_max_wait_raises(self):
+        bucket = TokenBucket(rate_per_second=1, capacity=1)
+        await bucket.acquire()
+        with self.assertRaises(asyncio.TimeoutError):
+            await bucket.acquire(max_wait=0.1)
+
+    async def test_waiting_callers_do_not_delay_later_checks(self):
+        bucket = TokenBucket(rate_per_second=10, capacity=1)
+        await bucket.acquire()
+        first = asyncio.create_task(bucket.acquire())
+        await asyncio.sleep(0)
+
+        # A caller behind a sleeping one learns at once that it would be late
+        start = time.perf_counter()
+        with self.assertRaises(asyncio.TimeoutError):
+            await bucket.acquire(max_wait=0.15)
+        self.assertLess(time.perf_counter() - start, 0.05)
+        self.assertAlmostEqual(await first, 0.1, delta=0.02)
+
+    async def test_adjust_debits_actual_usage(self):
+        bucket = TokenBucket(rate_per_second=0.001, capacity=100)
+        await bucket.acquire(10)
+        bucket.adjust(50)
+        self.assertAlmostEqual(bucket.tokens, 40, places=1)
+
+
+class TestRetryAfter(unittest.TestCase):
+    """Test cases for retry_after_seconds."""
+
+    def make_error(self, headers):
+        request = httpx.Request("POST", "http://fake-llm/v1/chat/completions")
+        response = httpx.Response(429, headers=headers, request=request)
+        return RateLimitError("rate limited", response=response, body=None)
+
+    def test_seconds_and_milliseconds(self):
+        self.assertEqual(retry_after_seconds(self.make_error({"Retry-After": "3"})), 3.0)
+        self.assertEqual(
+            retry_after_seconds(self.make_error({"retry-after-ms": "250"})), 0.25
+        )
+
+    def test_missing_or_invalid(self):
+        self.assertIsNone(retry_after_seconds(self.make_error({})))
+        self.assertIsNone(retry_after_seconds(self.make_error({"Retry-After": "soon"})))
+        self.assertIsNone(retry_after_seconds(ValueError()))
+
+
+class TestLLMClientResilience(unittest.IsolatedAsyncioTestCase):
+    """Retries and deadlines against the fake server."""
+
+    async def asyncSetUp(self):
+        self.fake_llm = create_fake_llm_app()
+
+    def make_client(self, **overrides):
+        overrides.setdefault("llm_backoff_base", 0.01)
+        return make_llm_client(self.fake_llm, **overrides)
+
+    async def test_retries_honour_retry_after(self):
+        self.fake_llm.state.failures = [(429, {"Retry-After": "0.2"}), (503, {})]
+        client = self.make_client()
+
+        start = time.perf_counter()
+        response = await client.create_completion("prompt")
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(response.choices[0].finish_reason, "stop")
+        self.assertEqual(self.fake_llm.state.calls, 3)
+        self.assertGreaterEqual(elapsed, 0.2)
+
+    async def test_retries_are_bounded(self):
+        self.fake_llm.state.failures = [(429, {"Retry-After": "0"})] * 5
+        client = self.make_client(llm_max_retries=2)
+        with self.assertRaises(RateLimitError):
+            await client.create_completion("prompt")
+        self.assertEqual(self.fake_llm.state.calls, 3)
+
+    async def test_client_errors_are_not_retried(self):
+        self.fake_llm.state.failures = [(400, {})]
+        client = self.make_client()
+        with self.assertRaises(BadRequestError):
+            await client.create_completion("prompt")
+        self.assertEqual(self.fake_llm.state.calls, 1)
+
+    async def test_deadline_stops_slow_upstream(self):
+        self.fake_llm.state.latency = 5
+        client = self.make_client(llm_deadline=0.2)
+        start = time.perf_counter()
+        with self.assertRaises(DeadlineExceeded):
+            await client.create_completion("prompt")
+        self.assertLess(time.perf_counter() - start, 1)
+
+    async def test_retry_after_beyond_deadline_fails_fast(self):
+        self.fake_llm.state.failures = [(429, {"Retry-After": "30"})]
+        client = self.make_client(llm_deadline=1)
+        start = time.perf_counter()
+        with self.assertRaises(RateLimitError):
+            await client.create_completion("prompt")
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+    async def test_request_quota_queues_bursts(self):
+        # 1200 requests per minute: a 1200-request burst, then one per 50 ms
+        client = self.make_client(llm_requests_per_minute=1200)
+        client._request_bucket.tokens = 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*[client.create_completion("prompt") for _ in range(3)])
+        self.assertGreaterEqual(time.perf_counter() - start, 0.09)
+        self.assertEqual(self.fake_llm.state.calls, 3)
+
+
+class TestEndpointErrors(unittest.IsolatedAsyncioTestCase):
+    """Upstream failures map to meaningful HTTP statuses."""
+
+    async def asyncTearDown(self):
+        app.state.llm = None
+
+    async def post(self):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(
+                "/api/requirements", json={"product_type": "toys", "market": "EU"}
+            )
+
+    async def test_rate_limit_becomes_429(self):
+        fake_llm = create_fake_llm_app()
+        fake_llm.state.failures = [(429, {"Retry-After": "7"})]
+        app.state.llm = make_llm_client(fake_llm, llm_max_retries=0)
+
+        response = await self.post()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["retry-after"], "7")
+
+    async def test_deadline_becomes_504(self):
+        app.state.llm = make_llm_client(create_fake_llm_app(latency=5), llm_deadline=0.1)
+        response = await self.post()
+        self.assertEqual(response.status_code, 504)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+# Test stale-while-revalidate serving of cached answers
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+import httpx
+
+from app.cache import ResponseCache, market_ttls
+from app.main import app, refreshes
+from app.metrics import CACHE_REFRESHES
+from app.models import MarketRequirementsResponse
+from app.store import RequirementStore, diff_requirement_names
+from tests.fake_llm import DEFAULT_CONTENT, create_fake_llm_app, make_llm_client, make_settings
+from tests.test_store import battery_response
+
+UPDATED_CONTENT = json.dumps(
+    {
+        "requirements": [
+            {"name": "ce marking", "description": "Still required.", "category": "Certification"},
+            {"name": "EN 71-1", "description": "Toy safety testing.", "category": "Testing"},
+        ],
+        "summary": "Updated.",
+    }
+)
+
+
+class TestMarketTtls(unittest.TestCase):
+    """Test cases for market_ttls."""
+
+    def test_defaults_and_overrides(self):
+        settings = make_settings(
+            cache_ttl_seconds=1000,
+            cache_soft_ttl_seconds=100,
+            cache_market_ttls={"EU": {"soft_ttl_seconds": 10}, "US": {"ttl_seconds": 50}},
+        )
+        self.assertEqual(market_ttls(settings, "Japan"), (100, 1000))
+        self.assertEqual(market_ttls(settings, " eu "), (10, 1000))
+        # The soft TTL never exceeds the hard TTL
+        self.assertEqual(market_ttls(settings, "US"), (50, 50))
+
+
+class TestDiffRequirementNames(unittest.TestCase):
+    """Test cases for diff_requirement_names."""
+
+    def test_case_and_spacing_are_ignored(self):
+        old = battery_response()
+        new = MarketRequirementsResponse(
+            product_type=old.product_type,
+            market=old.market,
+            requirements=[
+                {"name": "ce  marking", "description": "d", "category": "c"},
+                {"name": "RoHS", "description": "d", "category": "c"},
+            ],
+            summary=old.summary,
+        )
+        self.assertEqual(diff_requirement_names(old, new), (["RoHS"], ["UN 38.3"]))
+
+
+class TestStaleWhileRevalidate(unittest.IsolatedAsyncioTestCase):
+    """Stale answers are served at once and refreshed in the background."""
+
+    async def asyncSetUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.fake_llm = create_fake_llm_app(latency=0.05)
+        self.cache = ResponseCache(os.path.join(self.tmpdir.name, "cache.sqlite3"), 60)
+        self.store = RequirementStore(os.path.join(self.tmpdir.name, "store.sqlite3"))
+        app.state.llm_error = None
+        app.state.cache = self.cache
+        app.state.store = self.store
+        transport = httpx.ASGITransport(app=app)
+        self.client = httpx.AsyncClient(transport=transport, base_url="http://test")
+
+    async def asyncTearDown(self):
+        await asyncio.gather(*refreshes.values())
+        await self.client.aclose()
+        await app.state.llm.aclose()
+        app.state.llm = app.state.cache = app.state.store = None
+        self.cache.close()
+        self.store.close()
+
+    def use_settings(self, **overrides):
+        app.state.llm = make_llm_client(self.fake_llm, **overrides)
+
+    async def lookup(self):
+        return await self.client.post(
+            "/api/requirements", json={"product_type": "toys", "market": "EU"}
+        )
+
+    async def test_fresh_answer(self):
+        self.use_settings()
+        first = await self.lookup()
+        second = await self.lookup()
+        self.assertNotIn("age", first.headers)
+        self.assertEqual(second.headers["age"], "0")
+        self.assertEqual(second.headers["x-revalidating"], "false")
+        self.assertEqual(self.fake_llm.state.calls, 1)
+        self.assertEqual(refreshes, {})
+
+    async def test_stale_answer_is_served_and_refreshed(self):
+        self.use_settings(cache_soft_ttl_seconds=0)
+        changed = CACHE_REFRESHES.value("changed")
+        await self.lookup()
+        self.fake_llm.state.content = UPDATED_CONTENT
+
+        # Concurrent stale hits share one refresh
+        responses = await asyncio.gather(self.lookup(), self.lookup())
+        for response in responses:
+            self.assertEqual(response.headers["x-revalidating"], "true")
+            self.assertEqual(response.json()["summary"], json.loads(DEFAULT_CONTENT)["summary"])
+        self.assertEqual(len(refreshes), 1)
+        await asyncio.gather(*refreshes.values())
+
+        self.assertEqual(self.fake_llm.state.calls, 2)
+        self.assertEqual((await self.lookup()).json()["summary"], "Updated.")
+        self.assertEqual(CACHE_REFRESHES.value("changed"), changed + 1)
+
+        response = await self.client.get("/api/store/changes", params={"market": "eu"})
+        [change] = response.json()["changes"]
+        self.assertEqual(change["added"], ["EN 71-1"])
+        self.assertEqual(change["removed"], [])
+
+    async def test_failed_refresh_keeps_stale_answer(self):
+        self.use_settings(cache_soft_ttl_seconds=0, llm_max_retries=0)
+        await self.lookup()
+        self.fake_llm.state.failures = [(400, {})]
+        await self.lookup()
+        await asyncio.gather(*refreshes.values())
+
+        response = await self.lookup()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["x-revalidating"], "true")
+        self.assertEqual(self.store.changes(), [])
+
+    async def test_hard_ttl_per_market(self):
+        self.use_settings(cache_market_ttls={"EU": {"ttl_seconds": 0}})
+        await self.lookup()
+        response = await self.lookup()
+        self.assertNotIn("age", response.headers)
+        self.assertEqual(self.fake_llm.state.calls, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+# Test near-duplicate matching of product descriptions
+import os
+import tempfile
+import time
+import unittest
+
+from fastapi.testclient import TestClient
+
+from app.main import answer_variant, app
+from app.similarity import NgramIndex, char_ngrams
+from app.store import RequirementStore
+from tests.fake_llm import create_fake_llm_app, make_llm_client
+from tests.test_store import battery_response
+
+PRODUCTS = [
+    "fitness band with lithium battery",
+    "smartphone",
+    "electric scooter",
+    "electric bicycle",
+    "wireless earbuds",
+    "hair dryer",
+    "toys",
+]
+
+
+class TestNgramIndex(unittest.TestCase):
+    """Test cases for NgramIndex."""
+
+    def setUp(self):
+        self.index = NgramIndex()
+        for product in PRODUCTS:
+            self.index.add(product, product)
+
+    def test_rephrased_descriptions_match(self):
+        for query, expected in [
+            ("Lithium battery fitness bands", "fitness band with lithium battery"),
+            ("smartphones", "smartphone"),
+            ("wireless ear buds", "wireless earbuds"),
+            ("toy", "toys"),
+        ]:
+            key, score = self.index.search(query)[0]
+            self.assertEqual(key, expected)
+            self.assertGreater(score, 0.8, query)
+
+    def test_different_products_score_low(self):
+        key, score = self.index.search("electric bike")[0]
+        self.assertLess(score, 0.8)
+        self.assertLess(self.index.search("drone")[0][1], 0.5)
+        self.assertEqual(self.index.search("xyz"), [])
+        self.assertEqual(self.index.search("the"), [])
+
+    def test_stop_words_and_plurals_are_ignored(self):
+        self.assertEqual(
+            char_ngrams("batteries for the toys"), char_ngrams("toy battery")
+        )
+
+    def test_scores_do_not_exceed_one(self):
+        for product in PRODUCTS:
+            self.assertLessEqual(self.index.search(product)[0][1], 1.0)
+
+    def test_remove(self):
+        self.index.remove("smartphone")
+        self.assertNotIn("smartphone", [key for key, _ in self.index.search("smartphone", 5)])
+        self.assertEqual(len(self.index), len(PRODUCTS) - 1)
+
+
+class TestSimilarAnswers(unittest.TestCase):
+    """Stored answers are reused for similarly described products."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "store.sqlite3")
+        self.store = RequirementStore(self.path)
+        self.store.save(battery_response("EU"))
+
+    def tearDown(self):
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def test_threshold_market_and_age(self):
+        result, score = self.store.find_similar(
+            "fitness bands", "eu", threshold=0.8, max_age=60
+        )
+        self.assertEqual(result.product_type, "Fitness band")
+        self.assertGreater(score, 0.9)
+
+        self.assertIsNone(self.store.find_similar("fitness band", "US", 0.5, 60))
+        self.assertIsNone(self.store.find_similar("kids bicycle", "EU", 0.8, 60))
+        time.sleep(0.01)
+        self.assertIsNone(self.store.find_similar("fitness band", "EU", 0.8, 0))
+
+    def test_only_the_same_variant_matches(self):
+        self.store.save(battery_response("US"), "detailed")
+        self.assertIsNone(self.store.find_similar("fitness bands", "EU", 0.8, 60, "detailed"))
+        self.assertIsNone(self.store.find_similar("fitness bands", "US", 0.8, 60))
+        self.assertIsNotNone(self.store.find_similar("fitness bands", "US", 0.8, 60, "detailed"))
+
+    def test_index_is_rebuilt_on_open(self):
+        self.store.close()
+        self.store = RequirementStore(self.path)
+        self.assertIsNotNone(self.store.find_similar("fitness bands", "EU", 0.8, 60))
+
+    def test_endpoint_reuses_and_bypasses(self):
+        fake_llm = create_fake_llm_app()
+        app.state.llm = make_llm_client(fake_llm)
+        app.state.cache = None
+        app.state.store = self.store
+        self.store.save(battery_response("EU"), answer_variant(False, app.state.llm.settings))
+        self.addCleanup(setattr, app.state, "store", None)
+        self.addCleanup(setattr, app.state, "llm", None)
+        client = TestClient(app)
+
+        request = {"product_type": "fitness bands", "market": "EU"}
+        data = client.post("/api/requirements", json=request).json()
+        self.assertEqual(data["product_type"], "fitness bands")
+        self.assertEqual(data["matched_product_type"], "Fitness band")
+        self.assertEqual(data["requirements"][0]["name"], "UN 38.3")
+        self.assertEqual(fake_llm.state.calls, 0)
+
+        data = client.post(
+            "/api/requirements", json={**request, "allow_similar": False}
+        ).json()
+        self.assertIsNone(data["matched_product_type"])
+        self.assertEqual(data["requirements"][0]["name"], "CE Marking")
+        self.assertEqual(fake_llm.state.calls, 1)
+
+    def test_endpoint_needs_the_same_detail_model_and_prompt(self):
+        fake_llm = create_fake_llm_app()
+        app.state.llm = make_llm_client(fake_llm)
+        app.state.cache = None
+        app.state.store = self.store
+        self.addCleanup(setattr, app.state, "store", None)
+        self.addCleanup(setattr, app.state, "llm", None)
+        client = TestClient(app)
+        request = {"product_type": "toys", "market": "EU"}
+
+        self.assertIsNone(client.post("/api/requirements", json=request).json()["similarity"])
+        data = client.post("/api/requirements", json={**request, "detailed": True}).json()
+        self.assertIsNone(data["similarity"])
+        self.assertEqual(fake_llm.state.calls, 2)
+
+        app.state.llm = make_llm_client(fake_llm, model="other-model")
+        client.post("/api/requirements", json=request)
+        self.assertEqual(fake_llm.state.calls, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+# Test request coalescing
+import asyncio
+import unittest
+
+import httpx
+
+from app.main import app
+from app.singleflight import SingleFlight
+from tests.fake_llm import create_fake_llm_app, make_llm_client
+
+
+class TestSingleFlight(unittest.IsolatedAsyncioTestCase):
+    """Test cases for SingleFlight."""
+
+    async def asyncSetUp(self):
+        self.flights = SingleFlight()
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def slow_call(self):
+        self.calls += 1
+        await self.release.wait()
+        return "result"
+
+    async def failing_call(self):
+        self.calls += 1
+        await self.release.wait()
+        raise ValueError("upstream failed")
+
+    async def test_concurrent_callers_share_one_call(self):
+        tasks = [
+            asyncio.create_task(self.flights.do("k", self.slow_call)) for _ in range(5)
+        ]
+        await asyncio.sleep(0)
+        self.release.set()
+        results = await asyncio.gather(*tasks)
+
+        self.assertEqual(results, ["result"] * 5)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.flights.stats, {"leaders": 1, "followers": 4})
+        self.assertEqual(self.flights.in_flight(), 0)
+
+    async def test_errors_reach_every_caller(self):
+        tasks = [
+            asyncio.create_task(self.flights.do("k", self.failing_call))
+            for _ in range(3)
+        ]
+        await asyncio.sleep(0)
+        self.release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        self.assertEqual(self.calls, 1)
+        for result in results:
+            self.assertIsInstance(result, ValueError)
+
+    async def test_leader_cancellation_does_not_affect_followers(self):
+        leader = asyncio.create_task(self.flights.do("k", self.slow_call))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(self.flights.do("k", self.slow_call))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        await asyncio.sleep(0)
+        self.release.set()
+
+        self.assertEqual(await follower, "result")
+        self.assertTrue(leader.cancelled())
+        self.assertEqual(self.calls, 1)
+
+    async def test_last_waiter_cancels_upstream_call(self):
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def call():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        task = asyncio.create_task(self.flights.do("k", call))
+        await started.wait()
+        task.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        self.assertEqual(self.flights.in_flight(), 0)
+
+
+class TestCoalescedRequirements(unittest.IsolatedAsyncioTestCase):
+    """Identical concurrent requests hit the upstream API once."""
+
+    async def asyncTearDown(self):
+        app.state.llm = None
+
+    async def test_identical_requests_share_upstream_call(self):
+        fake_llm = create_fake_llm_app(latency=0.1)
+        app.state.llm = make_llm_client(fake_llm)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = await asyncio.gather(
+                *[
+                    client.post(
+                        "/api/requirements",
+                        json={"product_type": name, "market": "EU"},
+                    )
+                    for name in ["toys", "Toys", "toys ", "TOYS"]
+                ]
+            )
+
+        self.assertEqual(fake_llm.state.calls, 1)
+        self.assertEqual(
+            [r.json()["product_type"] for r in responses],
+            ["toys", "Toys", "toys ", "TOYS"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
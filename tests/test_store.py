@@ -0,0 +1,193 @@
+# Test the normalized requirement store and its search endpoint
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models import MarketRequirementsResponse
+from app.store import SCHEMA, RequirementStore, fts_query
+from tests.fake_llm import create_fake_llm_app, make_llm_client
+
+
+def battery_response(market="EU", summary="Battery rules."):
+    return MarketRequirementsResponse(
+        product_type="Fitness band",
+        market=market,
+        requirements=[
+            {
+                "name": "UN 38.3",
+                "description": "Transport testing for lithium batteries",
+                "category": "Testing",
+            },
+            {
+                "name": "CE Marking",
+                "description": "Conformity marking under the Radio Equipment Directive",
+                "category": "Certification",
+                "source": "https://ec.europa.eu",
+            },
+        ],
+        summary=summary,
+    )
+
+
+class TestRequirementStore(unittest.TestCase):
+    """Test cases for RequirementStore."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = RequirementStore(os.path.join(self.tmpdir.name, "store.sqlite3"))
+
+    def tearDown(self):
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def test_round_trip_with_normalized_lookup(self):
+        self.store.save(battery_response())
+        stored = self.store.get("  fitness BAND ", "eu")
+        self.assertEqual(stored, battery_response())
+        self.assertIsNone(self.store.get("fitness band", "US"))
+
+    def test_new_answer_replaces_previous(self):
+        self.store.save(battery_response())
+        self.store.save(
+            MarketRequirementsResponse(
+                product_type="fitness band",
+                market="EU",
+                requirements=[
+                    {"name": "RoHS", "description": "Hazardous substances", "category": "Safety"}
+                ],
+                summary="Updated.",
+            )
+        )
+        self.assertEqual(self.store.get("Fitness band", "EU").summary, "Updated.")
+        self.assertEqual(self.store.search(text="lithium"), [])
+        self.assertEqual([r.name for r in self.store.search(market="EU")], ["RoHS"])
+
+    def test_variants_are_kept_apart(self):
+        self.store.save(battery_response(summary="Concise."), "concise")
+        self.store.save(battery_response(summary="Detailed."), "detailed")
+        self.assertEqual(
+            self.store.get("fitness band", "EU", variant="concise").summary, "Concise."
+        )
+        self.assertEqual(
+            self.store.get("fitness band", "EU", variant="detailed").summary, "Detailed."
+        )
+        self.assertIsNone(self.store.get("fitness band", "EU"))
+
+    def test_store_without_variants_is_upgraded(self):
+        path = os.path.join(self.tmpdir.name, "old.sqlite3")
+        db = sqlite3.connect(path)
+        db.executescript(
+            """
+            CREATE TABLE lookups (
+                id INTEGER PRIMARY KEY, product_key TEXT NOT NULL, market_key TEXT NOT NULL,
+                product_type TEXT NOT NULL, market TEXT NOT NULL, summary TEXT NOT NULL,
+                fetched_at REAL NOT NULL, UNIQUE (product_key, market_key)
+            );
+            """
+            + SCHEMA
+            + """
+            INSERT INTO lookups VALUES (1, 'toys', 'eu', 'toys', 'EU', 'Old.', 0);
+            INSERT INTO requirements (lookup_id, position, name, description, category)
+            VALUES (1, 0, 'EN 71-1', 'Toy safety', 'Testing');
+            """
+        )
+        db.close()
+
+        store = RequirementStore(path)
+        self.addCleanup(store.close)
+        # Old answers stay searchable but are not served for any variant
+        self.assertEqual(store.get("toys", "EU").summary, "Old.")
+        self.assertIsNone(store.get("toys", "EU", variant="concise"))
+        self.assertEqual([r.name for r in store.search(text="toy safety")], ["EN 71-1"])
+
+        store.save(battery_response(), "concise")
+        store.save(battery_response(), "detailed")
+        self.assertEqual(len(store.search(market="EU", category="Testing")), 3)
+
+    def test_search_filters(self):
+        self.store.save(battery_response("EU"))
+        self.store.save(battery_response("US"))
+
+        by_market = self.store.search(market="us")
+        self.assertEqual({r.market for r in by_market}, {"US"})
+        self.assertEqual(len(by_market), 2)
+
+        by_category = self.store.search(category="testing")
+        self.assertEqual({r.name for r in by_category}, {"UN 38.3"})
+        self.assertEqual(len(by_category), 2)
+
+        by_text = self.store.search(text="UN 38.3", market="EU")
+        self.assertEqual([(r.name, r.market) for r in by_text], [("UN 38.3", "EU")])
+        self.assertEqual(len(self.store.search(text="radio equip")), 2)
+        self.assertEqual(self.store.search(text="lithium", category="Certification"), [])
+        self.assertEqual(len(self.store.search(limit=3)), 3)
+
+    def test_query_syntax_is_escaped(self):
+        self.assertEqual(fts_query('EN 71-1 "toys'), '"EN" "71-1" """toys"*')
+        self.store.save(battery_response())
+        self.assertEqual(self.store.search(text='AND OR ( "'), [])
+
+
+class TestStoreEndpoints(unittest.TestCase):
+    """Answers are stored and searchable without another LLM call."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.fake_llm = create_fake_llm_app()
+        app.state.llm = make_llm_client(self.fake_llm)
+        app.state.cache = None
+        app.state.store = RequirementStore(os.path.join(self.tmpdir.name, "store.sqlite3"))
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        app.state.store.close()
+        app.state.store = None
+        app.state.llm = None
+        self.tmpdir.cleanup()
+
+    def test_answers_are_searchable(self):
+        response = self.client.post(
+            "/api/requirements", json={"product_type": "toys", "market": "EU"}
+        )
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(
+            "/api/store/requirements", params={"market": "eu", "q": "conformity"}
+        )
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([r["name"] for r in results], ["CE Marking"])
+        self.assertEqual(results[0]["product_type"], "toys")
+
+        response = self.client.get(
+            "/api/store/lookup", params={"product_type": "Toys", "market": "EU"}
+        )
+        self.assertEqual(
+            response.json()["summary"], "Toys sold in the EU must carry the CE marking."
+        )
+        self.assertEqual(response.json()["requirements"][0]["name"], "CE Marking")
+        self.assertEqual(self.fake_llm.state.calls, 1)
+
+    def test_expired_lookup(self):
+        self.client.post("/api/requirements", json={"product_type": "toys", "market": "EU"})
+        app.state.llm = make_llm_client(
+            self.fake_llm, cache_market_ttls={"EU": {"ttl_seconds": 0}}
+        )
+        response = self.client.get(
+            "/api/store/lookup", params={"product_type": "toys", "market": "EU"}
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_unknown_lookup(self):
+        response = self.client.get(
+            "/api/store/lookup", params={"product_type": "toys", "market": "Mars"}
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
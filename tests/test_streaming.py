@@ -0,0 +1,122 @@
+# Test incremental parsing and the streaming requirements endpoint
+import json
+import unittest
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.utils import IncrementalRequirementsParser
+from tests.fake_llm import create_fake_llm_app, make_llm_client
+
+REQUIREMENTS = [
+    {
+        "name": "INMETRO Certification",
+        "description": 'Covers toys with "small parts" {and} [brackets]',
+        "category": "Certification",
+        "source": "https://www.gov.br/inmetro",
+    },
+    {
+        "name": "Labeling Requirements",
+        "description": "Labels in Portuguese\\nwith escaped \\\"quotes\\\"",
+        "category": "Labeling",
+        "source": None,
+    },
+    {
+        "name": "ANATEL Homologation",
+        "description": "Radio toys need ANATEL approval.",
+        "category": "Certification",
+        "source": "https://www.anatel.gov.br",
+    },
+]
+
+MARKDOWN_CONTENT = (
+    "Here is what I found:\n\n```json\n"
+    + json.dumps(
+        {"requirements": REQUIREMENTS, "summary": "Toys need INMETRO."}, indent=4
+    )
+    + "\n```\n\nConsult a local expert."
+)
+
+
+class TestIncrementalRequirementsParser(unittest.TestCase):
+    """Test cases for IncrementalRequirementsParser."""
+
+    def parse_in_chunks(self, content, size):
+        parser = IncrementalRequirementsParser()
+        found = []
+        for i in range(0, len(content), size):
+            found.extend(parser.feed(content[i : i + size]))
+        return parser, found
+
+    def test_requirements_are_emitted_for_any_chunking(self):
+        for size in (1, 7, 64, len(MARKDOWN_CONTENT)):
+            parser, found = self.parse_in_chunks(MARKDOWN_CONTENT, size)
+            self.assertEqual(found, REQUIREMENTS, f"chunk size {size}")
+            self.assertEqual(parser.content, MARKDOWN_CONTENT)
+
+    def test_requirement_is_emitted_before_stream_ends(self):
+        content = json.dumps({"requirements": REQUIREMENTS, "summary": "s"})
+        first_end = content.index('inmetro"}') + len('inmetro"}')
+        parser = IncrementalRequirementsParser()
+        self.assertEqual(parser.feed(content[:first_end]), [REQUIREMENTS[0]])
+
+    def test_other_arrays_are_ignored(self):
+        content = json.dumps(
+            {"sources": [{"name": "x"}], "requirements": REQUIREMENTS[:1], "summary": "s"}
+        )
+        _, found = self.parse_in_chunks(content, 5)
+        self.assertEqual(found, REQUIREMENTS[:1])
+
+    def test_braces_in_prose_before_the_answer_are_skipped(self):
+        content = (
+            'Per Annex {II} and {"note": "draft"} see [1].\n\n'
+            + MARKDOWN_CONTENT
+        )
+        for size in (1, 7, len(content)):
+            _, found = self.parse_in_chunks(content, size)
+            self.assertEqual(found, REQUIREMENTS, f"chunk size {size}")
+
+
+class TestStreamingEndpoint(unittest.TestCase):
+    """Test cases for /api/requirements/stream."""
+
+    def setUp(self):
+        content = json.dumps({"requirements": REQUIREMENTS, "summary": "Toys need INMETRO."})
+        self.fake_llm = create_fake_llm_app(content=content, chunk_size=16)
+        app.state.llm = make_llm_client(self.fake_llm)
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        app.state.llm = None
+
+    def read_events(self):
+        response = self.client.post(
+            "/api/requirements/stream",
+            json={"product_type": "toys", "market": "Brazil"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+        return [json.loads(line) for line in response.text.splitlines()]
+
+    def test_events_are_streamed_in_order(self):
+        events = self.read_events()
+
+        self.assertEqual(
+            [event["type"] for event in events],
+            ["requirement"] * len(REQUIREMENTS) + ["summary", "done"],
+        )
+        self.assertEqual(events[0]["data"]["name"], "INMETRO Certification")
+        self.assertEqual(events[-2]["data"], "Toys need INMETRO.")
+        done = events[-1]
+        self.assertEqual(done["response"]["market"], "Brazil")
+        self.assertLessEqual(done["time_to_first_requirement"], done["total_time"])
+
+    def test_parse_failure_is_reported(self):
+        self.fake_llm.state.content = "I could not find anything."
+        events = self.read_events()
+        self.assertEqual(events[-1]["type"], "error")
+        self.assertIn("JSON parsing error", events[-1]["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
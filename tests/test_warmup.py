@@ -0,0 +1,109 @@
+# Test the cache warm-up command
+import os
+import tempfile
+import unittest
+
+from app.cache import ResponseCache
+from app.main import answer_variant, cache_key_for
+from app.store import RequirementStore
+from app.warmup import load_matrix, warm_up
+from tests.fake_llm import create_fake_llm_app, make_llm_client
+
+
+class TestLoadMatrix(unittest.TestCase):
+    """Test cases for load_matrix."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def write(self, name, text):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "w") as file:
+            file.write(text)
+        return path
+
+    def test_csv(self):
+        path = self.write(
+            "matrix.csv", "product_type,market,detailed\ntoys,EU,\nphones,US,true\ntoys,EU,\n"
+        )
+        requests = load_matrix(path)
+        self.assertEqual(
+            [(r.product_type, r.market, r.detailed) for r in requests],
+            [("toys", "EU", False), ("phones", "US", True)],
+        )
+
+    def test_yaml_cross_product_and_items(self):
+        path = self.write(
+            "matrix.yaml",
+            "product_types: [toys, phones]\nmarkets: [EU, US]\n"
+            "items:\n  - {product_type: drones, market: Japan}\n",
+        )
+        requests = load_matrix(path, detailed=True)
+        self.assertEqual(len(requests), 5)
+        self.assertEqual(requests[0].product_type, "drones")
+        self.assertTrue(all(r.detailed for r in requests))
+
+
+class TestWarmUp(unittest.IsolatedAsyncioTestCase):
+    """Test cases for warm_up."""
+
+    async def asyncSetUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.cache = ResponseCache(os.path.join(self.tmpdir.name, "cache.sqlite3"), 60)
+        self.store = RequirementStore(os.path.join(self.tmpdir.name, "store.sqlite3"))
+        self.addCleanup(self.cache.close)
+        self.addCleanup(self.store.close)
+        self.checkpoint = os.path.join(self.tmpdir.name, "warmup.checkpoint")
+        self.fake_llm = create_fake_llm_app(latency=0.05)
+        self.client = make_llm_client(self.fake_llm, llm_backoff_base=0.01)
+        path = os.path.join(self.tmpdir.name, "matrix.yaml")
+        with open(path, "w") as file:
+            file.write("product_types: [toys, phones, drones]\nmarkets: [EU, US]\n")
+        self.requests = load_matrix(path)
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    async def test_results_are_cached_and_stored(self):
+        report = await warm_up(
+            self.requests, self.client, self.cache, self.store, 3, self.checkpoint
+        )
+
+        self.assertEqual((report.succeeded, report.skipped, report.failures), (6, 0, {}))
+        self.assertEqual(self.fake_llm.state.peak_in_flight, 3)
+        self.assertEqual(report.prompt_tokens, 600)
+        self.assertEqual(report.completion_tokens, 300)
+        self.assertGreater(report.lookups_per_minute, 0)
+        self.assertIn("Throughput", report.format())
+
+        key = cache_key_for(self.requests[0], self.client.settings)
+        self.assertIsNotNone(self.cache.get(key))
+        variant = answer_variant(False, self.client.settings)
+        self.assertIsNotNone(self.store.get("drones", "US", variant=variant))
+
+    async def test_resume_from_checkpoint(self):
+        # Two pairs fail the first time and are retried by the next run
+        self.fake_llm.state.failures = [(400, {}), (400, {})]
+        report = await warm_up(
+            self.requests, self.client, None, self.store, 1, self.checkpoint
+        )
+        self.assertEqual((report.succeeded, len(report.failures)), (4, 2))
+
+        report = await warm_up(
+            self.requests, self.client, None, self.store, 1, self.checkpoint
+        )
+        self.assertEqual((report.succeeded, report.skipped, report.failures), (2, 4, {}))
+        self.assertEqual(self.fake_llm.state.calls, 8)
+
+        # A complete run removes the checkpoint, so the next run starts afresh
+        self.assertFalse(os.path.exists(self.checkpoint))
+        report = await warm_up(
+            self.requests, self.client, None, self.store, 1, self.checkpoint
+        )
+        self.assertEqual((report.succeeded, report.skipped), (6, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,346 @@
+# Test state shared by worker processes and their lifecycle
+import argparse
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from app.cache import ResponseCache
+from app.jobs import QUEUED, RUNNING, SUCCEEDED, JobQueue, JobStore
+from app.llm import LLMClient
+from app.main import app, cache_key_for, cached_answer, refreshes
+from app.metrics import STARTUP_SECONDS
+from app.models import MarketRequirementsRequest, MarketRequirementsResponse
+from app.ratelimit import SharedKeyedTokenBuckets, SharedTokenBucket
+from benchmarks.load_test import run_load, scenario_contents
+from tests.fake_llm import make_settings
+
+
+def sample_request(market="EU"):
+    return MarketRequirementsRequest(product_type="toys", market=market)
+
+
+def sample_answer(summary):
+    return MarketRequirementsResponse(
+        product_type="toys", market="EU", requirements=[], summary=summary
+    )
+
+
+class TestSharedTokenBucket(unittest.IsolatedAsyncioTestCase):
+    """Buckets opened on the same file draw from one budget."""
+
+    async def asyncSetUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, "ratelimit.sqlite3")
+
+    def open_bucket(self, limit=60):
+        bucket = SharedTokenBucket.per_minute(self.path, "requests", limit)
+        self.addCleanup(bucket.close)
+        return bucket
+
+    async def test_budget_is_shared(self):
+        first, second = self.open_bucket(), self.open_bucket()
+        self.assertEqual(await first.acquire(60), 0)
+        # One token refills every second, which exceeds the allowed wait
+        with self.assertRaises(asyncio.TimeoutError):
+            await second.acquire(1, max_wait=0.5)
+        second.adjust(-2)
+        self.assertEqual(await first.acquire(1, max_wait=0.5), 0)
+
+    async def test_reservations_queue_behind_each_other(self):
+        first, second = self.open_bucket(600), self.open_bucket(600)
+        await first.acquire(600)
+        # Ten tokens per second: the second caller waits behind the first
+        waits = [first._take(1), second._take(1)]
+        self.assertAlmostEqual(waits[0], 0.1, delta=0.02)
+        self.assertAlmostEqual(waits[1], 0.2, delta=0.02)
+
+    async def test_locked_file_does_not_block_the_event_loop(self):
+        bucket = self.open_bucket()
+        other = sqlite3.connect(self.path, isolation_level=None)
+        self.addCleanup(other.close)
+        other.execute("BEGIN IMMEDIATE")
+
+        acquire = asyncio.create_task(bucket.acquire(1))
+        start = asyncio.get_running_loop().time()
+        await asyncio.sleep(0.2)
+        self.assertLess(asyncio.get_running_loop().time() - start, 0.3)
+        self.assertFalse(acquire.done())
+
+        other.execute("COMMIT")
+        self.assertEqual(await asyncio.wait_for(acquire, 5), 0)
+
+    async def test_client_uses_shared_bucket(self):
+        client = LLMClient(
+            make_settings(llm_requests_per_minute=60, rate_limit_path=self.path)
+        )
+        self.assertIsInstance(client._request_bucket, SharedTokenBucket)
+        self.assertIsNone(client._token_bucket)
+        await client.aclose()
+
+    async def test_own_limit_leaves_shared_bucket_alone(self):
+        settings = make_settings(llm_requests_per_minute=60, rate_limit_path=self.path)
+        server = LLMClient(settings)
+        warmup = LLMClient(settings, requests_per_minute=6)
+        self.addAsyncCleanup(server.aclose)
+        self.addAsyncCleanup(warmup.aclose)
+
+        self.assertEqual(warmup._request_bucket.capacity, 60)
+        self.assertEqual(warmup._own_bucket.capacity, 6)
+        for _ in range(6):
+            await warmup._acquire_quota(0, max_wait=0)
+        with self.assertRaises(asyncio.TimeoutError):
+            await warmup._acquire_quota(0, max_wait=1)
+        # The server still has the rest of the shared minute
+        await server._acquire_quota(0, max_wait=0)
+        self.assertIsNone(server._own_bucket)
+
+
+class TestSharedKeyedTokenBuckets(unittest.TestCase):
+    """Per-client buckets opened on the same file are shared."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, "ratelimit.sqlite3")
+
+    def open_buckets(self):
+        buckets = SharedKeyedTokenBuckets(self.path)
+        self.addCleanup(buckets.close)
+        return buckets
+
+    def count_rows(self):
+        with sqlite3.connect(self.path) as db:
+            return db.execute("SELECT COUNT(*) FROM keyed_buckets").fetchone()[0]
+
+    def test_balance_is_shared(self):
+        first, second = self.open_buckets(), self.open_buckets()
+        self.assertEqual(first.take("a", 1.0, 2), 0)
+        self.assertEqual(second.take("a", 1.0, 2), 0)
+        self.assertAlmostEqual(first.take("a", 1.0, 2), 1.0, delta=0.05)
+        # Rejected takes leave the balance alone
+        self.assertAlmostEqual(second.take("a", 1.0, 2), 1.0, delta=0.05)
+        self.assertEqual(second.take("b", 1.0, 2), 0)
+
+    def test_large_amounts_are_charged_in_full(self):
+        buckets = self.open_buckets()
+        self.assertEqual(buckets.take("a", 1.0, 10, amount=25), 0)
+        self.assertAlmostEqual(buckets.take("a", 1.0, 10), 16.0, delta=0.05)
+
+    def test_full_buckets_are_forgotten(self):
+        buckets = self.open_buckets()
+        buckets.take("a", 1000.0, 2)
+        self.assertEqual(self.count_rows(), 1)
+        time.sleep(0.01)
+        buckets.take("b", 1000.0, 2)
+        self.assertEqual(self.count_rows(), 1)
+
+
+class TestSharedJobStore(unittest.IsolatedAsyncioTestCase):
+    """Several processes can share one job file."""
+
+    async def asyncSetUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, "jobs.sqlite3")
+        self.store = JobStore(self.path, result_ttl_seconds=60)
+        self.addCleanup(self.store.close)
+
+    def set_owner(self, job_id, pid):
+        with sqlite3.connect(self.path) as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, owner = ? WHERE id = ?", (RUNNING, pid, job_id)
+            )
+
+    async def test_job_is_claimed_once(self):
+        other = JobStore(self.path, result_ttl_seconds=60)
+        self.addCleanup(other.close)
+        job = self.store.create(sample_request())
+        self.assertIsNotNone(other.mark_running(job.job_id))
+        self.assertIsNone(self.store.mark_running(job.job_id))
+
+    async def test_only_jobs_of_exited_processes_are_requeued(self):
+        live = self.store.create(sample_request("EU"))
+        orphaned = self.store.create(sample_request("US"))
+        # The parent process is alive; our own PID stands for an earlier process
+        self.set_owner(live.job_id, os.getppid())
+        self.set_owner(orphaned.job_id, os.getpid())
+
+        unfinished = self.store.unfinished()
+
+        self.assertEqual([job.job_id for job in unfinished], [orphaned.job_id])
+        self.assertEqual(self.store.get(live.job_id).status, RUNNING)
+        self.assertEqual(self.store.get(orphaned.job_id).status, QUEUED)
+
+    async def test_stop_drains_running_jobs(self):
+        async def run(request):
+            await asyncio.sleep(0.2)
+            return MarketRequirementsResponse(
+                product_type=request.product_type,
+                market=request.market,
+                requirements=[],
+                summary="done",
+            )
+
+        jobs = JobQueue(self.store, run, workers=1)
+        jobs.start()
+        running = await jobs.submit(sample_request("EU"))
+        waiting = await jobs.submit(sample_request("US"))
+        await asyncio.sleep(0.05)
+        await jobs.stop(timeout=5)
+
+        self.assertEqual(self.store.get(running.job_id).status, SUCCEEDED)
+        # Not started before shutdown, so left for the next start
+        self.assertEqual(self.store.get(waiting.job_id).status, QUEUED)
+
+    async def test_wait_sees_jobs_finished_elsewhere(self):
+        jobs = JobQueue(self.store, None, workers=0, poll_interval=0.05)
+        job = self.store.create(sample_request())
+        other = JobStore(self.path, result_ttl_seconds=60)
+        self.addCleanup(other.close)
+
+        async def finish_elsewhere():
+            await asyncio.sleep(0.1)
+            other.mark_running(job.job_id)
+            other.mark_finished(job.job_id, error="failed elsewhere")
+
+        finisher = asyncio.create_task(finish_elsewhere())
+        result = await jobs.wait(job.job_id, timeout=5)
+        await finisher
+        self.assertEqual(result.error, "failed elsewhere")
+
+    async def test_locked_file_does_not_block_the_event_loop(self):
+        jobs = JobQueue(self.store, None, workers=0)
+        other = sqlite3.connect(self.path, isolation_level=None)
+        self.addCleanup(other.close)
+        other.execute("BEGIN IMMEDIATE")
+
+        submit = asyncio.create_task(jobs.submit(sample_request()))
+        start = asyncio.get_running_loop().time()
+        await asyncio.sleep(0.2)
+        self.assertLess(asyncio.get_running_loop().time() - start, 0.3)
+        self.assertFalse(submit.done())
+
+        other.execute("COMMIT")
+        job = await asyncio.wait_for(submit, 5)
+        self.assertEqual(self.store.get(job.job_id).status, QUEUED)
+
+
+class TestSharedResponseCache(unittest.IsolatedAsyncioTestCase):
+    """Several processes can share one cache file."""
+
+    async def asyncSetUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, "cache.sqlite3")
+
+    def open_cache(self):
+        cache = ResponseCache(self.path, ttl_seconds=3600)
+        self.addCleanup(cache.close)
+        return cache
+
+    async def test_locked_file_does_not_block_the_event_loop(self):
+        cache = self.open_cache()
+        other = sqlite3.connect(self.path, isolation_level=None)
+        self.addCleanup(other.close)
+        other.execute("BEGIN IMMEDIATE")
+
+        write = asyncio.create_task(cache.aset("k", sample_answer("done")))
+        start = asyncio.get_running_loop().time()
+        await asyncio.sleep(0.2)
+        self.assertLess(asyncio.get_running_loop().time() - start, 0.3)
+        self.assertFalse(write.done())
+        # The memory tier already has the answer
+        self.assertEqual((await cache.aget_with_age("k"))[0].summary, "done")
+
+        other.execute("COMMIT")
+        await asyncio.wait_for(write, 5)
+        self.assertEqual(self.open_cache().get("k").summary, "done")
+
+    async def test_answer_refreshed_by_another_process_is_used(self):
+        first, second = self.open_cache(), self.open_cache()
+        first.set("k", sample_answer("old"))
+        self.assertEqual(second.get("k").summary, "old")
+        await asyncio.sleep(0.01)
+        first.set("k", sample_answer("new"))
+
+        # Each process remembers its own copy until asked to compare
+        self.assertEqual(second.get("k").summary, "old")
+        self.assertEqual(second.get_with_age("k", recheck_age=3600)[0].summary, "old")
+        entry = await second.aget_with_age("k", recheck_age=0)
+        self.assertEqual(entry[0].summary, "new")
+        self.assertEqual(second.get("k").summary, "new")
+
+    async def test_stale_answer_refreshed_elsewhere_is_not_refreshed_again(self):
+        settings = make_settings(cache_soft_ttl_seconds=60)
+        request = sample_request()
+        key = cache_key_for(request, settings)
+        first, second = self.open_cache(), self.open_cache()
+        # This process remembers an answer past the soft TTL, which another
+        # process has since replaced
+        with second._lock:
+            second._remember(key, time.time() - 120, sample_answer("old"))
+        first.set(key, sample_answer("new"))
+
+        answer, age, revalidating = await cached_answer(None, settings, request, second)
+
+        self.assertEqual(answer.summary, "new")
+        self.assertLess(age, 60)
+        self.assertFalse(revalidating)
+        self.assertNotIn(key, refreshes)
+
+
+
+@unittest.skipUnless((os.cpu_count() or 1) >= 2, "needs at least two CPUs")
+class TestWorkerScaling(unittest.TestCase):
+    """Throughput grows with the number of worker processes."""
+
+    def run_load(self, workers):
+        args = argparse.Namespace(
+            requests=200,
+            concurrency=[32],
+            latency=0.0,
+            workers=workers,
+            upstream_concurrency=32,
+            model="gpt-4o-search-preview",
+            cache=False,
+        )
+        contents = {"bare json": scenario_contents(20)["bare json"]}
+        return asyncio.run(run_load(args, contents))
+
+    def test_two_workers_serve_more_requests(self):
+        single = self.run_load(1)
+        double = self.run_load(2)
+        self.assertGreater(single["startup_seconds"], 0)
+        self.assertGreater(
+            double["scenarios"]["bare json"][0]["rps"],
+            1.3 * single["scenarios"]["bare json"][0]["rps"],
+        )
+
+
+class TestStartupTime(unittest.TestCase):
+    """The lifespan records how long startup took."""
+
+    def test_gauge_is_set(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            config_path = os.path.join(tmpdir, "config.yaml")
+            with open(config_path, "w") as file:
+                file.write(
+                    'openai_api_key: "sk-test"\ncache_enabled: false\nstore_enabled: false\n'
+                    f'job_store_path: "{os.path.join(tmpdir, "jobs.sqlite3")}"\n'
+                    "shutdown_timeout: 1\n"
+                )
+            with mock.patch.dict(os.environ, {"CONFIG_PATH": config_path}):
+                with TestClient(app):
+                    pass
+        self.assertGreater(STARTUP_SECONDS.value(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
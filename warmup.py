@@ -0,0 +1,14 @@
+"""
+Warm-up script precomputing answers for a product/market matrix.
+
+Usage:
+
+    python3 warmup.py matrix.yaml --concurrency 4 --requests-per-minute 60
+"""
+
+import sys
+
+from app.warmup import main
+
+if __name__ == "__main__":
+    sys.exit(main())
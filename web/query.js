@@ -1,75 +1,22 @@
 // Query handling for GMA Intelligent Qualification Query System
 
-// Sample data for demo purposes
-const sampleQueries = {
-  'fitness band with lithium battery': {
-    eu: {
-      title: "European Union Market Access Requirements (Wearable Device with Lithium Battery)",
-      content: `
-## Mandatory Certifications
-- **CE Marking** required under multiple directives:
-  - Radio Equipment Directive (RED) 2014/53/EU
-  - Low Voltage Directive (LVD) 2014/35/EU 
-  - Electromagnetic Compatibility (EMC) Directive 2014/30/EU
-  - Restriction of Hazardous Substances (RoHS) Directive 2011/65/EU
+// Sample data for demo purposes, fetched on first use so it stays out of the
+// page's critical path. index.html passes its (content-hashed) URL.
+const sampleQueriesUrl = document.currentScript?.dataset.sampleQueries || '/static/sample-queries.json';
+let sampleQueries = null;
 
-## Battery Requirements
-- **IEC 62133-2:2017**: Safety requirements for portable sealed secondary lithium cells
-- **Battery Directive 2006/66/EC**: Requirements for registration, collection, and recycling
-- **UN 38.3**: Transport testing for lithium batteries
-
-## Health & Safety Testing
-- **EN 50566:2017**: Product standard to demonstrate compliance with RF fields from devices used near the human body
-- **Biocompatibility Testing**: For materials in direct skin contact (ISO 10993-5, ISO 10993-10)
-- **REACH Regulation (EC 1907/2006)**: Registration, Evaluation, Authorization of Chemicals
-
-## Declaration Process
-1. Perform conformity assessment and testing with notified body
-2. Prepare technical documentation including test reports
-3. Issue Declaration of Conformity (DoC)
-4. Affix CE marking to product
-
-## Packaging & Labeling
-- CE mark must be at least 5mm in height
-- Battery disposal information
-- WEEE symbol for electronic waste
-
-❗ **Important Update**: Starting January 1, 2024, new requirements under Regulation (EU) 2023/648 will impose additional phthalate restrictions for wearable devices
-      `
-    },
-    us: {
-      title: "United States Market Access Requirements (Wearable Device with Lithium Battery)",
-      content: `
-## FCC Certification
-- **FCC Part 15**: For wireless devices (Bluetooth, Wi-Fi)
-  - Equipment authorization required
-  - Subpart B for unintentional radiators
-  - Subpart C for intentional radiators
-
-## Battery Safety
-- **UL 1642**: Standard for Lithium Batteries
-- **UN 38.3**: Transport testing for lithium batteries
-- **49 CFR 173.185**: DOT regulations for lithium battery shipping
-
-## Consumer Safety
-- **CPSC Compliance**: Consumer Product Safety Commission requirements
-- **Biocompatibility Testing**: For materials in direct skin contact
-- **California Proposition 65**: Warning requirements for chemicals
-
-## FDA Requirements
-- May require FDA registration if health claims are made
-- If collecting vital signs, may be considered a medical device under 21 CFR 880.6310
-
-## Import Requirements
-- **CBP Filing**: Customs and Border Protection documentation
-- **Country of Origin** marking required
-- **Harmonized Tariff Schedule** (HTS) classification
-
-❗ **Important Notice**: FCC has proposed new rules for IoT device security requirements, anticipated to be finalized by Q2 2024
-      `
-    }
+async function loadSampleQueries() {
+  if (!sampleQueries) {
+    sampleQueries = fetch(sampleQueriesUrl)
+      .then(response => response.json())
+      .catch(error => {
+        // Try again on the next query
+        sampleQueries = null;
+        throw error;
+      });
   }
-};
+  return sampleQueries;
+}
 
 function handleQuery() {
   const query = document.getElementById('query-input').value.trim();
@@ -88,12 +35,17 @@ function handleQuery() {
   queryButton.disabled = true;
   
   // Simulate API call with delay
-  setTimeout(() => {
+  setTimeout(async () => {
     const resultsSection = document.getElementById('results-section');
     const resultsContent = document.getElementById('results-content');
     
     // Process query - in a real system, this would call the backend API
-    const results = processQuery(query, market, certType);
+    let results = null;
+    try {
+      results = await processQuery(query, market, certType);
+    } catch (error) {
+      console.error('Error loading sample queries:', error);
+    }
     
     // In a production environment, you would call an actual API endpoint
     // fetch('/api/query', {
@@ -120,7 +72,7 @@ function handleQuery() {
   }, 1500);
 }
 
-function processQuery(query, market, certType) {
+async function processQuery(query, market, certType) {
   // This is a simplified mock implementation
   // In a real system, this would call the backend API
   
@@ -128,7 +80,7 @@ function processQuery(query, market, certType) {
   const normalizedQuery = query.toLowerCase();
   
   // Check if we have a matching sample query
-  for (const [sampleQuery, markets] of Object.entries(sampleQueries)) {
+  for (const [sampleQuery, markets] of Object.entries(await loadSampleQueries())) {
     if (normalizedQuery.includes(sampleQuery)) {
       // If a specific market is selected, return only that market
       if (market !== 'all' && markets[market]) {
@@ -155,12 +107,14 @@ function processQuery(query, market, certType) {
  * @param {string} productType - Type of product (e.g., "toys")
  * @param {string} market - Target market (e.g., "Brazil")
  * @param {boolean} detailed - Whether to request detailed information
+ * @param {Function} [onProgress] - Called with the partial data each time a requirement
+ *   arrives; when given, the streaming endpoint is used
  * @returns {Promise<Object>} - Promise resolving to the requirements data
  */
-async function fetchRegulationRequirements(productType, market, detailed = false) {
+async function fetchRegulationRequirements(productType, market, detailed = false, onProgress = null) {
   try {
     // Use relative URL for API endpoint
-    const apiUrl = '/api/requirements';
+    const apiUrl = onProgress ? '/api/requirements/stream' : '/api/requirements';
     
     // Prepare the request data
     const requestData = {
@@ -187,6 +141,10 @@ async function fetchRegulationRequirements(productType, market, detailed = false
       throw new Error(`API request failed: ${response.status} - ${errorText}`);
     }
     
+    if (onProgress) {
+      return await readRequirementsStream(response, productType, market, onProgress);
+    }
+    
     // Parse the JSON response
     const data = await response.json();
     console.log('Received regulation data:', data);
@@ -198,6 +156,56 @@ async function fetchRegulationRequirements(productType, market, detailed = false
   }
 }
 
+/**
+ * Reads the NDJSON event stream of /api/requirements/stream
+ * @param {Response} response - The fetch response
+ * @param {string} productType - Type of product
+ * @param {string} market - Target market
+ * @param {Function} onProgress - Called with the partial data after each event
+ * @returns {Promise<Object>} - Promise resolving to the complete requirements data
+ */
+async function readRequirementsStream(response, productType, market, onProgress) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  const partial = { product_type: productType, market: market, requirements: [], summary: '' };
+  let buffer = '';
+  let result = null;
+  
+  const handleEvent = (event) => {
+    if (event.type === 'requirement') {
+      partial.requirements.push(event.data);
+      onProgress(partial);
+    } else if (event.type === 'summary') {
+      partial.summary = event.data;
+      onProgress(partial);
+    } else if (event.type === 'done') {
+      console.log(`First requirement after ${event.time_to_first_requirement}s, total ${event.total_time}s`);
+      result = event.response;
+    } else if (event.type === 'error') {
+      throw new Error(event.error);
+    }
+  };
+  
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split('\n');
+    buffer = lines.pop();
+    lines.filter(line => line.trim()).forEach(line => handleEvent(JSON.parse(line)));
+  }
+  if (buffer.trim()) {
+    handleEvent(JSON.parse(buffer));
+  }
+  
+  if (!result) {
+    throw new Error('Requirements stream ended unexpectedly');
+  }
+  console.log('Received regulation data:', result);
+  return result;
+}
+
 /**
  * Display regulation requirements in the UI
  * @param {Object} data - The regulation requirements data
@@ -338,8 +346,24 @@ document.addEventListener('DOMContentLoaded', () => {
       searchButton.disabled = true;
       
       try {
-        // Call the API
-        const data = await fetchRegulationRequirements(productType, market, detailed);
+        // Render requirements as they stream in
+        let scrolled = false;
+        const onProgress = (partial) => {
+          document.getElementById('results-section').classList.remove('hidden');
+          displayRequirements({
+            ...partial,
+            summary: partial.summary || 'Generating summary...'
+          });
+          
+          if (!scrolled) {
+            document.getElementById('results-section').scrollIntoView({ behavior: 'smooth' });
+            scrolled = true;
+          }
+        };
+        
+        // Earlier answers are served from the server's cache, which also
+        // refreshes them once they are stale
+        const data = await fetchRegulationRequirements(productType, market, detailed, onProgress);
         
         // Store the data globally for later use
         currentResultData = data;
@@ -354,7 +378,9 @@ document.addEventListener('DOMContentLoaded', () => {
         updateDataSources(data);
         
         // Scroll to the results section
-        document.getElementById('results-section').scrollIntoView({ behavior: 'smooth' });
+        if (!scrolled) {
+          document.getElementById('results-section').scrollIntoView({ behavior: 'smooth' });
+        }
       } catch (error) {
         alert('Error fetching regulation requirements: ' + error.message);
       } finally {